@@ -1,13 +1,21 @@
 import logging
 import os
 import sys
+import json
 import locale
+import cProfile
 import configparser
-from typing import Tuple, Optional
+from typing import Any, List, Dict, Tuple, Optional
 import platformdirs
+import numpy as np
 from PySide6.QtCore import QCoreApplication, QTranslator, QLocale
 from PySide6.QtWidgets import QApplication
 from src.model.compressor import Compressor
+from src.model.color_space import ColorSpace
+from src.model.decomposition_file import DecompositionFile
+from src.model.disk_cache import DiskCache
+from src.model.stats import Stats
+from src.control.batch_controller import BatchController
 from src.view.window import Window
 
 
@@ -41,6 +49,88 @@ def load_translations(app: QCoreApplication) -> Optional[Tuple[QTranslator, str]
     return (translator, locale)
 
 
+def get_options(args: List[str]) -> Tuple[List[str], Dict[str, str]]:
+    """
+    Splits the command line arguments in positional arguments and options in the --name=value form.
+
+    Args:
+        args (List[str]): The command line arguments.
+
+    Returns:
+        Tuple[List[str], Dict[str, str]]: The positional arguments and the dictionary of the options.
+    """
+    arguments: List[str] = []
+    options: Dict[str, str] = {}
+    for i in args:
+        if i.startswith("--"):
+            name, _, value = i[2:].partition("=")
+            options[name] = value
+        else:
+            arguments.append(i)
+    return (arguments, options)
+
+
+def get_ranks(text: str) -> List[int]:
+    """
+    Parses a list of numbers of singular values, like 10,25,50 or 10:200:10 (start:stop:step, stop included).
+
+    Args:
+        text (str): The comma separated numbers and ranges.
+
+    Returns:
+        List[int]: The sorted numbers of singular values, without duplicates.
+
+    Raises:
+        ValueError: if a number can't be parsed.
+    """
+    ranks: List[int] = []
+    for i in text.split(","):
+        if ":" in i:
+            bounds: List[int] = [int(j) for j in i.split(":")]
+            ranks += range(bounds[0], bounds[1] + 1, bounds[2] if len(bounds) > 2 else 1)
+        else:
+            ranks.append(int(i))
+    return sorted(set(ranks))
+
+
+def get_output(path: str, k: int, many: bool) -> str:
+    """
+    Gets the result path for a number of singular values.
+    The {k} field of the path is replaced by k, if it's missing and there are many values, _k is added before the extension.
+
+    Args:
+        path (str): The result path.
+        k (int): The number of singular values.
+        many (bool): The flag that indicates if many numbers of singular values are composed.
+
+    Returns:
+        str: The result path for k.
+    """
+    if many and "{k}" not in path:
+        root, ext = os.path.splitext(path)
+        path = root + "_{k}" + ext
+    return path.replace("{k}", str(k))
+
+
+def show_profile(path: str) -> None:
+    """
+    Shows the time spent in each stage of the compression, from the slowest one.
+    The stages are nested, so the time of an operation includes the one of its stages.
+
+    Args:
+        path (str): The .json file where to write the stages, if it's empty or a .prof file they are logged.
+    """
+    breakdown: Dict[str, Dict[str, float]] = Stats.get_breakdown()
+    if path.endswith(".json"):
+        with open(path, "w") as file:
+            json.dump(breakdown, file, indent=4)
+        return
+    for name, stage in sorted(breakdown.items(), key=lambda i: -i[1]["total"]):
+        logging.info(QCoreApplication.translate("Cli", "profile").format(
+            stage=name, calls=stage["calls"], total="{:.2f}".format(stage["total"] * 1000),
+            mean="{:.2f}".format(stage["mean"] * 1000)))
+
+
 def show_help() -> None:
     """
     Shows the help of the application.
@@ -56,13 +146,47 @@ def show_help() -> None:
             -c, --cli           Run the application in CLI mode.
 
         CLI Mode Usage:
-            imageS-VD --cli <original_file_path> <result_file_path> [k]
-            imageS-VD -c <original_file_path> <result_file_path> [k]
+            imageS-VD --cli [cli_options] <original_file_path> <result_file_path> [k]
+            imageS-VD -c [cli_options] <original_file_path> <result_file_path> [k]
+            imageS-VD --cli [cli_options] --energy=<e>|--psnr=<p>|--size=<b> <original_file_path> <result_file_path>
+            imageS-VD --cli --batch [cli_options] [batch_options] <input>...
 
         Arguments:
-            <original_file_path>    The path to the file image to be compressed. It can be an image or a .npz file.
-            <result_file_path>      The path where the file will be saved. It can be a compressed image or a .npz file.
+            <original_file_path>    The path to the file image to be compressed. It can be an image, a .npz or an .isvd file.
+            <result_file_path>      The path where the file will be saved. It can be a compressed image, a .npz or an .isvd file.
             [k]                     The number of singular values to use for the image reconstructing. It is required only if the result file is an image, otherwise it's ignored.
+                                    It can be a list like 10,25,50 or 10:200:10 to save an image for each value from a single decomposition,
+                                    the {k} field of the result path is replaced by the value (by default _k is added before the extension).
+            <input>                 In batch mode, a file, a directory, a glob pattern or a .txt/.lst manifest with a path for each line.
+
+        CLI Options:
+            --rank=<n>              Computes only the n largest singular values of each channel.
+            --tolerance=<t>         Computes only the singular values greater than t times the largest one.
+            --precision=<p>         The floating point precision of the decomposition, float64 (default) or float32.
+            --tile=<n>              Decomposes the image in independent tiles of n x n pixels.
+            --color=<c>             The color space of the decomposed channels, rgb (default) or ycbcr.
+            --chroma-rank=<n>       Computes only the n largest singular values of the ycbcr chroma planes.
+            --subsampling=<n>       Averages the ycbcr chroma planes over blocks of n x n pixels, n must divide the
+                                    tile size.
+            --cache                 Reads and writes the decompositions in the user cache directory, up to 2 GB of full
+                                    precision factors.
+            --save-rank=<n>         Saves at most n singular values of each channel in an .isvd file.
+            --quantize=<q>          Stores the singular vectors of an .isvd file as float16, int8 or int16.
+            --compress=<c>          Compresses the singular vectors of an .isvd file with zlib or lzma.
+            --report                Logs the size and the PSNR of the .isvd file of each quantization and compression.
+            --energy=<e>            Selects the smallest k retaining at least the fraction e of the image energy.
+            --psnr=<p>              Selects the smallest k with a PSNR of at least p dB.
+            --size=<b>              Selects the largest k whose result file is at most b bytes, it wins over the other targets.
+            --profile[=<path>]      Logs the time spent in each stage, or writes it in a .json file.
+                                    With a .prof file, the whole compression is also profiled with cProfile.
+
+        Batch Options:
+            --batch                 Compresses many inputs with a pool of processes.
+            --output=<template>     The result paths, with the {dir}, {name}, {ext} and {k} fields. Default: {dir}/{name}_{k}{ext}.
+            --k=<n>                 The number of singular values to use for the image reconstructing, or a list of them.
+            --workers=<n>           The number of processes. Default: the number of cpus.
+                                    Each process uses cpus / n BLAS threads, so fewer processes decompose each file
+                                    with more threads, which needs less memory for large images.
         """
     print(help_text)
 
@@ -80,28 +204,105 @@ def cli_usage(index: int) -> None:
         os.chdir(os.path.dirname(os.path.realpath(__file__)))
         translator: Optional[QTranslator] = load_translations(app)
         os.chdir(dir)
-        if len(sys.argv) < index + 3:
+        arguments, options = get_options(sys.argv[index + 1:])
+        batch: bool = "batch" in options
+        allowed: set = {"rank", "tolerance", "precision", "tile", "save-rank", "quantize", "compress", "energy", "psnr",
+                        "size", "color", "chroma-rank", "subsampling", "cache"}
+        if batch:
+            allowed |= {"batch", "output", "k", "workers"}
+        else:
+            allowed |= {"profile", "report"}
+        profile: Optional[str] = options.get("profile")
+        if ((len(arguments) < 1 if batch else len(arguments) < 2) or not set(options.keys()) <= allowed
+                or (profile and os.path.splitext(profile)[1] not in (".json", ".prof"))
+                or options.get("precision", "float64") not in ("float32", "float64")
+                or options.get("color", "rgb") not in ColorSpace.COLOR_SPACES
+                or options.get("quantize", "int8") not in DecompositionFile.QUANTIZATIONS
+                or options.get("compress", "zlib") not in DecompositionFile.COMPRESSIONS):
             logging.error(QCoreApplication.translate("Cli", "bad"))
             sys.exit(1)
-        original_image_path: str = sys.argv[index + 1]
-        result_image_path: str = sys.argv[index + 2]
-        result_image_ext: str = os.path.splitext(result_image_path)[1]
-        if result_image_ext != ".npz" and len(sys.argv) < index + 4:
+        ks: List[int] = [0]
+        if batch and "k" in options:
+            ks = get_ranks(options["k"])
+        elif not batch and len(arguments) > 2:
+            ks = get_ranks(arguments[2])
+        rank: Optional[int] = int(options["rank"]) if "rank" in options else None
+        tolerance: Optional[float] = float(options["tolerance"]) if "tolerance" in options else None
+        tile_size: Optional[int] = int(options["tile"]) if "tile" in options else None
+        save_rank: Optional[int] = int(options["save-rank"]) if "save-rank" in options else None
+        chroma_rank: Optional[int] = int(options["chroma-rank"]) if "chroma-rank" in options else None
+        subsampling: int = int(options.get("subsampling", 1))
+        workers: Optional[int] = int(options["workers"]) if "workers" in options else None
+        targets: Dict[str, Any] = {}
+        for name, parse in (("energy", float), ("psnr", float), ("size", int)):
+            if name in options:
+                targets[name] = parse(options[name])
+        if (targets.get("energy", 1) <= 0 or targets.get("energy", 1) > 1 or targets.get("size", 1) <= 0
+                or not ks or ks[0] < 0 or (rank is not None and rank <= 0) or (tolerance is not None and not 0 < tolerance < 1)
+                or (tile_size is not None and tile_size <= 0) or (save_rank is not None and save_rank <= 0)
+                or (chroma_rank is not None and chroma_rank <= 0) or subsampling <= 0
+                or (tile_size is not None and tile_size % subsampling != 0)
+                or (workers is not None and workers <= 0)):
             logging.error(QCoreApplication.translate("Cli", "bad"))
             sys.exit(1)
-        k: int = 0
-        if len(sys.argv) > index + 3:
-            k = int(sys.argv[index + 3])
-        if k < 0:
+        load_options: Dict[str, Any] = {
+            "rank": rank, "tolerance": tolerance, "dtype": np.dtype(options.get("precision", "float64")), "tile_size": tile_size,
+            "color_space": options.get("color", "rgb"), "chroma_rank": chroma_rank, "subsampling": subsampling,
+            "disk_cache": DiskCache() if "cache" in options else None
+        }
+        save_options: Dict[str, Any] = {"rank": save_rank, "quantization": options.get("quantize"),
+                                        "compression": options.get("compress")}
+        if batch:
+            template: str = options.get("output") or "{dir}/{name}_{k}{ext}"
+            if len(ks) > 1 and "{k}" not in template:
+                root, ext = os.path.splitext(template)
+                template = root + "_{k}" + ext
+            if os.path.splitext(template)[1] not in Compressor.DECOMPOSITION_FORMATS and "k" not in options and not targets:
+                logging.error(QCoreApplication.translate("Cli", "bad"))
+                sys.exit(1)
+            try:
+                controller: BatchController = BatchController(arguments, template, ks, workers, load_options,
+                                                              save_options, targets)
+            except ValueError as ex:
+                logging.error(ex)
+                sys.exit(1)
+            if controller.run() > 0:
+                sys.exit(1)
+            return
+        original_image_path: str = arguments[0]
+        result_image_path: str = arguments[1]
+        result_image_ext: str = os.path.splitext(result_image_path)[1]
+        if result_image_ext not in Compressor.DECOMPOSITION_FORMATS and len(arguments) < 3 and not targets:
             logging.error(QCoreApplication.translate("Cli", "bad"))
             sys.exit(1)
-        compressor: Compressor = Compressor()
-        compressor.load(original_image_path)
-        if result_image_ext != ".npz":
-            compressor.compose(k)
-        ratio: Optional[float] = compressor.save(result_image_path)
-        if ratio is not None:
-            logging.info(QCoreApplication.translate("Cli", "ratio").format(ratio=ratio))
+        profiler: Optional[cProfile.Profile] = cProfile.Profile() if profile and profile.endswith(".prof") else None
+        Stats.enable(profile is not None)
+        if profiler is not None:
+            profiler.enable()
+        try:
+            compressor: Compressor = Compressor(cache_size=0)
+            compressor.load(original_image_path, **load_options)
+            if "report" in options:
+                for i in compressor.get_tradeoffs(save_rank):
+                    logging.info(QCoreApplication.translate("Cli", "tradeoff").format(
+                        quantization=i["quantization"] or "-", compression=i["compression"] or "-",
+                        size="{:.1f}".format(i["size"] / 1024), psnr="{:.2f}".format(i["psnr"])))
+            if result_image_ext in Compressor.DECOMPOSITION_FORMATS:
+                compressor.save(result_image_path, **save_options)
+                return
+            if targets:
+                ks = [compressor.select_rank(**targets, ext=result_image_ext)]
+                logging.info(QCoreApplication.translate("Cli", "selected").format(k=ks[0]))
+            for k in compressor.sweep(ks):
+                ratio: Optional[float] = compressor.save(get_output(result_image_path, k, len(ks) > 1), **save_options)
+                if ratio is not None:
+                    logging.info(QCoreApplication.translate("Cli", "ratio").format(ratio=ratio))
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(profile)
+            if profile is not None:
+                show_profile(profile)
     except Exception as ex:
         logging.error(f"Error:\t{ex}")
 
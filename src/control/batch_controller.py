@@ -0,0 +1,233 @@
+import os
+import glob
+import time
+import logging
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from PySide6.QtCore import QCoreApplication
+from src.model.compressor import Compressor
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+
+class BatchController:
+    """
+    The class used to compress many files with a pool of processes.
+    Each process decomposes with a BLAS library limited to cpu_count / workers threads, so the processes together
+    don't start more threads than the cpus, which would make the whole batch slower.
+
+    Attributes:
+        _inputs (List[str]): The paths of the files to compress.
+        _template (str): The template of the result paths.
+        _ks (List[int]): The numbers of singular values to use for the image reconstructing.
+        _workers (int): The number of processes of the pool.
+        _load_options (Dict[str, Any]): The keyword arguments of Compressor.load.
+        _save_options (Dict[str, Any]): The keyword arguments of Compressor.save.
+        _targets (Dict[str, Any]): The keyword arguments of Compressor.select_rank, used instead of the numbers of singular values.
+        SUPPORTED_FORMATS (Tuple[str, ...]): The extensions of the files compressed from a directory.
+        MANIFEST_FORMATS (Tuple[str, ...]): The extensions of the files containing a path for each line, relative to the file.
+        THREAD_VARIABLES (Tuple[str, ...]): The environment variables read by the BLAS libraries for their number of threads.
+
+    Methods:
+        get_inputs(patterns: List[str]) -> List[str]:
+            Expands directories, glob patterns and manifest files to the paths of the files to compress.
+        get_output(template: str, path: str) -> str:
+            Gets the result path of a file from the naming template.
+        run() -> int:
+            Compresses all the files, logging the result of each one and the total throughput.
+        _limit_threads(threads: int) -> Iterator[None]:
+            Sets the number of BLAS threads of the processes started in the context.
+        _initialize(threads: int) -> None:
+            Limits the BLAS threads of a process of the pool.
+        _compress(path: str, output: str, ks: List[int], load_options: Dict[str, Any], save_options: Dict[str, Any], targets: Dict[str, Any]) -> Tuple[float, Optional[float]]:
+            Compresses a file in a process of the pool.
+    """
+
+    SUPPORTED_FORMATS: Tuple[str, ...] = (".jpeg", ".jpg", ".jp2", ".png", ".npz", ".isvd")
+    MANIFEST_FORMATS: Tuple[str, ...] = (".txt", ".lst")
+    THREAD_VARIABLES: Tuple[str, ...] = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                                         "VECLIB_MAXIMUM_THREADS", "BLIS_NUM_THREADS")
+
+    def __init__(self, patterns: List[str], template: str, ks: List[int], workers: Optional[int] = None,
+                 load_options: Optional[Dict[str, Any]] = None, save_options: Optional[Dict[str, Any]] = None,
+                 targets: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Creates a BatchController.
+
+        Args:
+            patterns (List[str]): The directories, glob patterns, manifest files or files to compress.
+            template (str): The template of the result paths, with the {dir}, {name}, {ext} and {k} fields.
+            ks (List[int]): The numbers of singular values to use for the image reconstructing.
+            workers (Optional[int]): The number of processes of the pool, by default the number of cpus.
+            load_options (Optional[Dict[str, Any]]): The keyword arguments of Compressor.load.
+            save_options (Optional[Dict[str, Any]]): The keyword arguments of Compressor.save.
+            targets (Optional[Dict[str, Any]]): The keyword arguments of Compressor.select_rank, used instead of ks.
+
+        Raises:
+            ValueError: if the template has fields other than {dir}, {name}, {ext} and {k}, or a bad format.
+        """
+        try:
+            BatchController.get_output(template, "image.png")
+        except (KeyError, IndexError, ValueError, AttributeError):
+            raise ValueError(QCoreApplication.translate("Cli", "bad"))
+        self._inputs: List[str] = BatchController.get_inputs(patterns)
+        self._template: str = template
+        self._ks: List[int] = ks
+        self._workers: int = workers if workers is not None else os.cpu_count() or 1
+        self._load_options: Dict[str, Any] = load_options if load_options is not None else {}
+        self._save_options: Dict[str, Any] = save_options if save_options is not None else {}
+        self._targets: Dict[str, Any] = targets if targets is not None else {}
+
+    @staticmethod
+    def get_inputs(patterns: List[str]) -> List[str]:
+        """
+        Expands directories, glob patterns and manifest files to the paths of the files to compress.
+
+        Args:
+            patterns (List[str]): The directories, glob patterns, manifest files or files to compress.
+
+        Returns:
+            List[str]: The paths of the files to compress, without duplicates.
+        """
+        inputs: List[str] = []
+        for i in patterns:
+            if os.path.isdir(i):
+                inputs += sorted(os.path.join(i, j) for j in os.listdir(i)
+                                 if os.path.splitext(j)[1].lower() in BatchController.SUPPORTED_FORMATS)
+            elif os.path.splitext(i)[1].lower() in BatchController.MANIFEST_FORMATS:
+                with open(i) as file:
+                    inputs += [os.path.join(os.path.dirname(i), j.strip()) for j in file
+                               if j.strip() and not j.startswith("#")]
+            elif glob.has_magic(i):
+                inputs += sorted(glob.glob(i, recursive=True))
+            else:
+                inputs.append(i)
+        return list(dict.fromkeys(inputs))
+
+    @staticmethod
+    def get_output(template: str, path: str) -> str:
+        """
+        Gets the result path of a file from the naming template.
+        The {k} field is kept, so it can be replaced by each number of singular values.
+
+        Args:
+            template (str): The template of the result paths, with the {dir}, {name}, {ext} and {k} fields.
+            path (str): The path of the file to compress.
+
+        Returns:
+            str: The result path.
+        """
+        directory, file_name = os.path.split(path)
+        name, ext = os.path.splitext(file_name)
+        return template.format(dir=directory or ".", name=name, ext=ext, k="{k}")
+
+    def run(self) -> int:
+        """
+        Compresses all the files, logging the result of each one and the total throughput.
+        A failing file is logged and doesn't stop the other ones.
+        The processes are spawned, so their BLAS library reads the number of threads before it starts any.
+
+        Returns:
+            int: The number of files that couldn't be compressed.
+        """
+        start: float = time.perf_counter()
+        failed: int = 0
+        size: int = 0
+        workers: int = max(1, min(self._workers, len(self._inputs)))
+        threads: int = max(1, (os.cpu_count() or 1) // workers)
+        with BatchController._limit_threads(threads), ProcessPoolExecutor(
+                workers, multiprocessing.get_context("spawn"), BatchController._initialize, (threads,)) as executor:
+            futures: Dict[Future, Tuple[str, str]] = {}
+            for i in self._inputs:
+                output: str = BatchController.get_output(self._template, i)
+                futures[executor.submit(BatchController._compress, i, output, self._ks, self._load_options,
+                                        self._save_options, self._targets)] = (i, output)
+            for future in as_completed(futures):
+                path, output = futures[future]
+                try:
+                    seconds, ratio = future.result()
+                    size += os.path.getsize(path)
+                    logging.info(QCoreApplication.translate("Cli", "batch_file").format(
+                        input=path, output=output, seconds="{:.2f}".format(seconds),
+                        ratio="-" if ratio is None else "{:.4f}".format(ratio)))
+                except Exception as ex:
+                    failed += 1
+                    logging.error(QCoreApplication.translate("Cli", "batch_error").format(input=path, error=ex))
+        seconds: float = time.perf_counter() - start
+        logging.info(QCoreApplication.translate("Cli", "batch_total").format(
+            files=len(self._inputs) - failed, failed=failed, seconds="{:.2f}".format(seconds),
+            throughput="{:.2f}".format((len(self._inputs) - failed) / seconds if seconds > 0 else 0),
+            megabytes="{:.2f}".format(size / 1024 ** 2 / seconds if seconds > 0 else 0)))
+        return failed
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _limit_threads(threads: int) -> Iterator[None]:
+        """
+        Sets the number of BLAS threads of the processes started in the context.
+        The BLAS libraries read it only when they are loaded, so the current process isn't affected.
+
+        Args:
+            threads (int): The maximum number of threads of each process.
+
+        Returns:
+            Iterator[None]: The context, restoring the environment variables at its end.
+        """
+        previous: Dict[str, Optional[str]] = {i: os.environ.get(i) for i in BatchController.THREAD_VARIABLES}
+        os.environ.update({i: str(threads) for i in BatchController.THREAD_VARIABLES})
+        try:
+            yield
+        finally:
+            for name, value in previous.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    @staticmethod
+    def _initialize(threads: int) -> None:
+        """
+        Limits the BLAS threads of a process of the pool.
+        The environment variables already limit them, threadpoolctl also limits the libraries that ignore them.
+
+        Args:
+            threads (int): The maximum number of threads of the process.
+        """
+        if threadpool_limits is not None:
+            threadpool_limits(threads, "blas")
+
+    @staticmethod
+    def _compress(path: str, output: str, ks: List[int], load_options: Dict[str, Any], save_options: Dict[str, Any],
+                  targets: Dict[str, Any]) -> Tuple[float, Optional[float]]:
+        """
+        Compresses a file in a process of the pool.
+        The channels are decomposed sequentially, since the files already run concurrently.
+        The images of all the numbers of singular values are composed from a single decomposition.
+
+        Args:
+            path (str): The path of the file to compress.
+            output (str): The result path, {k} is replaced by each number of singular values.
+            ks (List[int]): The numbers of singular values to use for the image reconstructing.
+            load_options (Dict[str, Any]): The keyword arguments of Compressor.load.
+            save_options (Dict[str, Any]): The keyword arguments of Compressor.save.
+            targets (Dict[str, Any]): The keyword arguments of Compressor.select_rank, used instead of ks.
+
+        Returns:
+            Tuple[float, Optional[float]]: The seconds used and the compression ratio of the last image if both files are images.
+        """
+        start: float = time.perf_counter()
+        compressor: Compressor = Compressor(workers=1, cache_size=0)
+        compressor.load(path, **load_options)
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        if os.path.splitext(output)[1] in Compressor.DECOMPOSITION_FORMATS:
+            return (time.perf_counter() - start, compressor.save(output.replace("{k}", str(max(ks))), **save_options))
+        if targets:
+            ks = [compressor.select_rank(**targets, ext=os.path.splitext(output)[1])]
+        ratio: Optional[float] = None
+        for k in compressor.sweep(ks):
+            ratio = compressor.save(output.replace("{k}", str(k)), **save_options)
+        return (time.perf_counter() - start, ratio)
@@ -1,20 +1,62 @@
-from PySide6.QtCore import QThread
+import time
+import logging
+import threading
+from typing import List, Optional
+from PySide6.QtCore import QThread, Signal
+from PySide6.QtGui import QImage
 from src.model.compressor import Compressor
+from src.view.panel import Panel
 
 
 class ComposeThread(QThread):
     """
-    The class used to compose the panel image.
+    The long-lived thread used to compose the panel images.
+    Only the most recent requested number of singular values is composed: the older requests are dropped and a
+    composition in progress is cancelled at the next chunk boundary when a new request arrives.
+    When there isn't any request, the images of the ranks around the last one are composed in the compressor cache,
+    first along the direction of the last move, so dragging the slider mostly finds already composed images.
+    The compressor is used only by this thread, so it's also spilled here, on behalf of the memory budget,
+    without making the caller wait.
 
     Attributes:
         _compressor (Compressor): The compressor used to compress the panel image.
-        _values (int): number of image singular values.
+        _values (int): The number of singular values of the image.
+        _step (int): The distance between two prefetched ranks, the dragged ranks are rounded to its multiples.
+        _requested (Optional[int]): The number of singular values of the pending request.
+        _last (int): The number of singular values of the last request, at first the one of the decomposition image.
+        _direction (int): The sign of the last move, 1 towards more singular values and -1 towards less.
+        _prefetch (List[int]): The ranks to compose when there isn't any request, from the first one.
+        _running (bool): The flag that indicates if the thread has not been stopped.
+        _spill (Optional[str]): The path of the pending spill of the compressor.
+        _condition (threading.Condition): The condition used to wait for the requests.
+        composed (Signal): The signal used to return the number of singular values, the composed image, as a QImage
+            already scaled to the display size, and the seconds used to compose and scale it.
+        PREFETCH_STEPS (int): The number of prefetch steps in the whole range of the singular values.
+        PREFETCH_FRAMES (int): The maximum number of images prefetched around a request.
+        PREFETCH_SIZE (int): The maximum size in bytes of the images prefetched around a request.
 
     Methods:
+        snap(values: int) -> int:
+            Rounds a number of singular values to the nearest prefetched one.
+        request(values: int) -> None:
+            Requests the composition of an image, replacing the pending request.
+        stop() -> None:
+            Stops the thread, cancelling the composition in progress, without waiting for it.
+        spill(path: str) -> None:
+            Requests the spill of the compressor to a file, replacing the pending one.
         run() -> None:
-            Composes the image.
+            Composes the requested images until the thread is stopped, prefetching the near ones when idle.
+        _get_prefetch(values: int) -> List[int]:
+            Gets the ranks to prefetch after a request.
+        _is_superseded() -> bool:
+            Checks if the composition in progress must be cancelled.
     """
 
+    composed: Signal = Signal(int, object, float)
+    PREFETCH_STEPS: int = 100
+    PREFETCH_FRAMES: int = 16
+    PREFETCH_SIZE: int = 64 * 1024 ** 2
+
     def __init__(self, compressor: Compressor, values: int) -> None:
         """
         Creates a ComposeThread.
@@ -26,10 +68,137 @@ class ComposeThread(QThread):
         super().__init__()
         self._compressor: Compressor = compressor
         self._values: int = values
+        self._step: int = max(1, values // ComposeThread.PREFETCH_STEPS)
+        self._requested: Optional[int] = None
+        self._last: int = values - 1
+        self._direction: int = -1
+        self._prefetch: List[int] = []
+        self._running: bool = True
+        self._spill: Optional[str] = None
+        self._condition: threading.Condition = threading.Condition()
+
+    def snap(self, values: int) -> int:
+        """
+        Rounds a number of singular values to the nearest prefetched one.
+
+        Args:
+            values (int): number of image singular values.
+
+        Returns:
+            int: The nearest multiple of the prefetch step, in the range of the singular values.
+        """
+        return min(self._values, round(values / self._step) * self._step)
+
+    def request(self, values: int) -> None:
+        """
+        Requests the composition of an image, replacing the pending request.
+        A request equal to the last one is ignored, since its image is already shown or being composed.
+
+        Args:
+            values (int): number of image singular values.
+        """
+        with self._condition:
+            if values == self._last:
+                return
+            self._direction = 1 if values > self._last else -1
+            self._last = values
+            self._requested = values
+            self._prefetch = []
+            self._condition.notify()
+
+    def stop(self) -> None:
+        """
+        Stops the thread, cancelling the composition in progress, without waiting for it.
+        The thread ends at the next chunk boundary, so a caller that has to wait for it uses wait().
+        """
+        self.requestInterruption()
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+    def spill(self, path: str) -> None:
+        """
+        Requests the spill of the compressor to a file, replacing the pending one.
+        The composition in progress is cancelled and the prefetch is dropped, while a cancelled request is kept.
+
+        Args:
+            path (str): The path of the .isvd file where to write the decomposition.
+        """
+        if not self.isRunning():
+            self._compressor.spill(path)
+            return
+        with self._condition:
+            self._spill = path
+            self._condition.notify()
 
     def run(self) -> None:
         """
-        Composes the image.
+        Composes the requested images until the thread is stopped, prefetching the near ones when idle.
+        The prefetched images are only cached, and any request cancels their composition.
+        Only the requested images are timed, since the prefetched ones aren't shown.
+        """
+        while True:
+            with self._condition:
+                while self._requested is None and not self._prefetch and self._spill is None and self._running:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                if self._spill is not None:
+                    try:
+                        self._compressor.spill(self._spill)
+                    except OSError as ex:
+                        logging.error(f"Error:\t{ex}")
+                    self._spill = None
+                    self._prefetch = []
+                    continue
+                prefetch: bool = self._requested is None
+                values: int = self._prefetch.pop(0) if prefetch else self._requested
+                self._requested = None
+            start: float = time.perf_counter()
+            if prefetch:
+                if values not in self._compressor.cache:
+                    self._compressor.compose(values, self._is_superseded)
+            elif self._compressor.compose(values, self._is_superseded):
+                image: QImage = Panel.to_display(self._compressor.image)
+                self.composed.emit(values, image, time.perf_counter() - start)
+                with self._condition:
+                    if self._requested is None:
+                        self._prefetch = self._get_prefetch(values)
+            else:
+                with self._condition:
+                    if self._requested is None:
+                        self._requested = values
+
+    def _get_prefetch(self, values: int) -> List[int]:
+        """
+        Gets the ranks to prefetch after a request.
+        Two thirds of the images are ahead along the direction of the last move and the others behind,
+        and their number is limited by PREFETCH_FRAMES and PREFETCH_SIZE.
+
+        Args:
+            values (int): The number of singular values of the request.
+
+        Returns:
+            List[int]: The multiples of the prefetch step to compose, from the nearest ones.
+        """
+        frames: int = min(ComposeThread.PREFETCH_FRAMES,
+                          ComposeThread.PREFETCH_SIZE // max(1, self._compressor.image.nbytes),
+                          self._compressor.cache.max_size // max(1, self._compressor.image.nbytes) - 1)
+        start: int = round(values / self._step)
+        ahead: List[int] = [(start + self._direction * i) * self._step for i in range(1, frames - frames // 3 + 1)]
+        behind: List[int] = [(start - self._direction * i) * self._step for i in range(1, frames // 3 + 1)]
+        ranks: List[int] = []
+        for i in range(len(ahead)):
+            ranks.append(ahead[i])
+            if i < len(behind):
+                ranks.append(behind[i])
+        return [i for i in ranks if 0 <= i <= self._values and i != values]
+
+    def _is_superseded(self) -> bool:
+        """
+        Checks if the composition in progress must be cancelled.
+
+        Returns:
+            bool: True if there is a newer request or a spill, or the thread has been stopped.
         """
-        self._compressor.compose(self._values)
-        self.finished.emit()
+        return self._requested is not None or self._spill is not None or not self._running
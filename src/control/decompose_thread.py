@@ -1,40 +1,114 @@
+import os
+from typing import Callable, Optional
 from PySide6.QtCore import QThread, Signal
+from PIL import Image
 from src.model.compressor import Compressor
+from src.model.disk_cache import DiskCache
 
 
 class DecomposeThread(QThread):
     """
     The class used to decompose the panel image.
+    A large image file is decoded and decomposed at about the display resolution, which takes a fraction of a second
+    even for a huge photo, and the full resolution decomposition is left to the save.
+    The decomposed number of singular values is always the one of the full resolution image, so the panel selects
+    the saved ranks, and the preview composes them scaled to its own number of singular values.
+    The progress is reported after each decomposed channel.
 
     Attributes:
         _compressor (Compressor): The compressor used to decompose the panel image.
         _path (str): The path to the file.
-        decomposed (Signal): The signal used to return the number of singular values.
+        _preview (Optional[Compressor]): The compressor of the image at the display resolution.
+        _reduced (bool): The flag that indicates if only the reduced image has been decomposed.
+        _preview_values (int): The number of singular values of the preview.
+        _disk_cache (Optional[DiskCache]): The persistent cache of the decompositions, None if it's disabled.
+        decomposed (Signal): The signal used to return the number of singular values of the full resolution image.
+        progress (Signal): The signal used to return the decomposed percentage of the image.
 
     Methods:
+        preview() -> Optional[Compressor]:
+            Gets the compressor of the image at the display resolution.
+        reduced() -> bool:
+            Gets if only the reduced image has been decomposed.
+        preview_values() -> int:
+            Gets the number of singular values of the preview.
         run() -> None:
-            Decomposes the image.
+            Decomposes the image at the display resolution or at the full one.
     """
 
     decomposed: Signal = Signal(int)
+    progress: Signal = Signal(int)
 
-    def __init__(self, compressor: Compressor, path: str) -> None:
+    def __init__(self, compressor: Compressor, path: str, disk_cache: Optional[DiskCache] = None) -> None:
         """
         Creates a DecomposeThread.
 
         Args:
             compressor (Compressor): The compressor used to decompose the panel image.
             path (str): The path to the file.
+            disk_cache (Optional[DiskCache]): The persistent cache of the decompositions, None to disable it.
         """
         super().__init__()
         self._compressor: Compressor = compressor
         self._path: str = path
+        self._preview: Optional[Compressor] = None
+        self._reduced: bool = False
+        self._preview_values: int = 0
+        self._disk_cache: Optional[DiskCache] = disk_cache
 
+    @property
+    def preview(self) -> Optional[Compressor]:
+        """
+        Gets the compressor of the image at the display resolution.
+
+        Returns:
+            Optional[Compressor]: The compressor used for the panel image, None before the decomposition.
+        """
+        return self._preview
+
+    @property
+    def reduced(self) -> bool:
+        """
+        Gets if only the reduced image has been decomposed.
+
+        Returns:
+            bool: True if the compressor hasn't been loaded and the preview comes from the reduced image.
+        """
+        return self._reduced
+
+    @property
+    def preview_values(self) -> int:
+        """
+        Gets the number of singular values of the preview.
+
+        Returns:
+            int: The singular values of the reduced image, or the ones of the full resolution image, 0 before the
+                decomposition.
+        """
+        return self._preview_values
 
     def run(self) -> None:
         """
-        Composes the image.
+        Decomposes the image at the display resolution or at the full one.
+        The decomposition files and the small images are fully loaded, the images through the disk cache if enabled,
+        and the preview is downsampled from them.
+        An interrupted thread, whose panel has been closed, skips the composition of the preview.
         """
-        values: int = self._compressor.load(self._path)
-        self._compressor.compose(values - 1)
+        self.progress.emit(0)
+        progress: Callable[[float], None] = lambda i: self.progress.emit(int(i * 100))
+        values: int = 0
+        if os.path.splitext(self._path)[1] not in Compressor.DECOMPOSITION_FORMATS:
+            with Image.open(self._path) as image:
+                values = min(image.size)
+        self._reduced = values >= 2 * Compressor.PREVIEW_SIZE
+        if self._reduced:
+            self._preview = Compressor()
+            self._preview_values = self._preview.load(self._path, size=Compressor.PREVIEW_SIZE, progress=progress)
+        else:
+            values = self._compressor.load(self._path, progress=progress, disk_cache=self._disk_cache)
+            self._preview = self._compressor.get_preview()
+            self._preview_values = values
+        if self.isInterruptionRequested():
+            return
+        self._preview.compose(self._preview_values - 1)
         self.decomposed.emit(values)
@@ -0,0 +1,159 @@
+import os
+import shutil
+import tempfile
+from typing import Any, List, Optional
+
+
+class MemoryGovernor:
+    """
+    The application wide memory budget of the open panels.
+    The members are kept from the least to the most recently activated, and when their memory exceeds the budget
+    the least recently activated ones are spilled to memory mapped files in a temporary directory,
+    until the memory fits in the budget or only the active member is left.
+    A spilled member loads again only what it uses, so it's restored transparently when it's activated again.
+    A member is any object with the get_memory() -> int and spill(path: str) -> None methods, and it can spill in
+    its own threads, so the memory it used is counted as freed as soon as its spill is requested.
+
+    Attributes:
+        _budget (int): The maximum size in bytes of the memory of the members.
+        _members (List[Any]): The members, from the least to the most recently activated.
+        _directory (Optional[str]): The temporary directory of the spill files, created by the first spill.
+        _spills (int): The number of spill files written, used to name them.
+        BUDGET (int): The default maximum size in bytes of the memory of the members.
+
+    Methods:
+        register(member: Any) -> None:
+            Adds a member, just before the active one.
+        unregister(member: Any) -> None:
+            Removes a member, deleting its spill files.
+        activate(member: Any) -> None:
+            Marks a member as the most recently activated one and balances the memory.
+        balance() -> int:
+            Spills the least recently activated members until the memory fits in the budget.
+        get_memory() -> int:
+            Gets the memory used by all the members.
+        close() -> None:
+            Removes the temporary directory of the spill files.
+        _get_path(member: Any) -> str:
+            Gets the path of a new spill file of a member.
+    """
+
+    BUDGET: int = 4 * 1024 ** 3
+
+    def __init__(self, budget: int = BUDGET) -> None:
+        """
+        Creates a MemoryGovernor.
+
+        Args:
+            budget (int): The maximum size in bytes of the memory of the members.
+        """
+        self._budget: int = budget
+        self._members: List[Any] = []
+        self._directory: Optional[str] = None
+        self._spills: int = 0
+
+    @property
+    def budget(self) -> int:
+        """
+        Gets the memory budget.
+
+        Returns:
+            int: The maximum size in bytes of the memory of the members.
+        """
+        return self._budget
+
+    def register(self, member: Any) -> None:
+        """
+        Adds a member, just before the active one.
+        A member opened in the background doesn't become the active one until it's activated.
+
+        Args:
+            member (Any): The member to add.
+        """
+        if member not in self._members:
+            self._members.insert(max(0, len(self._members) - 1), member)
+
+    def unregister(self, member: Any) -> None:
+        """
+        Removes a member, deleting its spill files.
+        A file still mapped by the member can't be deleted on some systems, so it's left to close.
+
+        Args:
+            member (Any): The member to remove.
+        """
+        if member in self._members:
+            self._members.remove(member)
+        if self._directory is None:
+            return
+        for i in os.listdir(self._directory):
+            if i.startswith(f"{id(member)}-"):
+                try:
+                    os.remove(os.path.join(self._directory, i))
+                except OSError:
+                    pass
+
+    def activate(self, member: Any) -> None:
+        """
+        Marks a member as the most recently activated one and balances the memory.
+
+        Args:
+            member (Any): The activated member.
+        """
+        if member in self._members:
+            self._members.remove(member)
+            self._members.append(member)
+        self.balance()
+
+    def balance(self) -> int:
+        """
+        Spills the least recently activated members until the memory fits in the budget.
+        The most recently activated member is never spilled.
+
+        Returns:
+            int: The number of bytes used by the spilled members, freed when their spills end.
+        """
+        memory: int = self.get_memory()
+        freed: int = 0
+        for i in self._members[:-1]:
+            if memory <= self._budget:
+                break
+            before: int = i.get_memory()
+            if before == 0:
+                continue
+            if self._directory is None:
+                self._directory = tempfile.mkdtemp(prefix="imageS-VD-")
+            i.spill(self._get_path(i))
+            memory -= before
+            freed += before
+        return freed
+
+    def get_memory(self) -> int:
+        """
+        Gets the memory used by all the members.
+
+        Returns:
+            int: The sum of the sizes in bytes of the memory of the members.
+        """
+        return sum(i.get_memory() for i in self._members)
+
+    def close(self) -> None:
+        """
+        Removes the temporary directory of the spill files.
+        """
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+    def _get_path(self, member: Any) -> str:
+        """
+        Gets the path of a new spill file of a member.
+        Every spill gets its own file, so a file still mapped by the older channels of a member is never overwritten.
+
+        Args:
+            member (Any): The member.
+
+        Returns:
+            str: The path of the .isvd file in the temporary directory.
+        """
+        self._spills += 1
+        return os.path.join(self._directory, f"{id(member)}-{self._spills}.isvd")
@@ -1,3 +1,4 @@
+import os
 import functools
 import configparser
 from typing import List, Dict, Tuple
@@ -17,20 +18,27 @@ class MenuController:
         _window (Window): The window controlled by the controller.
         _actions: (Dict[str, QAction]): The dictionary of the menu actions.
         _locale: (str): The application locale.
+        CONFIG_PATH (str): The path of the configuration file.
 
     Methods:
         _get_supported_formats() -> str:
-            Gets all the supported image extensions by the app, plus the .npz extension.
+            Gets all the supported image extensions by the app, plus the .npz and .isvd extensions.
         _open() -> None:
             Opens a file.
         _save() -> None:
             Saves a file.
         _change_language(locale: str) -> None:
             Change the application language.
+        _change_cache(enabled: bool) -> None:
+            Enables or disables the disk cache of the decompositions of the next opened files.
+        _write_config(name: str, value: str) -> None:
+            Writes an option in the configuration file, keeping the other ones.
         _about() -> None:
             Shows the application about dialog.
     """
 
+    CONFIG_PATH: str = platformdirs.user_config_dir("ImageS-VD", False) + "/imageS-VD.conf"
+
     def __init__(self, window: Window, locale: str) -> None:
         """
         Creates a new MenuController.
@@ -46,6 +54,7 @@ class MenuController:
             "about": QAction(QCoreApplication.translate("Gui", "about")),
             "en": QAction("English"),
             "it": QAction("Italiano"),
+            "cache": QAction(QCoreApplication.translate("Gui", "cache")),
             "exit": QAction(QCoreApplication.translate("Gui", "exit")),
         }
         self._locale: str = locale
@@ -58,6 +67,11 @@ class MenuController:
         self._actions["en"].setCheckable(True)
         self._actions["it"].triggered.connect(functools.partial(self._change_language, "it"))
         self._actions["it"].setCheckable(True)
+        config: configparser.ConfigParser = configparser.ConfigParser()
+        config.read(MenuController.CONFIG_PATH)
+        self._actions["cache"].setCheckable(True)
+        self._actions["cache"].setChecked(config.getboolean("config", "cache", fallback=False))
+        self._actions["cache"].toggled.connect(self._change_cache)
         self._actions["about"].triggered.connect(self._about)
         self._actions["about"].setShortcut("ctrl+i")
         self._actions["exit"].triggered.connect(window.close)
@@ -77,13 +91,13 @@ class MenuController:
     @staticmethod
     def _get_supported_formats() -> str:
         """
-        Gets all the supported image extensions by the app, plus the .npz extension.
+        Gets all the supported image extensions by the app, plus the .npz and .isvd extensions.
 
         Returns:
              String: The string used as dialog filter.
         """
         supported_formats = [
-            "*.jpeg", "*.jpg", "*.jp2", "*.png", "*.npz"
+            "*.jpeg", "*.jpg", "*.jp2", "*.png", "*.npz", "*.isvd"
         ]
         return "Supported Files (" + " ".join(supported_formats) + ")"
 
@@ -110,15 +124,37 @@ class MenuController:
         Args:
             locale (str): The new language of the application.
         """
-        path: str = platformdirs.user_config_dir("ImageS-VD", False, ensure_exists=True) + "/imageS-VD.conf"
         self._actions[locale].setChecked(locale == self._locale)
-        with open(path, "w") as file:
-            config: configparser.ConfigParser = configparser.ConfigParser()
+        self._write_config("locale", locale)
+        Window.create_message_dialog(self._window, QCoreApplication.translate("Gui", "info"),
+                                     QCoreApplication.translate("Gui", "reboot"))
+
+    def _change_cache(self, enabled: bool) -> None:
+        """
+        Enables or disables the disk cache of the decompositions of the next opened files.
+        The cache keeps the full precision decompositions, up to 2 GB, so it's disabled by default.
+
+        Args:
+            enabled (bool): The flag that indicates if the decompositions are cached.
+        """
+        self._write_config("cache", str(enabled).lower())
+
+    def _write_config(self, name: str, value: str) -> None:
+        """
+        Writes an option in the configuration file, keeping the other ones.
+
+        Args:
+            name (str): The name of the option.
+            value (str): The value of the option.
+        """
+        os.makedirs(os.path.dirname(MenuController.CONFIG_PATH), exist_ok=True)
+        config: configparser.ConfigParser = configparser.ConfigParser()
+        config.read(MenuController.CONFIG_PATH)
+        if "config" not in config:
             config.add_section("config")
-            config["config"]["locale"] = locale
+        config["config"][name] = value
+        with open(MenuController.CONFIG_PATH, "w") as file:
             config.write(file)
-            Window.create_message_dialog(self._window, QCoreApplication.translate("Gui", "info"),
-                                         QCoreApplication.translate("Gui", "reboot"))
 
 
     def _about(self) -> None:
@@ -1,15 +1,19 @@
 import os
-import functools
 import logging
-from typing import List, Optional
-from PySide6.QtCore import QCoreApplication
-from PySide6.QtGui import QAction
+import threading
+from typing import List, Optional, Set
+from PySide6.QtCore import QCoreApplication, QThread
+from PySide6.QtGui import QAction, QImage
 from PySide6.QtWidgets import QMessageBox
 from src.model.compressor import Compressor
+from src.model.disk_cache import DiskCache
 from src.view.window import Window
 from src.view.panel import Panel
 from src.control.decompose_thread import DecomposeThread
 from src.control.compose_thread import ComposeThread
+from src.control.save_thread import SaveThread
+from src.control.spill_thread import SpillThread
+from src.control.memory_governor import MemoryGovernor
 
 
 class PanelController:
@@ -18,41 +22,88 @@ class PanelController:
 
     Attributes:
         _panel (Panel): The panel controlled by the controller.
-        _compressor (Compressor): The compressor used to compress the panel image.
+        _compressor (Compressor): The compressor used to compress the panel image at full resolution, it composes only
+            when saving.
         _values (int): number of image singular values.
         _save_action (QAction): The action used to save the images.
         _last_value (int): The last valid value for the singular values.
+        _k (int): The number of singular values of the last requested image.
+        _requested (int): The number of singular values of the last image requested to the _compose_thread.
+        _scale (float): The ratio between the singular values of the preview and of the full resolution image.
         _decompose_thread (DecomposeThread): The DecomposeThread used to decompose the image.
-        _threads (List[ComposeThread]): The list of ComposeThraed associated at the controller.
+        _compose_thread (Optional[ComposeThread]): The long-lived thread used to compose the previews of the panel.
+        _save_thread (Optional[SaveThread]): The thread used to save the last image.
+        _spill_thread (Optional[SpillThread]): The thread used to spill the full resolution decomposition.
+        _lock (threading.Lock): The lock of the threads using the full resolution compressor after its decomposition.
+        _reduced (bool): The flag that indicates if the full resolution image still has to be decomposed.
+        _governor (MemoryGovernor): The memory budget shared by the panels, the controller is one of its members.
+        _disk_cache (Optional[DiskCache]): The persistent cache of the decompositions, None if it's disabled.
+        _stopped (bool): The flag that indicates if the threads of the panel have been stopped.
+        _running (Set[QThread]): The stopped threads of every panel still running, kept until they are deleted.
 
     Methods:
         load_image(path: str) -> None:
             Loads and decomposes the image.
         change_value() -> None:
             Changes the number of the singular values through a QSlider.
+        move_value(position: int) -> None:
+            Shows a preview while the QSlider is dragged.
         change_line() -> None:
             Changes the value of singular values through a QLineEdit.
         save(path: str) -> None:
             Saves the image.
-        _set_image(thread: ComposeThread) -> None:
-            Sets the panel image ath the end of the _current_thread.
+        stop() -> None:
+            Stops the threads of the panel without waiting for them.
+        activate() -> None:
+            Marks the panel as the most recently activated one of the memory budget.
+        get_memory() -> int:
+            Gets the memory used by the compressors of the panel.
+        spill(path: str) -> None:
+            Frees the memory of the inactive panel.
+        _to_preview(k: int) -> int:
+            Converts a number of singular values of the full resolution image to the preview.
+        _set_image(values: int, image: QImage, seconds: float) -> None:
+            Sets the panel image composed by the _compose_thread.
+        _saved(ratio: Optional[float]) -> None:
+            Shows the compression ratio at the end of the _save_thread.
+        _release(thread: QThread) -> None:
+            Forgets a stopped thread deleted after finishing.
+        _quit() -> None:
+            Stops the threads of the panel and waits for every stopped thread before the app quits.
     """
 
-    def __init__(self, panel: Panel, save_action: QAction) -> None:
+    _running: Set[QThread] = set()
+
+    def __init__(self, panel: Panel, save_action: QAction, governor: MemoryGovernor,
+                 disk_cache: Optional[DiskCache] = None) -> None:
         """
         Creates a new PanelController.
 
         Args:
             panel (Panel): The panel controlled by the controller.
             save_action (Action): The action used to save the images.
+            governor (MemoryGovernor): The memory budget shared by the panels.
+            disk_cache (Optional[DiskCache]): The persistent cache of the decompositions, None to disable it.
         """
         self._panel: Panel = panel
         self._compressor: Compressor = Compressor()
         self._values: int = 0
         self._save_action: QAction = save_action
         self._last_value: int = 0
+        self._k: int = 0
+        self._requested: int = 0
+        self._scale: float = 1.0
         self._decompose_thread: DecomposeThread = None
-        self._threads: List[ComposeThread] = []
+        self._compose_thread: Optional[ComposeThread] = None
+        self._save_thread: Optional[SaveThread] = None
+        self._spill_thread: Optional[SpillThread] = None
+        self._lock: threading.Lock = threading.Lock()
+        self._reduced: bool = False
+        self._governor: MemoryGovernor = governor
+        self._governor.register(self)
+        self._disk_cache: Optional[DiskCache] = disk_cache
+        self._stopped: bool = False
+        QCoreApplication.instance().aboutToQuit.connect(self._quit)
 
     def load_image(self, path: str) -> None:
         """
@@ -62,30 +113,51 @@ class PanelController:
             path (str): he path to the file of the panel.
         """
         self._path = path
-        self._decompose_thread = DecomposeThread(self._compressor, self._path)
+        self._decompose_thread = DecomposeThread(self._compressor, self._path, self._disk_cache)
         self._decompose_thread.decomposed.connect(self._decomposed_image)
+        self._decompose_thread.progress.connect(self._panel.set_progress)
         self._decompose_thread.start()
 
     def change_value(self) -> None:
         """
         Changes the number of the singular values through a QSlider.
+        Nothing is composed before the image is decomposed.
         """
+        if self._compose_thread is None:
+            return
         k: int = self._panel.slider.value()
-        thread: ComposeThread = ComposeThread(self._compressor, self._values - k)
-        self._threads.append(thread)
-        thread.finished.connect(functools.partial(self._set_image, thread))
-        thread.start()
+        self._k = self._values - k
+        self._requested = self._to_preview(self._k)
+        self._compose_thread.request(self._requested)
         self._panel.slider_line.setText(str(k))
         self._last_value = k
 
+    def move_value(self, position: int) -> None:
+        """
+        Shows a preview while the QSlider is dragged.
+        The number of singular values is rounded to the prefetched ones, so most of the frames are already composed.
+
+        Args:
+            position (int): The position of the slider.
+        """
+        if self._compose_thread is None:
+            return
+        self._panel.slider_line.setText(str(position))
+        self._requested = self._compose_thread.snap(self._to_preview(self._values - position))
+        self._compose_thread.request(self._requested)
+
     def change_line(self) -> None:
         """
         Changes the value of singular values through a QLineEdit.
+        Before the image is decomposed the entry is reset, since there aren't singular values yet.
 
         Params:
             line (QLineEdit): The source of the event.
             slider (QSlider): The slider of the Panel.
         """
+        if self._compose_thread is None:
+            self._panel.slider_line.setText(str(self._last_value))
+            return
         try:
             value: int = int(self._panel.slider_line.text())
             if value >= self._values:
@@ -103,32 +175,162 @@ class PanelController:
 
     def save(self, path: str) -> None:
         """
-        Saves the image
+        Saves the image in a SaveThread.
+        The panel shows a preview, so the image is composed at full resolution only here, and a reduced image is
+        decoded and decomposed at full resolution by the first save.
 
         Args:
             path (str): The path where to save the image.
         """
-        try:
-            ratio: Optional[float] = self._compressor.save(path)
-            if ratio is not None:
-                Window.create_message_dialog(self._panel, QCoreApplication.translate("Gui", "info"),
-                            QCoreApplication.translate("Gui", "compression").format(ratio="{:.2f}".format(ratio * 100)))
-        except FileNotFoundError as ex:
-            logging.error(f"Error:\t{ex}")
+        if self._save_thread is not None and self._save_thread.isRunning():
+            return
+        self._save_thread = SaveThread(self._compressor, path, self._k, self._path if self._reduced else None,
+                                       self._lock, self._disk_cache)
+        self._save_thread.saved.connect(self._saved)
+        self._save_thread.failed.connect(lambda error: logging.error(f"Error:\t{error}"))
+        self._save_thread.progress.connect(self._panel.set_progress)
+        self._save_thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the threads of the panel without waiting for them, so closing a tab doesn't block the GUI thread.
+        Their signals are disconnected, the _compose_thread and the _decompose_thread are interrupted, and a save or
+        a spill in progress is completed. The running threads are kept until they finish and are deleted, and the app
+        waits for them before quitting. They are connected before being stopped, so none finishes unnoticed, and the
+        ones that finished while being connected are dropped by the next stop.
+        """
+        if self._stopped:
+            return
+        self._stopped = True
+        self._governor.unregister(self)
+        PanelController._running = {i for i in PanelController._running if not i.isFinished()}
+        threads: List[Optional[QThread]] = [self._decompose_thread, self._compose_thread, self._save_thread,
+                                            self._spill_thread]
+        for thread in threads:
+            if thread is not None and thread.isRunning():
+                PanelController._running.add(thread)
+                thread.finished.connect(thread.deleteLater)
+                thread.destroyed.connect(lambda *_, thread=thread: self._release(thread))
+                QCoreApplication.instance().aboutToQuit.connect(thread.wait)
+        if self._decompose_thread is not None:
+            self._decompose_thread.decomposed.disconnect()
+            self._decompose_thread.progress.disconnect()
+            self._decompose_thread.requestInterruption()
+        if self._compose_thread is not None:
+            self._compose_thread.composed.disconnect()
+            self._compose_thread.stop()
+        if self._save_thread is not None:
+            self._save_thread.saved.disconnect()
+            self._save_thread.failed.disconnect()
+            self._save_thread.progress.disconnect()
+
+    def activate(self) -> None:
+        """
+        Marks the panel as the most recently activated one of the memory budget.
+        The spilled decomposition of the panel is restored while composing, so nothing has to be loaded here.
+        """
+        self._governor.activate(self)
+
+    def get_memory(self) -> int:
+        """
+        Gets the memory used by the compressors of the panel.
+
+        Returns:
+            int: The size in bytes of the full resolution compressor and of the preview one.
+        """
+        memory: int = self._compressor.get_memory()
+        if self._decompose_thread is not None and self._decompose_thread.preview is not None:
+            memory += self._decompose_thread.preview.get_memory()
+        return memory
+
+    def spill(self, path: str) -> None:
+        """
+        Frees the memory of the inactive panel, without waiting for the files to be written.
+        The full resolution decomposition is spilled to a file by a _spill_thread, unless a thread is using it,
+        and the preview one is spilled by the _compose_thread to a file next to it.
+
+        Args:
+            path (str): The path of the .isvd file where to write the full resolution decomposition.
+        """
+        if ((self._decompose_thread is None or not self._decompose_thread.isRunning())
+                and (self._save_thread is None or not self._save_thread.isRunning())
+                and (self._spill_thread is None or not self._spill_thread.isRunning())):
+            self._spill_thread = SpillThread(self._compressor, path, self._lock)
+            self._spill_thread.start()
+        if self._compose_thread is not None:
+            self._compose_thread.spill(os.path.splitext(path)[0] + "-preview.isvd")
 
     def _decomposed_image(self, values: int) -> None:
         self._values = values
-        self._panel.set_image(self._compressor.image.squeeze(), self._values)
+        self._k = values - 1
+        self._reduced = self._decompose_thread.reduced
+        self._scale = self._decompose_thread.preview_values / values
+        self._requested = self._decompose_thread.preview_values - 1
+        preview: Compressor = self._decompose_thread.preview
+        self._panel.set_image(preview.image, self._values)
         self._save_action.setEnabled(True)
+        self._compose_thread = ComposeThread(preview, self._decompose_thread.preview_values)
+        self._compose_thread.composed.connect(self._set_image)
+        self._compose_thread.start()
+        self._governor.balance()
 
-    def _set_image(self, thread: ComposeThread) -> None:
+    def _to_preview(self, k: int) -> int:
         """
-        Sets the panel image ath the end of the _current_thread
+        Converts a number of singular values of the full resolution image to the preview.
+        A reduced preview has less singular values, so the same fraction of them is composed.
 
         Args:
-            thread (ComposeThread): the thread that emitted the signal.
+            k (int): The number of singular values of the full resolution image.
+
+        Returns:
+            int: The number of singular values of the preview.
+        """
+        return round(k * self._scale)
+
+    def _set_image(self, values: int, image: QImage, seconds: float) -> None:
+        """
+        Sets the panel image composed by the _compose_thread.
+        The signal is queued, so an image composed before a newer request can arrive after it: it's dropped,
+        and only the image of the last request is shown.
+
+        Args:
+            values (int): The number of singular values of the image.
+            image (QImage): The composed image, already scaled to the display size.
+            seconds (float): The seconds used by the _compose_thread to compose and scale the image.
+        """
+        if values != self._requested:
+            return
+        self._panel.set_image(image, seconds=seconds)
+
+    def _saved(self, ratio: Optional[float]) -> None:
+        """
+        Shows the compression ratio at the end of the _save_thread.
+
+        Args:
+            ratio (Optional[float]): The compression ratio, None if it isn't available.
+        """
+        self._reduced = False
+        self._governor.balance()
+        self._panel.set_progress(100)
+        if ratio is not None:
+            Window.create_message_dialog(self._panel, QCoreApplication.translate("Gui", "info"),
+                        QCoreApplication.translate("Gui", "compression").format(ratio="{:.2f}".format(ratio * 100)))
+
+    def _release(self, thread: QThread) -> None:
+        """
+        Forgets a stopped thread deleted after finishing.
+        A spill can end after the panel left the memory budget, so its files are deleted again.
+
+        Args:
+            thread (QThread): The deleted thread.
+        """
+        PanelController._running.discard(thread)
+        self._governor.unregister(self)
+
+    def _quit(self) -> None:
+        """
+        Stops the threads of the panel and waits for every stopped thread before the app quits.
         """
-        if self._threads and thread == self._threads[-1]:
-            self._panel.set_image(self._compressor.image.squeeze())
-        if thread in self._threads:
-            self._threads.remove(thread)
\ No newline at end of file
+        self.stop()
+        for i in list(PanelController._running):
+            i.wait()
@@ -0,0 +1,73 @@
+import os
+import threading
+import contextlib
+from typing import Optional
+from PySide6.QtCore import QThread, Signal
+from src.model.compressor import Compressor
+from src.model.disk_cache import DiskCache
+
+
+class SaveThread(QThread):
+    """
+    The class used to save the panel image at full resolution.
+    If the panel shows a reduced decomposition, the full resolution image is decoded and decomposed first,
+    or read from the disk cache, if it's enabled and the image has already been decomposed.
+
+    Attributes:
+        _compressor (Compressor): The compressor used to compress the full resolution image.
+        _path (str): The path where to save the image.
+        _k (int): The number of singular values of the saved image.
+        _source (Optional[str]): The path of the image to decompose, None if the compressor is already loaded.
+        _lock (Optional[threading.Lock]): The lock of the threads using the full resolution compressor.
+        _disk_cache (Optional[DiskCache]): The persistent cache of the decompositions, None if it's disabled.
+        saved (Signal): The signal used to return the compression ratio, None if it isn't available.
+        failed (Signal): The signal used to return the error of a failed save.
+        progress (Signal): The signal used to return the decomposed percentage of the image.
+
+    Methods:
+        run() -> None:
+            Saves the image, decomposing it if needed.
+    """
+
+    saved: Signal = Signal(object)
+    failed: Signal = Signal(str)
+    progress: Signal = Signal(int)
+
+    def __init__(self, compressor: Compressor, path: str, k: int, source: Optional[str] = None,
+                 lock: Optional[threading.Lock] = None, disk_cache: Optional[DiskCache] = None) -> None:
+        """
+        Creates a SaveThread.
+
+        Args:
+            compressor (Compressor): The compressor used to compress the full resolution image.
+            path (str): The path where to save the image.
+            k (int): The number of singular values of the saved image.
+            source (Optional[str]): The path of the image to decompose, None if the compressor is already loaded.
+            lock (Optional[threading.Lock]): The lock of the threads using the full resolution compressor.
+            disk_cache (Optional[DiskCache]): The persistent cache of the decompositions, None to disable it.
+        """
+        super().__init__()
+        self._compressor: Compressor = compressor
+        self._path: str = path
+        self._k: int = k
+        self._source: Optional[str] = source
+        self._lock: Optional[threading.Lock] = lock
+        self._disk_cache: Optional[DiskCache] = disk_cache
+
+    def run(self) -> None:
+        """
+        Saves the image, decomposing it if needed.
+        A spill of the compressor in progress is waited for.
+        """
+        try:
+            with self._lock if self._lock is not None else contextlib.nullcontext():
+                if self._source is not None:
+                    self.progress.emit(0)
+                    self._compressor.load(self._source, progress=lambda i: self.progress.emit(int(i * 100)),
+                                          disk_cache=self._disk_cache)
+                if os.path.splitext(self._path)[1] not in Compressor.DECOMPOSITION_FORMATS:
+                    self._compressor.compose(self._k)
+                ratio: Optional[float] = self._compressor.save(self._path)
+            self.saved.emit(ratio)
+        except Exception as ex:
+            self.failed.emit(str(ex))
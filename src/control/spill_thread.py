@@ -0,0 +1,45 @@
+import logging
+import threading
+from PySide6.QtCore import QThread
+from src.model.compressor import Compressor
+
+
+class SpillThread(QThread):
+    """
+    The class used to spill the full resolution decomposition of an inactive panel to a file.
+    Writing a large decomposition takes seconds, so it's done here instead of blocking the tab change.
+
+    Attributes:
+        _compressor (Compressor): The compressor used to compress the full resolution image.
+        _path (str): The path of the .isvd file where to write the decomposition.
+        _lock (threading.Lock): The lock of the threads using the full resolution compressor.
+
+    Methods:
+        run() -> None:
+            Spills the compressor, logging a failed write.
+    """
+
+    def __init__(self, compressor: Compressor, path: str, lock: threading.Lock) -> None:
+        """
+        Creates a SpillThread.
+
+        Args:
+            compressor (Compressor): The compressor used to compress the full resolution image.
+            path (str): The path of the .isvd file where to write the decomposition.
+            lock (threading.Lock): The lock of the threads using the full resolution compressor.
+        """
+        super().__init__()
+        self._compressor: Compressor = compressor
+        self._path: str = path
+        self._lock: threading.Lock = lock
+
+    def run(self) -> None:
+        """
+        Spills the compressor, logging a failed write.
+        A failed spill keeps the decomposition in memory.
+        """
+        try:
+            with self._lock:
+                self._compressor.spill(self._path)
+        except OSError as ex:
+            logging.error(f"Error:\t{ex}")
@@ -1,6 +1,7 @@
-from typing import Dict
+from typing import Dict, Optional, Tuple
 import numpy as np
 from PySide6.QtCore import QCoreApplication
+from src.model.stats import Stats
 
 
 class Channel:
@@ -11,28 +12,201 @@ class Channel:
         _u (np.ndarray): The matrix of the left singular vectors.
         _s (np.ndarray: The matrix of the singular values.
         _vt (np.ndarray): The matrix of right singular vectors.
+        _scale (Optional[np.ndarray]): The factor of each singular value for quantized u and vt matrices.
+        _source (Optional[Tuple[np.ndarray, np.ndarray]]): The whole u and vt matrices of a lazy channel, usually memory mapped.
+        _loaded (int): The number of columns of u and rows of vt loaded in memory.
+        _norm (float): The squared Frobenius norm of the decomposed matrix.
+        OVERSAMPLING (int): The number of extra samples used by the randomized range finder.
+        POWER_ITERATIONS (int): The number of power iterations used by the randomized range finder.
+        INITIAL_RANK (int): The first rank tried when only a tolerance is provided.
 
     Methods:
+        from_factors(u: np.ndarray, s: np.ndarray, vt: np.ndarray, scale: Optional[np.ndarray] = None, lazy: bool = False, norm: Optional[float] = None) -> Channel:
+            Creates a Channel from already computed u, s and vt matrices.
+        to_dict() -> Dict[str, Optional[np.ndarray]]:
+            Gets the dictionary of the whole u, s, vt and scale matrices.
         get_singular_values() -> int:
             Gets the number of the singular values of the channel.
-        compose(k: int) -> np.ndarray:
+        get_errors() -> np.ndarray:
+            Gets the squared Frobenius error of the composition for each number of singular values.
+        downsample(step: int, period: Optional[int] = None) -> Channel:
+            Gets the decomposition of the matrix averaged over blocks of step x step elements.
+        compose(k: int, out: Optional[np.ndarray] = None, buffer: Optional[np.ndarray] = None, start: int = 0) -> np.ndarray:
             Compose the matrix from u, s and vt.
+        unload() -> None:
+            Removes from memory the columns of u and rows of vt loaded by a lazy channel.
+        _randomized_svd(matrix: np.ndarray, rank: Optional[int], tolerance: Optional[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+            Computes a rank limited SVD decomposition with a randomized range finder.
+        _load(k: int) -> None:
+            Loads in memory the first k columns of u and rows of vt of a lazy channel.
+        _average_blocks(array: np.ndarray, step: int, period: int, axis: int, dtype: np.dtype) -> np.ndarray:
+            Averages an array over blocks of step elements along an axis, restarting the blocks every period elements.
     """
 
-    def __init__(self, matrix: np.ndarray) -> None:
+    OVERSAMPLING: int = 20
+    POWER_ITERATIONS: int = 4
+    INITIAL_RANK: int = 64
+
+    def __init__(self, matrix: np.ndarray, rank: Optional[int] = None, tolerance: Optional[float] = None,
+                 dtype: np.dtype = np.float64) -> None:
         """
         Create a Channel instance.
+        If rank or tolerance are provided, only the largest singular values are computed.
 
         Args:
             matrix (np.ndarray): The matrix to decomposed or a np.ndarray containing the u, s and vt values.
+            rank (Optional[int]): The maximum number of singular values to compute.
+            tolerance (Optional[float]): The minimum ratio between a singular value and the largest one to keep it.
+            dtype (np.dtype): The floating point type used for the decomposition and the u, s and vt matrices.
         """
         if len(matrix.shape) == 0:
             channel: Dict = matrix.item()
             self._u: np.ndarray = channel["_u"]
             self._s: np.ndarray = channel["_s"]
             self._vt: np.ndarray = channel["_vt"]
+            self._scale: Optional[np.ndarray] = channel.get("_scale")
+            self._norm: float = channel.get("_norm")
+            if self._norm is None:
+                self._norm = float(np.sum(np.square(self._s, dtype=np.float64)))
+            self._source: Optional[Tuple[np.ndarray, np.ndarray]] = None
+            self._loaded: int = self._s.shape[0]
+            if channel.get("_lazy", False):
+                self._source = (self._u, self._vt)
+                self._u = np.empty((self._u.shape[0], 0), self._u.dtype, order="F")
+                self._vt = np.empty((0, self._vt.shape[1]), self._vt.dtype)
+                self._s = np.array(self._s)
+                self._loaded = 0
             return
-        self._u, self._s, self._vt = np.linalg.svd(matrix, full_matrices=False)
+        self._scale = None
+        self._source = None
+        matrix = matrix.astype(dtype, copy=False)
+        self._norm = float(np.einsum("ij,ij->", matrix, matrix, dtype=np.float64))
+        with Stats.span("svd"):
+            if rank is None and tolerance is None:
+                self._u, self._s, self._vt = np.linalg.svd(matrix, full_matrices=False)
+            else:
+                self._u, self._s, self._vt = Channel._randomized_svd(matrix, rank, tolerance)
+        self._loaded = self._s.shape[0]
+
+    @staticmethod
+    def from_factors(u: np.ndarray, s: np.ndarray, vt: np.ndarray, scale: Optional[np.ndarray] = None,
+                     lazy: bool = False, norm: Optional[float] = None) -> "Channel":
+        """
+        Creates a Channel from already computed u, s and vt matrices.
+        A lazy channel copies in memory only the columns of u and rows of vt used by the compositions.
+
+        Args:
+            u (np.ndarray): The matrix of the left singular vectors.
+            s (np.ndarray): The matrix of the singular values.
+            vt (np.ndarray): The matrix of right singular vectors.
+            scale (Optional[np.ndarray]): The factor of each singular value for quantized u and vt matrices.
+            lazy (bool): The flag that indicates if u and vt are loaded on demand.
+            norm (Optional[float]): The squared Frobenius norm of the decomposed matrix, by default the one of the composition.
+
+        Returns:
+            Channel: The created channel.
+        """
+        return Channel(np.array({"_u": u, "_s": s, "_vt": vt, "_scale": scale, "_lazy": lazy, "_norm": norm}))
+
+    @property
+    def factors(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Gets the decomposition of the channel.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: The u, s and vt matrices.
+        """
+        if self._source is not None:
+            return (self._source[0], self._s, self._source[1])
+        return (self._u, self._s, self._vt)
+
+    @property
+    def loaded(self) -> int:
+        """
+        Gets the number of singular values loaded in memory.
+
+        Returns:
+            int: The number of columns of u and rows of vt in memory.
+        """
+        return self._loaded
+
+    @property
+    def lazy(self) -> bool:
+        """
+        Gets if the channel loads u and vt on demand.
+
+        Returns:
+            bool: True if u and vt are loaded from their whole, usually memory mapped, matrices.
+        """
+        return self._source is not None
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Gets the memory used by the decomposition.
+
+        Returns:
+            int: The size in bytes of the u, s, vt and scale matrices in memory, the memory mapped ones excluded.
+        """
+        return sum(i.nbytes for i in (self._u, self._s, self._vt, self._scale)
+                   if i is not None and not isinstance(i, np.memmap))
+
+    @property
+    def scale(self) -> Optional[np.ndarray]:
+        """
+        Gets the quantization scale of the channel.
+
+        Returns:
+            Optional[np.ndarray]: The factor of each singular value, None if u and vt aren't quantized.
+        """
+        return self._scale
+
+    @property
+    def norm(self) -> float:
+        """
+        Gets the norm of the decomposed matrix.
+
+        Returns:
+            float: The squared Frobenius norm of the decomposed matrix.
+        """
+        return self._norm
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """
+        Gets the shape of the decomposed matrix.
+
+        Returns:
+            Tuple[int, int]: The number of rows and columns of the matrix.
+        """
+        return (self._u.shape[0], self._vt.shape[1])
+
+    @property
+    def dtype(self) -> np.dtype:
+        """
+        Gets the type of the composed matrix.
+
+        Returns:
+            np.dtype: The type of the u, s and vt matrices.
+        """
+        return np.result_type(self._u, self._s, self._vt)
+
+    def __getstate__(self) -> Dict[str, Optional[np.ndarray]]:
+        return self.to_dict()
+
+    def __setstate__(self, state: Dict[str, Optional[np.ndarray]]) -> None:
+        self.__init__(np.array(state))
+
+    def to_dict(self) -> Dict[str, Optional[np.ndarray]]:
+        """
+        Gets the dictionary of the whole u, s, vt and scale matrices.
+        The matrices of a lazy channel are read from their source, decompressing them if needed.
+
+        Returns:
+            Dict[str, Optional[np.ndarray]]: The dictionary used to save the channel.
+        """
+        u, s, vt = self.factors
+        return {"_u": np.asarray(u), "_s": s, "_vt": np.asarray(vt), "_scale": self._scale, "_norm": self._norm}
 
     def get_singular_values(self) -> int:
         """
@@ -43,12 +217,59 @@ class Channel:
         """
         return self._s.shape[0]
 
-    def compose(self, k: int) -> np.ndarray:
+    def get_errors(self) -> np.ndarray:
+        """
+        Gets the squared Frobenius error of the composition for each number of singular values.
+        By the Eckart-Young theorem, it's the norm of the matrix minus the squares of the used singular values.
+
+        Returns:
+            np.ndarray: The squared errors of the compositions from 0 to all the singular values.
+        """
+        errors: np.ndarray = np.empty(self._s.shape[0] + 1)
+        errors[0] = self._norm
+        errors[1:] = self._norm - np.cumsum(np.square(self._s, dtype=np.float64))
+        return np.maximum(errors, 0, out=errors)
+
+    def downsample(self, step: int, period: Optional[int] = None) -> "Channel":
+        """
+        Gets the decomposition of the matrix averaged over blocks of step x step elements.
+        Averaging the rows of u and the columns of vt by blocks gives the factors of the averaged matrix,
+        so its compositions cost (rows / step) * (columns / step) * k instead of rows * columns * k.
+        The last rows and columns that don't fill a block are dropped, unless a period is provided: then the blocks
+        restart every period rows and columns, like at the edges of the tiles of a TiledChannel, and the last block of
+        each period is averaged over the elements it has.
+        The norm is divided by the number of elements of a block, so the mean errors are the ones of the whole matrix.
+
+        Args:
+            step (int): The number of rows and columns averaged together.
+            period (Optional[int]): The number of rows and columns after which the blocks restart.
+
+        Returns:
+            Channel: The decomposition of the averaged matrix, with the same singular values.
+        """
+        u, s, vt = self.factors
+        if period is not None:
+            u = Channel._average_blocks(u, step, period, 0, self.dtype)
+            vt = Channel._average_blocks(vt, step, period, 1, self.dtype)
+        else:
+            rows: int = u.shape[0] // step
+            columns: int = vt.shape[1] // step
+            u = np.asarray(u[:rows * step]).reshape(rows, step, u.shape[1]).mean(axis=1, dtype=self.dtype)
+            vt = np.asarray(vt[:, :columns * step]).reshape(vt.shape[0], columns, step).mean(axis=2, dtype=self.dtype)
+        return Channel.from_factors(np.asfortranarray(u), s, vt, self._scale, norm=self._norm / step ** 2)
+
+    def compose(self, k: int, out: Optional[np.ndarray] = None, buffer: Optional[np.ndarray] = None,
+                start: int = 0) -> np.ndarray:
         """
         Compose the matrix from u, s and vt.
+        The columns of u are scaled by s into buffer, so no diagonal matrix is built.
+        With a start greater than 0, only the rank one terms from start to k are summed.
 
         Args;
             k (int): The number of singular values to use in the composition.
+            out (Optional[np.ndarray]): The matrix where to write the result, it must have the channel shape and dtype.
+            buffer (Optional[np.ndarray]): A flat array of at least rows * (k - start) elements of the channel dtype used for the scaled u.
+            start (int): The index of the first singular value to use in the composition.
 
         Returns:
             np.ndarray The composed matrix.
@@ -58,4 +279,102 @@ class Channel:
         """
         if k > len(self._s):
             raise ValueError(QCoreApplication.translate("Cli", "values").format(values=k, max=len(self._s)))
-        return self._u[:, :k] @ np.diag(self._s[:k]) @ self._vt[:k, :]
+        self._load(k)
+        size: int = self._u.shape[0] * (k - start)
+        if buffer is None:
+            buffer = np.empty(size, self.dtype)
+        scaled: np.ndarray = buffer[:size].reshape(self._u.shape[0], k - start)
+        weights: np.ndarray = self._s[start:k]
+        if self._scale is not None:
+            weights = weights * self._scale[start:k]
+        with Stats.span("matmul"):
+            np.multiply(self._u[:, start:k], weights, out=scaled)
+            return np.matmul(scaled, self._vt[start:k, :], out=out)
+
+    def unload(self) -> None:
+        """
+        Removes from memory the columns of u and rows of vt loaded by a lazy channel.
+        The next composition loads them again from the whole matrices.
+        """
+        if self._source is None:
+            return
+        self._u = np.empty((self._u.shape[0], 0), self._u.dtype, order="F")
+        self._vt = np.empty((0, self._vt.shape[1]), self._vt.dtype)
+        self._loaded = 0
+
+    @staticmethod
+    def _randomized_svd(matrix: np.ndarray, rank: Optional[int],
+                        tolerance: Optional[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Computes a rank limited SVD decomposition with a randomized range finder.
+        Without a rank, the range is doubled until the smallest singular value found is under the tolerance.
+
+        Args:
+            matrix (np.ndarray): The floating point matrix to decompose.
+            rank (Optional[int]): The maximum number of singular values to compute.
+            tolerance (Optional[float]): The minimum ratio between a singular value and the largest one to keep it.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: The u, s and vt matrices.
+        """
+        max_rank: int = min(matrix.shape)
+        target: int = min(rank, max_rank) if rank is not None else min(Channel.INITIAL_RANK, max_rank)
+        generator: np.random.Generator = np.random.default_rng(0)
+        while True:
+            size: int = target + Channel.OVERSAMPLING
+            if size >= max_rank:
+                u, s, vt = np.linalg.svd(matrix, full_matrices=False)
+            else:
+                q, _ = np.linalg.qr(matrix @ generator.standard_normal((matrix.shape[1], size), matrix.dtype))
+                for _ in range(Channel.POWER_ITERATIONS):
+                    z, _ = np.linalg.qr(matrix.T @ q)
+                    q, _ = np.linalg.qr(matrix @ z)
+                ub, s, vt = np.linalg.svd(q.T @ matrix, full_matrices=False)
+                u = q @ ub
+            u, s, vt = u[:, :target], s[:target], vt[:target, :]
+            if tolerance is None:
+                break
+            below: np.ndarray = np.flatnonzero(s < tolerance * s[0])
+            if below.shape[0] > 0 or rank is not None or target >= max_rank:
+                if below.shape[0] > 0:
+                    u, s, vt = u[:, :below[0]], s[:below[0]], vt[:below[0], :]
+                break
+            target = min(target * 2, max_rank)
+        return np.ascontiguousarray(u), s, np.ascontiguousarray(vt)
+
+    @staticmethod
+    def _average_blocks(array: np.ndarray, step: int, period: int, axis: int, dtype: np.dtype) -> np.ndarray:
+        """
+        Averages an array over blocks of step elements along an axis, restarting the blocks every period elements.
+
+        Args:
+            array (np.ndarray): The u or vt matrix.
+            step (int): The number of elements averaged together.
+            period (int): The number of elements after which the blocks restart.
+            axis (int): The axis of the averaged elements, 0 for u and 1 for vt.
+            dtype (np.dtype): The floating point type of the result.
+
+        Returns:
+            np.ndarray: The averaged matrix, with ceil(period / step) elements for each whole period.
+        """
+        size: int = array.shape[axis]
+        starts: np.ndarray = np.array([j for i in range(0, size, period) for j in range(i, min(i + period, size), step)])
+        counts: np.ndarray = np.diff(np.append(starts, size)).astype(dtype)
+        sums: np.ndarray = np.add.reduceat(np.asarray(array), starts, axis, dtype)
+        return sums / (counts[:, None] if axis == 0 else counts)
+
+    def _load(self, k: int) -> None:
+        """
+        Loads in memory the first k columns of u and rows of vt of a lazy channel.
+        The loaded prefix grows at least by half, so a slowly increasing k doesn't copy it at every composition.
+
+        Args:
+            k (int): The number of singular values needed by the composition.
+        """
+        if self._source is None or k <= self._loaded:
+            return
+        size: int = min(max(k, self._loaded + self._loaded // 2), self._s.shape[0])
+        u, vt = self._source
+        self._u = np.array(u[:, :size], order="F")
+        self._vt = np.array(vt[:size, :])
+        self._loaded = size
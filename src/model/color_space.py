@@ -0,0 +1,102 @@
+from typing import List, Tuple
+import numpy as np
+
+
+class ColorSpace:
+    """
+    The conversions between the RGB and the YCbCr color spaces, with the full range coefficients used by JPEG.
+    The chroma planes can be subsampled, they are upsampled again only while converting back to RGB.
+
+    Attributes:
+        COLOR_SPACES (Tuple[str, ...]): The supported color spaces of the decomposed channels.
+        OFFSET (float): The value added to the chroma planes, so they have the same range of the RGB channels.
+        TO_YCBCR (np.ndarray): The matrix converting an RGB pixel to YCbCr, without the chroma offset.
+        TO_RGB (np.ndarray): The matrix converting a YCbCr pixel without the chroma offset to RGB.
+
+    Methods:
+        to_ycbcr(image: np.ndarray, dtype: np.dtype = np.float64) -> List[np.ndarray]:
+            Converts an RGB image to the luma and chroma planes.
+        subsample(plane: np.ndarray, step: int) -> np.ndarray:
+            Averages a plane over blocks of step x step elements.
+        to_rgb(planes: List[np.ndarray], out: np.ndarray, buffer: np.ndarray, step: int = 1) -> None:
+            Converts the luma and chroma planes to a clipped RGB image.
+    """
+
+    COLOR_SPACES: Tuple[str, ...] = ("rgb", "ycbcr")
+    OFFSET: float = 128.0
+    TO_YCBCR: np.ndarray = np.array([
+        [0.299, 0.587, 0.114],
+        [-0.168736, -0.331264, 0.5],
+        [0.5, -0.418688, -0.081312]
+    ])
+    TO_RGB: np.ndarray = np.array([
+        [1.0, 0.0, 1.402],
+        [1.0, -0.344136, -0.714136],
+        [1.0, 1.772, 0.0]
+    ])
+
+    @staticmethod
+    def to_ycbcr(image: np.ndarray, dtype: np.dtype = np.float64) -> List[np.ndarray]:
+        """
+        Converts an RGB image to the luma and chroma planes.
+
+        Args:
+            image (np.ndarray): The image, with the channels on the last axis.
+            dtype (np.dtype): The floating point type of the planes.
+
+        Returns:
+            List[np.ndarray]: The Y, Cb and Cr planes, each one contiguous.
+        """
+        planes: np.ndarray = np.tensordot(ColorSpace.TO_YCBCR.astype(dtype), image.astype(dtype, copy=False),
+                                          axes=([1], [2]))
+        planes[1:] += ColorSpace.OFFSET
+        return list(planes)
+
+    @staticmethod
+    def subsample(plane: np.ndarray, step: int) -> np.ndarray:
+        """
+        Averages a plane over blocks of step x step elements.
+        The last rows and columns are repeated to fill the last blocks, so the whole plane is covered.
+
+        Args:
+            plane (np.ndarray): The plane to subsample.
+            step (int): The number of rows and columns averaged together.
+
+        Returns:
+            np.ndarray: The subsampled plane, with ceil(rows / step) rows and ceil(columns / step) columns.
+        """
+        if step == 1:
+            return plane
+        rows: int = -(-plane.shape[0] // step)
+        columns: int = -(-plane.shape[1] // step)
+        padded: np.ndarray = np.pad(plane, ((0, rows * step - plane.shape[0]), (0, columns * step - plane.shape[1])),
+                                    mode="edge")
+        return padded.reshape(rows, step, columns, step).mean(axis=(1, 3), dtype=plane.dtype)
+
+    @staticmethod
+    def to_rgb(planes: List[np.ndarray], out: np.ndarray, buffer: np.ndarray, step: int = 1) -> None:
+        """
+        Converts the luma and chroma planes to a clipped RGB image.
+        The chroma terms of each RGB channel are computed at the chroma resolution and added to the strided views
+        of the luma, so the subsampled planes are never upsampled in memory.
+        The step is given instead of inferred from the shapes, which is ambiguous for small planes: 5 rows subsampled
+        by 4 give 2 rows, like 5 rows subsampled by 3.
+
+        Args:
+            planes (List[np.ndarray]): The Y, Cb and Cr planes, the chroma ones with the same shape.
+            out (np.ndarray): The uint8 image where to write the result, with the shape of the luma and 3 channels.
+            buffer (np.ndarray): A matrix with the shape of the luma, used for each RGB channel.
+            step (int): The number of rows and columns of the luma averaged in a chroma element.
+        """
+        chroma: np.ndarray = np.empty(planes[1].shape, buffer.dtype)
+        for i in range(3):
+            np.copyto(buffer, planes[0])
+            cb, cr = ColorSpace.TO_RGB[i, 1:]
+            np.multiply(planes[1], cb, out=chroma)
+            chroma += planes[2] * cr
+            chroma -= ColorSpace.OFFSET * (cb + cr)
+            for j in range(step):
+                for k in range(step):
+                    view: np.ndarray = buffer[j::step, k::step]
+                    view += chroma[:view.shape[0], :view.shape[1]]
+            np.clip(buffer, 0, 255, out=out[:, :, i], casting="unsafe")
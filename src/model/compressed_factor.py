@@ -0,0 +1,153 @@
+import lzma
+import zlib
+from typing import Any, Callable, List, Optional, Tuple
+import numpy as np
+
+
+class CompressedFactor:
+    """
+    A u or vt matrix of a decomposition file, compressed in chunks of singular values and decompressed on demand.
+    The chunks follow the columns of u and the rows of vt, so a rank prefix decompresses only the chunks covering it,
+    and a lazy channel still loads only the singular values used by its compositions.
+
+    Attributes:
+        _mapping (np.ndarray): The bytes of the whole file, usually memory mapped.
+        _offsets (List[int]): The offset of each chunk in the file, followed by the end of the last one.
+        _shape (Tuple[int, int]): The number of rows and columns of the matrix.
+        _dtype (np.dtype): The type of the matrix.
+        _order (str): The memory layout of the matrix, "F" for u and "C" for vt.
+        _compression (str): The compression of the chunks, zlib or lzma.
+        _chunk_size (int): The number of singular values in a chunk.
+        COMPRESSIONS (Tuple[str, ...]): The supported compressions of the chunks.
+
+    Methods:
+        compress(array: np.ndarray, order: str, compression: str, chunk_size: int) -> List[bytes]:
+            Compresses a matrix in chunks of singular values.
+        __getitem__(key: Any) -> np.ndarray:
+            Gets a slice of the matrix, decompressing only the chunks of the rank prefix it needs.
+        __array__(dtype: Optional[np.dtype] = None, copy: Optional[bool] = None) -> np.ndarray:
+            Gets the whole decompressed matrix.
+        _decompress(count: int) -> np.ndarray:
+            Decompresses the chunks of the first count singular values.
+    """
+
+    COMPRESSIONS: Tuple[str, ...] = ("zlib", "lzma")
+
+    def __init__(self, mapping: np.ndarray, offsets: List[int], shape: Tuple[int, int], dtype: np.dtype, order: str,
+                 compression: str, chunk_size: int) -> None:
+        """
+        Creates a CompressedFactor.
+
+        Args:
+            mapping (np.ndarray): The bytes of the whole file, usually memory mapped.
+            offsets (List[int]): The offset of each chunk in the file, followed by the end of the last one.
+            shape (Tuple[int, int]): The number of rows and columns of the matrix.
+            dtype (np.dtype): The type of the matrix.
+            order (str): The memory layout of the matrix, "F" for u and "C" for vt.
+            compression (str): The compression of the chunks, zlib or lzma.
+            chunk_size (int): The number of singular values in a chunk.
+        """
+        self._mapping: np.ndarray = mapping
+        self._offsets: List[int] = offsets
+        self._shape: Tuple[int, int] = shape
+        self._dtype: np.dtype = np.dtype(dtype)
+        self._order: str = order
+        self._compression: str = compression
+        self._chunk_size: int = chunk_size
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """
+        Gets the shape of the matrix.
+
+        Returns:
+            Tuple[int, int]: The number of rows and columns of the matrix.
+        """
+        return self._shape
+
+    @property
+    def dtype(self) -> np.dtype:
+        """
+        Gets the type of the matrix.
+
+        Returns:
+            np.dtype: The type of the decompressed elements.
+        """
+        return self._dtype
+
+    @staticmethod
+    def compress(array: np.ndarray, order: str, compression: str, chunk_size: int) -> List[bytes]:
+        """
+        Compresses a matrix in chunks of singular values.
+
+        Args:
+            array (np.ndarray): The u or vt matrix.
+            order (str): The memory layout of the matrix, "F" for u and "C" for vt.
+            compression (str): The compression of the chunks, zlib or lzma.
+            chunk_size (int): The number of singular values in a chunk.
+
+        Returns:
+            List[bytes]: The compressed chunks, from the first singular values.
+
+        Raises:
+            ValueError: if the compression isn't supported.
+        """
+        if compression not in CompressedFactor.COMPRESSIONS:
+            raise ValueError(f"Unsupported compression: {compression}")
+        axis: int = 1 if order == "F" else 0
+        chunks: List[bytes] = []
+        for i in range(0, array.shape[axis], chunk_size):
+            chunk: np.ndarray = array[:, i:i + chunk_size] if axis == 1 else array[i:i + chunk_size]
+            data: bytes = np.asarray(chunk).tobytes(order)
+            chunks.append(zlib.compress(data) if compression == "zlib" else lzma.compress(data))
+        return chunks
+
+    def __getitem__(self, key: Any) -> np.ndarray:
+        """
+        Gets a slice of the matrix, decompressing only the chunks of the rank prefix it needs.
+
+        Args:
+            key (Any): The index of the matrix, like [:, :k] for u or [:k] for vt.
+
+        Returns:
+            np.ndarray: The read only slice.
+        """
+        axis: int = 1 if self._order == "F" else 0
+        keys: Tuple[Any, ...] = key if isinstance(key, tuple) else (key,)
+        index: Any = keys[axis] if axis < len(keys) else slice(None)
+        count: int = self._shape[axis]
+        if (isinstance(index, slice) and index.step is None and (index.start or 0) >= 0 and index.stop is not None
+                and index.stop >= 0):
+            count = min(count, index.stop)
+        return self._decompress(count)[key]
+
+    def __array__(self, dtype: Optional[np.dtype] = None, copy: Optional[bool] = None) -> np.ndarray:
+        """
+        Gets the whole decompressed matrix.
+
+        Args:
+            dtype (Optional[np.dtype]): The type of the result, by default the one of the matrix.
+            copy (Optional[bool]): Ignored, the matrix is always decompressed in a new array.
+
+        Returns:
+            np.ndarray: The decompressed matrix.
+        """
+        array: np.ndarray = self._decompress(self._shape[1 if self._order == "F" else 0])
+        return array if dtype is None else array.astype(dtype)
+
+    def _decompress(self, count: int) -> np.ndarray:
+        """
+        Decompresses the chunks of the first count singular values.
+
+        Args:
+            count (int): The number of singular values needed.
+
+        Returns:
+            np.ndarray: The read only matrix of the decompressed chunks, which can have more than count singular values.
+        """
+        chunks: int = -(-count // self._chunk_size)
+        decompress: Callable[[Any], bytes] = zlib.decompress if self._compression == "zlib" else lzma.decompress
+        data: bytes = b"".join(decompress(self._mapping[self._offsets[i]:self._offsets[i + 1]]) for i in range(chunks))
+        size: int = min(chunks * self._chunk_size, self._shape[1 if self._order == "F" else 0])
+        shape: Tuple[int, int] = (self._shape[0], size) if self._order == "F" else (size, self._shape[1])
+        return np.frombuffer(data, self._dtype).reshape(shape, order=self._order)
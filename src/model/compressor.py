@@ -1,10 +1,25 @@
+import io
 import logging
 import os
-from typing import List, Dict, Optional
+import tempfile
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Iterable, Iterator, List, Dict, Optional, Sequence, Tuple, Union
 import numpy as np
 from PIL import Image
 from PySide6.QtCore import QCoreApplication
 from src.model.channel import Channel
+from src.model.color_space import ColorSpace
+from src.model.lru_cache import LRUCache
+from src.model.tiled_channel import TiledChannel
+from src.model.decomposition_file import DecompositionFile
+from src.model.disk_cache import DiskCache
+from src.model.stats import Stats
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
 
 
 class Compressor:
@@ -13,31 +28,101 @@ class Compressor:
 
     Attributes:
         _path (str): The path to the image to compress.
-        _channels (List[Channel]): The channels of the decomposed image.
-        _image (np.ndarray): The image ndarray.
+        _size (Optional[int]): The minimum number of rows and columns of the reduced image, None at full resolution.
+        _channels (List[Union[Channel, TiledChannel]]): The channels of the decomposed image.
+        _color_space (str): The color space of the channels, rgb or ycbcr.
+        _subsampling (int): The number of rows and columns of the luma averaged in a chroma element, 1 for rgb.
+        _image (np.ndarray): The image ndarray, it's read only when it comes from the cache.
+        _output (np.ndarray): The reusable image ndarray where the channels are composed.
+        _cache (LRUCache): The cache of the composed images by number of singular values, or by tuple of them.
+        _workers (int): The maximum number of channels decomposed concurrently.
+        _accumulators (List[np.ndarray]): The unclipped compositions of the channels.
+        _ranks (List[int]): The number of singular values summed in each accumulator.
+        _updates (List[int]): The number of incremental updates of each accumulator since its last full composition.
+        _scratch (np.ndarray): The reusable flat array used for the rank deltas and the clipping.
+        _scaled (np.ndarray): The reusable flat array where the scaled left singular vectors are stored.
+        MAX_UPDATES (int): The number of incremental updates after which an accumulator is fully composed again.
+        CHUNK_SIZE (int): The number of singular values added or subtracted between two checks of the cancellation.
+        PREVIEW_SIZE (int): The default minimum number of rows and columns of a preview.
+        CACHE_SIZE (int): The default maximum size in bytes of the cached images.
+        DECOMPOSITION_FORMATS (Tuple[str, ...]): The extensions of the files containing decomposed images.
+        _sequential (bool): The flag that indicates if the sequential decomposition without threadpoolctl has been
+            logged.
 
     Methods:
         get_compression_rate(original_file: str, compressed_file: str) -> float:
             Calculates the compression rate of a result image.
-        load(path: str) -> int:
+        load(path: str, rank: Optional[int] = None, tolerance: Optional[float] = None, dtype: np.dtype = np.float64, tile_size: Optional[int] = None, size: Optional[int] = None, progress: Optional[Callable[[float], None]] = None, color_space: str = "rgb", chroma_rank: Optional[int] = None, subsampling: int = 1, disk_cache: Optional[DiskCache] = None) -> int:
             Loads an image to compress.
-        compose(k: int) -> None:
+        compose(k: Union[int, Sequence[int]], cancel: Optional[Callable[[], bool]] = None) -> bool:
             Composes a compressed image.
-        save(path: str) -> Optional[float]:
+        get_preview(size: int = PREVIEW_SIZE) -> Compressor:
+            Gets a compressor of the image downsampled to about the display resolution.
+        get_metrics() -> Dict[str, np.ndarray]:
+            Gets the quality metrics of the compositions for each number of singular values, without composing them.
+        verify_metrics(ks: Iterable[int]) -> Dict[str, np.ndarray]:
+            Gets the quality metrics of the clipped compositions of some numbers of singular values.
+        get_tradeoffs(rank: Optional[int] = None) -> List[Dict[str, Any]]:
+            Gets the size and the error of the .isvd files of every quantization and compression.
+        select_rank(energy: Optional[float] = None, psnr: Optional[float] = None, size: Optional[int] = None, ext: str = ".jpg") -> int:
+            Selects the number of singular values meeting quality and size targets.
+        sweep(ks: Iterable[int]) -> Iterator[int]:
+            Composes the compressed images of many numbers of singular values.
+        save(path: str, rank: Optional[int] = None, quantization: Optional[str] = None, compression: Optional[str] = None) -> Optional[float]:
             Saves a compressed image.
+        get_memory() -> int:
+            Gets the memory used by the decomposition, the composition buffers and the cache.
+        spill(path: str) -> None:
+            Moves the decomposition to a memory mapped .isvd file and frees the composition buffers and the cache.
+        _decode() -> np.ndarray:
+            Decodes the image to compress, reduced like the decomposed one.
         _load_channels(path: str) -> int:
-            Loads the decomposed image channels from a .npz file.
-        _save_channels(path: str) -> None:
-            Saves the decomposed channels on a .npz file.
+            Loads the decomposed image channels from a .npz or .isvd file.
+        _save_channels(path: str, rank: Optional[int] = None, quantization: Optional[str] = None, compression: Optional[str] = None) -> None:
+            Saves the decomposed channels on a .npz or .isvd file.
+        _get_encoded_size(ext: str) -> int:
+            Gets the size in bytes of the image encoded with the format of an extension.
+        _get_ranks(k: Union[int, Sequence[int]]) -> List[int]:
+            Gets the number of singular values of each channel.
+        _get_steps() -> List[int]:
+            Gets the subsampling step of each channel, relative to the first one.
+        _infer_subsampling() -> int:
+            Infers the subsampling of the chroma channels of a file written before it was stored.
+        _prepare_buffers(k: int) -> None:
+            Allocates the composition buffers if they are missing or too small.
+        _compose_channel(index: int, k: int, cancel: Optional[Callable[[], bool]] = None) -> bool:
+            Moves the accumulator of a channel to k singular values.
     """
 
-    def __init__(self) -> None:
+    MAX_UPDATES: int = 32
+    CHUNK_SIZE: int = 64
+    PREVIEW_SIZE: int = 400
+    CACHE_SIZE: int = 256 * 1024 ** 2
+    DECOMPOSITION_FORMATS: Tuple[str, ...] = (".npz", ".isvd")
+    _sequential: bool = False
+
+    def __init__(self, workers: Optional[int] = None, cache_size: int = CACHE_SIZE) -> None:
         """
         Creates a Compressor instances.
+
+        Args:
+            workers (Optional[int]): The maximum number of channels decomposed concurrently, by default the number of cpus.
+            cache_size (int): The maximum size in bytes of the cached images, 0 disables the cache.
         """
         self._path: str = ""
-        self._channels: List[Channel] = []
+        self._size: Optional[int] = None
+        self._channels: List[Union[Channel, TiledChannel]] = []
+        self._color_space: str = "rgb"
+        self._subsampling: int = 1
         self._image: np.ndarray
+        self._output: Optional[np.ndarray] = None
+        self._cache: LRUCache = LRUCache(cache_size)
+        self._workers: int = workers if workers is not None else os.cpu_count() or 1
+        self._accumulators: List[np.ndarray] = []
+        self._ranks: List[int] = []
+        self._updates: List[int] = []
+        self._scratch: Optional[np.ndarray] = None
+        self._scaled: Optional[np.ndarray] = None
 
     @property
     def image(self) -> np.ndarray:
@@ -49,6 +134,26 @@ class Compressor:
         """
         return self._image
 
+    @property
+    def color_space(self) -> str:
+        """
+        Gets the color space of the decomposed channels.
+
+        Returns:
+            str: rgb, also for the grayscale images, or ycbcr.
+        """
+        return self._color_space
+
+    @property
+    def cache(self) -> LRUCache:
+        """
+        Gets the cache of the composed images.
+
+        Returns:
+            LRUCache: The cache, with its hit and miss counters.
+        """
+        return self._cache
+
     @staticmethod
     def get_compression_rate(original_file: str, compressed_file: str) -> float:
         """
@@ -66,77 +171,451 @@ class Compressor:
         compression_rate: float = 1 - (compressed_size / original_size)
         return compression_rate
 
-    def load(self, path: str) -> int:
+    def load(self, path: str, rank: Optional[int] = None, tolerance: Optional[float] = None,
+             dtype: np.dtype = np.float64, tile_size: Optional[int] = None, size: Optional[int] = None,
+             progress: Optional[Callable[[float], None]] = None, color_space: str = "rgb",
+             chroma_rank: Optional[int] = None, subsampling: int = 1, disk_cache: Optional[DiskCache] = None) -> int:
         """
         Loads an image to compress.
+        If rank or tolerance are provided, the channels are decomposed computing only the largest singular values.
+        If tile_size is provided, each channel is split in tiles decomposed independently and concurrently.
+        The channels or the tiles are decomposed concurrently only if threadpoolctl can share the BLAS threads among
+        them, otherwise they are decomposed sequentially, each one with all the BLAS threads.
+        If size is provided, the image is reduced before the decomposition, which gives a quick approximation of a large
+        image: a JPEG is decoded directly at a reduced scale, then the image is reduced averaging blocks of pixels.
+        With the ycbcr color space, an RGB image is decomposed as luma and chroma planes: the chroma ones can keep less
+        singular values and be subsampled, since the eye is less sensitive to them.
+        If disk_cache is provided, a decomposition of the same file bytes with the same options is memory mapped from
+        it instead of computed, and a computed one is added to it. An entry that can't be read, like one evicted by
+        another process or truncated, is removed and the image is decomposed again.
 
         Args:
             path (str): path to the image.
+            rank (Optional[int]): The maximum number of singular values to compute.
+            tolerance (Optional[float]): The minimum ratio between a singular value and the largest one to keep it.
+            dtype (np.dtype): The floating point type of the decomposition, a decomposition file keeps its own type.
+            tile_size (Optional[int]): The number of rows and columns of the tiles.
+            size (Optional[int]): The minimum number of rows and columns of the reduced image, less than twice size.
+            progress (Optional[Callable[[float], None]]): The function called with the decomposed fraction of the image
+                after each channel, from any thread.
+            color_space (str): The color space of the decomposed channels of an RGB image, rgb or ycbcr.
+            chroma_rank (Optional[int]): The maximum number of singular values to compute for the chroma planes,
+                by default rank.
+            subsampling (int): The number of rows and columns of the luma averaged in a chroma element.
+            disk_cache (Optional[DiskCache]): The persistent cache of the decompositions.
 
         Returns:
             int: The number of the singular values of the image.
+
+        Raises:
+            ValueError: if the ycbcr chroma planes are tiled and the subsampling doesn't divide the tile size.
+        """
+        if color_space == "ycbcr" and tile_size is not None and tile_size % subsampling != 0:
+            raise ValueError(f"The subsampling {subsampling} doesn't divide the tile size {tile_size}")
+        with Stats.span("load", True):
+            self._path = path
+            self._size = size
+            self._channels = []
+            self._color_space = "rgb"
+            self._subsampling = 1
+            self._accumulators = []
+            self._cache.clear()
+            if os.path.splitext(self._path)[1] in Compressor.DECOMPOSITION_FORMATS:
+                with Stats.span("read"):
+                    return self._load_channels(self._path)
+            key: Optional[str] = None
+            if disk_cache is not None:
+                with Stats.span("hash"):
+                    key = DiskCache.get_key(self._path, {
+                        "rank": rank, "tolerance": tolerance, "dtype": np.dtype(dtype).str, "tile_size": tile_size,
+                        "size": size, "color_space": color_space, "chroma_rank": chroma_rank,
+                        "subsampling": subsampling
+                    })
+                    entry: Optional[str] = disk_cache.get(key)
+                if entry is not None:
+                    try:
+                        with Stats.span("read"):
+                            values: int = self._load_channels(entry)
+                        if progress is not None:
+                            progress(1.0)
+                        return values
+                    except (OSError, ValueError, KeyError):
+                        self._channels = []
+                        self._color_space = "rgb"
+                        self._subsampling = 1
+                        disk_cache.remove(key)
+            with Stats.span("decode"):
+                image_array: np.ndarray = self._decode()
+            channel_arrays: List[np.ndarray] = [image_array]
+            ranks: List[Optional[int]] = [rank]
+            if len(image_array.shape) == 3 and color_space == "ycbcr" and image_array.shape[2] == 3:
+                self._color_space = color_space
+                self._subsampling = subsampling
+                channel_arrays = ColorSpace.to_ycbcr(image_array, dtype)
+                channel_arrays[1:] = [ColorSpace.subsample(i, subsampling) for i in channel_arrays[1:]]
+                ranks = [rank] + [chroma_rank if chroma_rank is not None else rank] * 2
+            elif len(image_array.shape) == 3:
+                channel_arrays = [image_array[:, :, i] for i in range(image_array.shape[2])]
+                ranks = [rank] * image_array.shape[2]
+            decomposed: List[int] = [0]
+            lock: threading.Lock = threading.Lock()
+
+            def report(channel: Union[Channel, TiledChannel]) -> Union[Channel, TiledChannel]:
+                if progress is not None:
+                    with lock:
+                        decomposed[0] += 1
+                        fraction: float = decomposed[0] / len(channel_arrays)
+                    progress(fraction)
+                return channel
+
+            workers: int = max(1, self._workers if tile_size is not None else min(self._workers, len(channel_arrays)))
+            limits: contextlib.AbstractContextManager = contextlib.nullcontext()
+            if workers > 1 and threadpool_limits is None:
+                if not Compressor._sequential:
+                    Compressor._sequential = True
+                    logging.info("threadpoolctl is not installed, the channels are decomposed sequentially")
+                workers = 1
+            elif workers > 1:
+                limits = threadpool_limits(max(1, (os.cpu_count() or 1) // workers), "blas")
+            with limits, ThreadPoolExecutor(workers) as executor:
+                if tile_size is None:
+                    self._channels = list(executor.map(
+                        lambda i, j: report(Channel(i, j, tolerance, dtype)), channel_arrays, ranks))
+                else:
+                    self._channels = [report(TiledChannel(i, tile_size, j, tolerance, dtype, executor))
+                                      for i, j in zip(channel_arrays, ranks)]
+            if disk_cache is not None:
+                with Stats.span("write"):
+                    disk_cache.put(key, self._channels, self._color_space, self._subsampling)
+            return max(i.get_singular_values() for i in self._channels)
+
+    def compose(self, k: Union[int, Sequence[int]], cancel: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Composes a compressed image.
+        A single k is used by every channel up to its own number of singular values, a sequence gives the k of each
+        channel, like a high rank for the luma and low ones for the chroma planes.
+        The previous composition is reused, adding or subtracting only the singular values between its k and the new one.
+        The composed images are cached, so an already used k doesn't need any composition.
+        The singular values are added in chunks, so a cancelled composition stops at a chunk boundary keeping the image
+        unchanged, and the next composition continues from the singular values already summed.
+
+        Args:
+            k (Union[int, Sequence[int]]): number of singular values to use for compression, or the one of each channel.
+            cancel (Optional[Callable[[], bool]]): The function called between the chunks, the composition stops if it returns True.
+
+        Returns:
+            bool: False if the composition has been cancelled.
+
+        Raises:
+            ValueError: if k is greater than the number of singular values or there isn't a k for each channel.
+        """
+        with Stats.span("compose", True):
+            key: Hashable = k if isinstance(k, (int, np.integer)) else tuple(k)
+            cached: Optional[np.ndarray] = self._cache.get(key)
+            if cached is not None:
+                self._image = cached
+                return True
+            ranks: List[int] = self._get_ranks(k)
+            self._prepare_buffers(max(ranks))
+            for i in range(len(self._channels)):
+                if not self._compose_channel(i, ranks[i], cancel):
+                    return False
+            rows, columns = self._channels[0].shape
+            scratch: np.ndarray = self._scratch[:rows * columns].reshape(rows, columns)
+            with Stats.span("clip"):
+                if self._color_space == "ycbcr":
+                    ColorSpace.to_rgb(self._accumulators, self._output, scratch, self._subsampling)
+                else:
+                    for i in range(len(self._channels)):
+                        np.clip(self._accumulators[i], 0, 255, out=scratch)
+                        self._output[:, :, i] = scratch
+            self._image = self._output
+            if self._output.nbytes <= self._cache.max_size:
+                self._image = self._output.copy()
+                self._image.flags.writeable = False
+                self._cache.put(key, self._image)
+            return True
+
+    def get_preview(self, size: int = PREVIEW_SIZE) -> "Compressor":
+        """
+        Gets a compressor of the image downsampled to about the display resolution.
+        The singular vectors are averaged by blocks before any product, so the preview compositions cost about
+        size * size * k instead of rows * columns * k, and this compressor composes only when saving.
+        The preview has its own buffers and channels, so it can compose in another thread.
+        The step of the subsampled chroma planes is reduced by their subsampling, so they keep aligned with the luma,
+        and their tiled blocks restart every tile_size / subsampling elements, where the tiles of the luma end.
+
+        Args:
+            size (int): The minimum number of rows and columns of the preview, if the image is large enough.
+
+        Returns:
+            Compressor: The compressor of the downsampled image, with the same singular values.
+        """
+        preview: Compressor = Compressor(self._workers, self._cache.max_size)
+        preview._path = self._path
+        preview._color_space = self._color_space
+        steps: List[int] = self._get_steps()
+        step: int = max(1, min(self._channels[0].shape) // size // max(steps) * max(steps))
+        preview._channels = [i.downsample(max(1, step // j)) if isinstance(i, Channel)
+                             else i.downsample(max(1, step // j), i.tile_size // j)
+                             for i, j in zip(self._channels, steps)]
+        preview._subsampling = max(1, self._subsampling // step)
+        return preview
+
+    def get_metrics(self) -> Dict[str, np.ndarray]:
+        """
+        Gets the quality metrics of the compositions for each number of singular values, without composing them.
+        The errors come from the discarded singular values, so they don't consider the clipping to 0-255.
+        With the ycbcr color space, they are measured on the luma and chroma planes, each subsampled element counting
+        for all the pixels it covers.
+
+        Returns:
+            Dict[str, np.ndarray]: The arrays indexed by k of the Frobenius error ("error"), the mean squared error ("mse"),
+                the PSNR in dB ("psnr") and the fraction of the retained energy ("energy").
+        """
+        values: int = max(i.get_singular_values() for i in self._channels)
+        errors: np.ndarray = np.zeros(values + 1)
+        norm: float = 0
+        for i, step in zip(self._channels, self._get_steps()):
+            channel_errors: np.ndarray = i.get_errors() * step ** 2
+            errors[:channel_errors.shape[0]] += channel_errors
+            errors[channel_errors.shape[0]:] += channel_errors[-1]
+            norm += i.norm * step ** 2
+        rows, columns = self._channels[0].shape
+        mse: np.ndarray = errors / (rows * columns * len(self._channels))
+        with np.errstate(divide="ignore"):
+            psnr: np.ndarray = 10 * np.log10(255 ** 2 / mse)
+        return {
+            "error": np.sqrt(errors),
+            "mse": mse,
+            "psnr": psnr,
+            "energy": 1 - errors / norm if norm > 0 else np.ones_like(errors)
+        }
+
+    def verify_metrics(self, ks: Iterable[int]) -> Dict[str, np.ndarray]:
+        """
+        Gets the quality metrics of the clipped compositions of some numbers of singular values.
+        The original image is read again, reduced like the decomposed one, so it's not possible for a decomposition file.
+
+        Args:
+            ks (Iterable[int]): The numbers of singular values to verify.
+
+        Returns:
+            Dict[str, np.ndarray]: The arrays of the verified numbers of singular values ("k"), of the mean squared
+                errors ("mse") and of the PSNR in dB ("psnr").
+
+        Raises:
+            ValueError: if the image has been loaded from a decomposition file.
+        """
+        if os.path.splitext(self._path)[1] in Compressor.DECOMPOSITION_FORMATS:
+            raise ValueError(f"Cannot read the original image of {self._path}")
+        original: np.ndarray = self._decode()
+        original = original.reshape(original.shape[0], original.shape[1], -1)
+        verified: List[int] = []
+        mse: List[float] = []
+        for k in self.sweep(ks):
+            verified.append(k)
+            mse.append(float(np.mean(np.square(self._image.astype(np.float64) - original))))
+        with np.errstate(divide="ignore"):
+            psnr: np.ndarray = 10 * np.log10(255 ** 2 / np.array(mse))
+        return {"k": np.array(verified), "mse": np.array(mse), "psnr": psnr}
+
+    def get_tradeoffs(self, rank: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Gets the size and the error of the .isvd files of every quantization and compression.
+        Each file is written in a temporary directory and its composition is compared with the original image,
+        read again like verify_metrics, or with the composition of all the singular values for a decomposition file.
+        The compressions are lossless, so they have the error of their quantization.
+
+        Args:
+            rank (Optional[int]): The maximum number of singular values saved for each channel.
+
+        Returns:
+            List[Dict[str, Any]]: The quantization ("quantization", None for the decomposition type), the compression
+                ("compression", None for the mapped arrays), the size in bytes ("size") and the PSNR in dB ("psnr")
+                of each file.
+        """
+        values: int = max(i.get_singular_values() for i in self._channels)
+        k: int = values if rank is None else min(rank, values)
+        reference: np.ndarray
+        if os.path.splitext(self._path)[1] in Compressor.DECOMPOSITION_FORMATS:
+            self.compose(values)
+            reference = self._image.astype(np.float64)
+        else:
+            reference = self._decode().astype(np.float64)
+            reference = reference.reshape(reference.shape[0], reference.shape[1], -1)
+        tradeoffs: List[Dict[str, Any]] = []
+        with tempfile.TemporaryDirectory() as directory:
+            for quantization in (None,) + DecompositionFile.QUANTIZATIONS:
+                psnr: float = 0
+                for compression in (None,) + DecompositionFile.COMPRESSIONS:
+                    path: str = os.path.join(directory, f"{quantization}-{compression}.isvd")
+                    DecompositionFile.save(path, self._channels, k, quantization, self._color_space, compression,
+                                           self._subsampling)
+                    if compression is None:
+                        saved: Compressor = Compressor(self._workers, 0)
+                        saved.load(path)
+                        saved.compose(k)
+                        with np.errstate(divide="ignore"):
+                            psnr = float(10 * np.log10(255 ** 2 / np.mean(np.square(saved.image - reference))))
+                        del saved
+                    tradeoffs.append({"quantization": quantization, "compression": compression,
+                                      "size": os.path.getsize(path), "psnr": psnr})
+                    os.remove(path)
+        return tradeoffs
+
+    def select_rank(self, energy: Optional[float] = None, psnr: Optional[float] = None, size: Optional[int] = None,
+                    ext: str = ".jpg") -> int:
         """
-        self._path = path
-        if os.path.splitext(self._path)[1] == ".npz":
-            return self._load_channels(self._path)
-        image: Image.Image = Image.open(self._path)
-        image_array: np.ndarray = np.array(image)
-        channels: int = 1
+        Selects the number of singular values meeting quality and size targets.
+        The quality targets select the smallest k reaching them, searching the metrics computed from the singular values.
+        The size target selects the largest k whose encoded image fits in it, by bisection, and it wins over the quality ones.
+        The bisection composes many images, so the image of the selected k is composed again at the end.
+
+        Args:
+            energy (Optional[float]): The minimum fraction of the retained energy.
+            psnr (Optional[float]): The minimum PSNR in dB.
+            size (Optional[int]): The maximum size in bytes of the encoded image.
+            ext (str): The extension of the format used to encode the image for the size target.
+
+        Returns:
+            int: The selected number of singular values, the largest one if the quality targets can't be reached.
+
+        Raises:
+            ValueError: if even the image without singular values doesn't fit in the size target.
+        """
+        values: int = max(i.get_singular_values() for i in self._channels)
         k: int = 0
-        if len(image_array.shape) == 3:
-            _, _, channels = image_array.shape
-        for i in range(channels):
-            channel_array: np.ndarray
-            if channels == 1:
-                channel_array = image_array
+        if energy is not None or psnr is not None:
+            metrics: Dict[str, np.ndarray] = self.get_metrics()
+            for name, target in (("energy", energy), ("psnr", psnr)):
+                if target is not None:
+                    reached: np.ndarray = np.flatnonzero(metrics[name] >= target)
+                    k = max(k, int(reached[0]) if reached.shape[0] > 0 else values)
+        if size is None:
+            return k
+        low: int = 0
+        high: int = values
+        while low < high:
+            middle: int = (low + high + 1) // 2
+            self.compose(middle)
+            if self._get_encoded_size(ext) <= size:
+                low = middle
             else:
-                channel_array = image_array[:, :, i]
-            channel: Channel = Channel(channel_array)
-            values: int = channel.get_singular_values()
-            if values > k:
-                k = values
-            self._channels.append(channel)
+                high = middle - 1
+        if low == 0:
+            self.compose(0)
+            if self._get_encoded_size(ext) > size:
+                raise ValueError(QCoreApplication.translate("Cli", "size_target").format(size=size))
+        k = min(k, low) if energy is not None or psnr is not None else low
+        self.compose(k)
         return k
 
-    def compose(self, k: int) -> None:
+    def sweep(self, ks: Iterable[int]) -> Iterator[int]:
         """
-        Composes a compressed image.
+        Composes the compressed images of many numbers of singular values.
+        The values are composed in increasing order, so each image only adds the singular values after the previous one.
 
         Args:
-            k (int): number of singular values to use for compression.
+            ks (Iterable[int]): The numbers of singular values to use for compression.
+
+        Returns:
+            Iterator[int]: The number of singular values of each image, available in the image property until the next one.
         """
-        compressed_channels: List[np.ndarray] = []
-        for i in self._channels:
-            compressed_channels.append(i.compose(k))
-        compressed_image_array: np.ndarray = np.stack(compressed_channels, axis=-1)
-        self._image = np.clip(compressed_image_array, 0, 255).astype(np.uint8)
+        for k in sorted(set(ks)):
+            self.compose(k)
+            yield k
 
-    def save(self, path: str) -> Optional[float]:
+    def save(self, path: str, rank: Optional[int] = None, quantization: Optional[str] = None,
+             compression: Optional[str] = None) -> Optional[float]:
         """
         Saves a compressed image.
 
         Args:
             path (str): path where to save the image.
+            rank (Optional[int]): The maximum number of singular values saved in an .isvd file.
+            quantization (Optional[str]): The type used to store u and vt in an .isvd file, float16, int8 or int16.
+            compression (Optional[str]): The compression of u and vt in an .isvd file, zlib or lzma.
 
         Returns:
             Optional[float]: The compression ratio if both input and output files are images.
         """
-        if os.path.splitext(path)[1] == ".npz":
-            self._save_channels(path)
-            return None
-        result = Image.fromarray(self._image.squeeze())
-        try:
-            result.save(path)
-        except Exception:
-            result = result.convert("RGB")
-            result.save(path)
-        if os.path.splitext(self._path)[1] == ".npz":
-            return None
-        return Compressor.get_compression_rate(self._path, path)
+        with Stats.span("save", True):
+            if os.path.splitext(path)[1] in Compressor.DECOMPOSITION_FORMATS:
+                with Stats.span("write"):
+                    self._save_channels(path, rank, quantization, compression)
+                return None
+            with Stats.span("encode"):
+                result = Image.fromarray(self._image.squeeze())
+                try:
+                    result.save(path)
+                except Exception:
+                    result = result.convert("RGB")
+                    result.save(path)
+            if os.path.splitext(self._path)[1] in Compressor.DECOMPOSITION_FORMATS:
+                return None
+            return Compressor.get_compression_rate(self._path, path)
+
+    def get_memory(self) -> int:
+        """
+        Gets the memory used by the decomposition, the composition buffers and the cache.
+
+        Returns:
+            int: The size in bytes of the channels and of the arrays kept between the compositions.
+        """
+        buffers: List[Optional[np.ndarray]] = self._accumulators + [self._scratch, self._scaled, self._output]
+        return (sum(i.nbytes for i in self._channels) + sum(i.nbytes for i in buffers if i is not None)
+                + self._cache.size)
+
+    def spill(self, path: str) -> None:
+        """
+        Moves the decomposition to a memory mapped .isvd file and frees the composition buffers and the cache.
+        The channels become lazy, so the next compositions load again only the singular values they use,
+        and channels already mapped from a file just drop their loaded prefix without writing anything.
+        It must not be called while another thread uses the compressor.
+
+        Args:
+            path (str): The path of the .isvd file where to write the channels that aren't mapped from a file.
+        """
+        tiles: List[Channel] = [j for i in self._channels for j in (i.tiles if isinstance(i, TiledChannel) else [i])]
+        if all(i.lazy for i in tiles):
+            for i in tiles:
+                i.unload()
+        else:
+            with Stats.span("write"):
+                DecompositionFile.save(path, self._channels, color_space=self._color_space,
+                                       subsampling=self._subsampling)
+            self._channels = DecompositionFile.load(path)
+        self._cache.clear()
+        self._accumulators = []
+        self._ranks = []
+        self._updates = []
+        self._scratch = None
+        self._scaled = None
+        self._output = None
+
+    def _decode(self) -> np.ndarray:
+        """
+        Decodes the image to compress, reduced like the decomposed one.
+        A JPEG is decoded directly at a reduced scale, then the image is reduced averaging blocks of pixels.
+
+        Returns:
+            np.ndarray: The pixels of the image.
+        """
+        with Image.open(self._path) as image:
+            if self._size is not None and min(image.size) >= 2 * self._size:
+                factor: int = min(image.size) // self._size
+                image.draft(image.mode, (image.size[0] // factor, image.size[1] // factor))
+                if min(image.size) >= 2 * self._size:
+                    return np.array(image.reduce(min(image.size) // self._size))
+            return np.array(image)
 
     def _load_channels(self, path: str) -> int:
         """
-        Loads the decomposed image channels from a .npz file.
+        Loads the decomposed image channels from a .npz or .isvd file.
+        The arrays of an .isvd file are memory mapped, so they are read only when used.
+        The color space and the chroma subsampling are stored in the .isvd header and in the color_space and
+        subsampling arrays of an .npz file, the subsampling of the older files is inferred from the shapes.
 
         Args:
             path (str): path to the file where channels are stored.
@@ -144,23 +623,171 @@ class Compressor:
         Returns:
             int: The number of the singular values of the image.
         """
+        if os.path.splitext(path)[1] == ".isvd":
+            header: Dict[str, Any] = DecompositionFile.read_header(path)
+            self._color_space = header.get("color_space", "rgb")
+            self._channels = DecompositionFile.load(path)
+            self._subsampling = header["subsampling"] if "subsampling" in header else self._infer_subsampling()
+            return max(i.get_singular_values() for i in self._channels)
         k: int = 0
         channels = np.load(path, allow_pickle=True)
-        for i in sorted(channels.keys()):
-            channel: Channel = Channel(channels[i])
+        if "color_space" in channels:
+            self._color_space = str(channels["color_space"])
+        for i in sorted(j for j in channels.keys() if j not in ("color_space", "subsampling")):
+            channel: Union[Channel, TiledChannel]
+            if "_tiles" in channels[i].item():
+                channel = TiledChannel(channels[i])
+            else:
+                channel = Channel(channels[i])
             self._channels.append(channel)
             if k == 0:
                 k = channel.get_singular_values()
+        self._subsampling = int(channels["subsampling"]) if "subsampling" in channels else self._infer_subsampling()
         return k
 
-    def _save_channels(self, path: str) -> None:
+    def _save_channels(self, path: str, rank: Optional[int] = None, quantization: Optional[str] = None,
+                       compression: Optional[str] = None) -> None:
         """
-        Saves the decomposed channels on a .npz file.
+        Saves the decomposed channels on a .npz or .isvd file.
+        The .npz files always contain the whole decomposition.
 
         Args:
             path (str): path to file.
+            rank (Optional[int]): The maximum number of singular values saved in an .isvd file.
+            quantization (Optional[str]): The type used to store u and vt in an .isvd file, float16, int8 or int16.
+            compression (Optional[str]): The compression of u and vt in an .isvd file, zlib or lzma.
         """
+        if os.path.splitext(path)[1] == ".isvd":
+            DecompositionFile.save(path, self._channels, rank, quantization, self._color_space, compression,
+                                   self._subsampling)
+            return
         channels: List[Dict] = []
         for i in self._channels:
-            channels.append(vars(i))
-        np.savez(path, *channels)
+            channels.append(i.to_dict())
+        np.savez(path, *channels, color_space=np.array(self._color_space), subsampling=np.array(self._subsampling))
+
+    def _get_encoded_size(self, ext: str) -> int:
+        """
+        Gets the size in bytes of the image encoded with the format of an extension.
+
+        Args:
+            ext (str): The extension of the format.
+
+        Returns:
+            int: The size in bytes of the encoded image.
+        """
+        result: Image.Image = Image.fromarray(self._image.squeeze())
+        image_format: str = Image.registered_extensions()[ext.lower()]
+        buffer: io.BytesIO = io.BytesIO()
+        try:
+            result.save(buffer, image_format)
+        except Exception:
+            buffer = io.BytesIO()
+            result.convert("RGB").save(buffer, image_format)
+        return buffer.tell()
+
+    def _get_ranks(self, k: Union[int, Sequence[int]]) -> List[int]:
+        """
+        Gets the number of singular values of each channel.
+
+        Args:
+            k (Union[int, Sequence[int]]): number of singular values to use for compression, or the one of each channel.
+
+        Returns:
+            List[int]: The number of singular values of each channel, a single k limited to the ones of the channel.
+
+        Raises:
+            ValueError: if k is greater than the number of singular values or there isn't a k for each channel.
+        """
+        if not isinstance(k, (int, np.integer)):
+            if len(k) != len(self._channels):
+                raise ValueError(f"Expected {len(self._channels)} numbers of singular values, got {len(k)}")
+            return list(k)
+        values: int = max(i.get_singular_values() for i in self._channels)
+        if k > values:
+            raise ValueError(QCoreApplication.translate("Cli", "values").format(values=k, max=values))
+        return [min(k, i.get_singular_values()) for i in self._channels]
+
+    def _get_steps(self) -> List[int]:
+        """
+        Gets the subsampling step of each channel, relative to the first one.
+
+        Returns:
+            List[int]: The number of rows of the first channel for each row of a channel, 1 if it isn't subsampled.
+        """
+        return [1] + [self._subsampling] * (len(self._channels) - 1)
+
+    def _infer_subsampling(self) -> int:
+        """
+        Infers the subsampling of the chroma channels of a file written before it was stored.
+        The inference is ambiguous for small planes, so it's used only for the older files.
+
+        Returns:
+            int: The number of rows of the luma for each row of a chroma channel, 1 for rgb.
+        """
+        if self._color_space != "ycbcr":
+            return 1
+        return -(-self._channels[0].shape[0] // self._channels[1].shape[0])
+
+    def _prepare_buffers(self, k: int) -> None:
+        """
+        Allocates the composition buffers if they are missing or too small.
+        The buffers are kept between the compositions, so only the first one allocates memory.
+        The channels can have different shapes, so the scratch array is flat and viewed with the shape of each one.
+
+        Args:
+            k (int): The largest number of singular values of a channel.
+        """
+        rows, columns = self._channels[0].shape
+        dtype: np.dtype = self._channels[0].dtype
+        if (self._scratch is None or self._scratch.dtype != dtype
+                or [i.shape for i in self._accumulators] != [i.shape for i in self._channels]):
+            self._accumulators = [np.empty(i.shape, dtype) for i in self._channels]
+            self._ranks = [-1] * len(self._channels)
+            self._updates = [0] * len(self._channels)
+            self._scratch = np.empty(max(i.size for i in self._accumulators), dtype)
+            self._scaled = None
+            self._output = np.empty((rows, columns, len(self._channels)), np.uint8)
+        size: int = max(i.shape[0] for i in self._channels) * max(1, min(k, Compressor.CHUNK_SIZE))
+        if self._scaled is None or self._scaled.shape[0] < size:
+            self._scaled = np.empty(size, dtype)
+
+    def _compose_channel(self, index: int, k: int, cancel: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Moves the accumulator of a channel to k singular values, CHUNK_SIZE singular values at a time.
+        The accumulator is fully composed if it's empty, if the delta is larger than k or after MAX_UPDATES updates.
+        The rank of the accumulator is updated after each chunk, so a cancelled move keeps a consistent partial sum.
+
+        Args:
+            index (int): The index of the channel.
+            k (int): number of singular values to use for compression.
+            cancel (Optional[Callable[[], bool]]): The function called between the chunks, the move stops if it returns True.
+
+        Returns:
+            bool: False if the move has been cancelled.
+        """
+        channel: Union[Channel, TiledChannel] = self._channels[index]
+        accumulator: np.ndarray = self._accumulators[index]
+        scratch: np.ndarray = self._scratch[:accumulator.size].reshape(accumulator.shape)
+        rank: int = self._ranks[index]
+        if rank == k:
+            return True
+        if rank < 0 or abs(k - rank) >= k or self._updates[index] >= Compressor.MAX_UPDATES:
+            rank = min(k, Compressor.CHUNK_SIZE)
+            channel.compose(rank, accumulator, self._scaled)
+            self._ranks[index] = rank
+            self._updates[index] = 0
+        else:
+            self._updates[index] += 1
+        while rank != k:
+            if cancel is not None and cancel():
+                return False
+            end: int = rank + max(-Compressor.CHUNK_SIZE, min(Compressor.CHUNK_SIZE, k - rank))
+            channel.compose(max(end, rank), scratch, self._scaled, min(end, rank))
+            if end > rank:
+                accumulator += scratch
+            else:
+                accumulator -= scratch
+            rank = end
+            self._ranks[index] = rank
+        return True
@@ -0,0 +1,302 @@
+import json
+import struct
+import itertools
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+import numpy as np
+from src.model.channel import Channel
+from src.model.compressed_factor import CompressedFactor
+from src.model.tiled_channel import TiledChannel
+
+
+class DecompositionFile:
+    """
+    A pickle free file format for decomposed images, readable through np.memmap.
+    The file starts with MAGIC and the offset of a JSON header, written after the u, s and vt arrays of each channel.
+    Every array is aligned to ALIGNMENT bytes, u is stored by columns and vt by rows, so a rank prefix is contiguous.
+    The u and vt matrices can be quantized, the int8 and int16 ones with a scale for each column of u and row of vt,
+    and compressed with zlib or lzma in chunks of CHUNK_SIZE singular values, so a rank prefix is still read alone.
+    The header also stores the color space of the channels and the subsampling of the chroma ones, since the ycbcr
+    channels must be converted back to RGB.
+
+    Attributes:
+        MAGIC (bytes): The bytes at the start of every file.
+        VERSION (int): The version of the format written by save.
+        ALIGNMENT (int): The alignment in bytes of the arrays.
+        QUANTIZATIONS (Tuple[str, ...]): The supported quantizations of the u and vt matrices.
+        COMPRESSIONS (Tuple[str, ...]): The supported compressions of the u and vt matrices.
+        CHUNK_SIZE (int): The number of singular values compressed together.
+
+    Methods:
+        save(path: str, channels: List[Union[Channel, TiledChannel]], rank: Optional[int] = None, quantization: Optional[str] = None, color_space: str = "rgb", compression: Optional[str] = None, subsampling: int = 1) -> None:
+            Saves the decomposed channels.
+        read_header(path: str) -> Dict[str, Any]:
+            Reads the JSON header of a file.
+        load(path: str, lazy: bool = True) -> List[Union[Channel, TiledChannel]]:
+            Loads the decomposed channels, mapping their arrays in memory.
+        _prepare_factors(channel: Channel, rank: Optional[int], quantization: Optional[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Optional[np.ndarray]]:
+            Truncates and quantizes the u, s and vt matrices of a channel.
+        _map_array(mapping: np.memmap, offset: int, dtype: np.dtype, shape: Tuple[int, ...], order: str = "C") -> np.memmap:
+            Gets an array of a file as a view of the mapping of the whole file.
+        _write_array(file: BinaryIO, array: np.ndarray, order: str) -> int:
+            Writes an aligned array.
+        _write_chunks(file: BinaryIO, array: np.ndarray, order: str, compression: str) -> Tuple[int, List[int]]:
+            Writes a u or vt matrix compressed in chunks of singular values.
+    """
+
+    MAGIC: bytes = b"ISVD"
+    VERSION: int = 5
+    ALIGNMENT: int = 64
+    QUANTIZATIONS: Tuple[str, ...] = ("float16", "int8", "int16")
+    COMPRESSIONS: Tuple[str, ...] = CompressedFactor.COMPRESSIONS
+    CHUNK_SIZE: int = 64
+
+    @staticmethod
+    def save(path: str, channels: List[Union[Channel, TiledChannel]], rank: Optional[int] = None,
+             quantization: Optional[str] = None, color_space: str = "rgb", compression: Optional[str] = None,
+             subsampling: int = 1) -> None:
+        """
+        Saves the decomposed channels.
+
+        Args:
+            path (str): The path to the file.
+            channels (List[Union[Channel, TiledChannel]]): The channels to save.
+            rank (Optional[int]): The maximum number of singular values to save for each channel.
+            quantization (Optional[str]): The type used to store u and vt, float16, int8 or int16.
+            color_space (str): The color space of the channels, rgb or ycbcr.
+            compression (Optional[str]): The compression of u and vt, zlib or lzma.
+            subsampling (int): The number of rows and columns of the luma averaged in a chroma element.
+
+        Raises:
+            ValueError: if the quantization or the compression aren't supported.
+        """
+        if quantization is not None and quantization not in DecompositionFile.QUANTIZATIONS:
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        if compression is not None and compression not in DecompositionFile.COMPRESSIONS:
+            raise ValueError(f"Unsupported compression: {compression}")
+        header: Dict[str, Any] = {
+            "version": DecompositionFile.VERSION,
+            "shape": list(channels[0].shape),
+            "color_space": color_space,
+            "subsampling": subsampling,
+            "compression": compression,
+            "chunk_size": DecompositionFile.CHUNK_SIZE,
+            "channels": []
+        }
+        blocks: List[Tuple[Dict[str, Any], Channel]] = []
+        for i in channels:
+            tiles: List[Channel] = i.tiles if isinstance(i, TiledChannel) else [i]
+            channel: Dict[str, Any] = {
+                "shape": list(i.shape),
+                "dtype": np.dtype(i.dtype).str,
+                "tile_size": i.tile_size if isinstance(i, TiledChannel) else None,
+                "blocks": []
+            }
+            for j in tiles:
+                block: Dict[str, Any] = {"shape": list(j.shape)}
+                channel["blocks"].append(block)
+                blocks.append((block, j))
+            header["channels"].append(channel)
+        with open(path, "wb") as file:
+            file.write(DecompositionFile.MAGIC + struct.pack("<Q", 0))
+            file.write(b"\0" * (DecompositionFile.ALIGNMENT - file.tell()))
+            for block, channel in blocks:
+                u, s, vt, scale = DecompositionFile._prepare_factors(channel, rank, quantization)
+                block["rank"] = s.shape[0]
+                block["norm"] = channel.norm
+                block["u_dtype"] = u.dtype.str
+                block["s_dtype"] = s.dtype.str
+                block["vt_dtype"] = vt.dtype.str
+                if compression is None:
+                    block["u"] = DecompositionFile._write_array(file, u, "F")
+                    block["vt"] = DecompositionFile._write_array(file, vt, "C")
+                else:
+                    block["u"], block["u_chunks"] = DecompositionFile._write_chunks(file, u, "F", compression)
+                    block["vt"], block["vt_chunks"] = DecompositionFile._write_chunks(file, vt, "C", compression)
+                block["s"] = DecompositionFile._write_array(file, s, "C")
+                block["scale"] = DecompositionFile._write_array(file, scale, "C") if scale is not None else None
+            for i in header["channels"]:
+                i["rank"] = max(j["rank"] for j in i["blocks"])
+            header["rank"] = max(i["rank"] for i in header["channels"])
+            offset: int = file.tell()
+            file.write(json.dumps(header).encode("utf-8"))
+            file.seek(len(DecompositionFile.MAGIC))
+            file.write(struct.pack("<Q", offset))
+
+    @staticmethod
+    def read_header(path: str) -> Dict[str, Any]:
+        """
+        Reads the JSON header of a file.
+
+        Args:
+            path (str): The path to the file.
+
+        Returns:
+            Dict[str, Any]: The header, with the version, the shape, the color space and the blocks of each channel.
+
+        Raises:
+            ValueError: if the file isn't a decomposition file or its version isn't supported.
+        """
+        with open(path, "rb") as file:
+            start: bytes = file.read(len(DecompositionFile.MAGIC) + 8)
+            if start[:len(DecompositionFile.MAGIC)] != DecompositionFile.MAGIC:
+                raise ValueError(f"Not a decomposition file: {path}")
+            file.seek(struct.unpack("<Q", start[len(DecompositionFile.MAGIC):])[0])
+            header: Dict[str, Any] = json.loads(file.read().decode("utf-8"))
+        if header["version"] > DecompositionFile.VERSION:
+            raise ValueError(f"Unsupported decomposition file version: {header['version']}")
+        return header
+
+    @staticmethod
+    def load(path: str, lazy: bool = True) -> List[Union[Channel, TiledChannel]]:
+        """
+        Loads the decomposed channels, mapping their arrays in memory.
+        The file is mapped once and every array is a view of the mapping, so a file with thousands of tiles keeps a
+        single file descriptor open. Only the pages of the file actually used by a composition are read.
+        The lazy channels copy in memory only the rank prefix used by the compositions, and with a compressed file
+        they decompress only the chunks covering it.
+
+        Args:
+            path (str): The path to the file.
+            lazy (bool): The flag that indicates if the channels are loaded on demand.
+
+        Returns:
+            List[Union[Channel, TiledChannel]]: The loaded channels.
+
+        Raises:
+            ValueError: if the file isn't a decomposition file.
+        """
+        header: Dict[str, Any] = DecompositionFile.read_header(path)
+        mapping: np.memmap = np.memmap(path, np.uint8, "r")
+        compression: Optional[str] = header.get("compression")
+        channels: List[Union[Channel, TiledChannel]] = []
+        for i in header["channels"]:
+            dtype: np.dtype = np.dtype(i["dtype"])
+            tiles: List[Channel] = []
+            for j in i["blocks"]:
+                rows, columns = j["shape"]
+                rank: int = j["rank"]
+                u: Union[np.ndarray, CompressedFactor]
+                vt: Union[np.ndarray, CompressedFactor]
+                if compression is None:
+                    u = DecompositionFile._map_array(mapping, j["u"], j.get("u_dtype", dtype), (rows, rank), "F")
+                    vt = DecompositionFile._map_array(mapping, j["vt"], j.get("vt_dtype", dtype), (rank, columns))
+                else:
+                    u_offsets: List[int] = list(itertools.accumulate(j["u_chunks"], initial=j["u"]))
+                    vt_offsets: List[int] = list(itertools.accumulate(j["vt_chunks"], initial=j["vt"]))
+                    u = CompressedFactor(mapping, u_offsets, (rows, rank), j["u_dtype"], "F", compression,
+                                         header["chunk_size"])
+                    vt = CompressedFactor(mapping, vt_offsets, (rank, columns), j["vt_dtype"], "C", compression,
+                                          header["chunk_size"])
+                    if not lazy:
+                        u, vt = np.asarray(u), np.asarray(vt)
+                tiles.append(Channel.from_factors(
+                    u,
+                    DecompositionFile._map_array(mapping, j["s"], j.get("s_dtype", dtype), (rank,)),
+                    vt,
+                    DecompositionFile._map_array(mapping, j["scale"], j["s_dtype"], (rank,))
+                    if j.get("scale") is not None else None,
+                    lazy,
+                    j.get("norm")
+                ))
+            if i["tile_size"] is None:
+                channels.append(tiles[0])
+            else:
+                channels.append(TiledChannel.from_tiles(tiles, tuple(i["shape"]), i["tile_size"]))
+        return channels
+
+    @staticmethod
+    def _prepare_factors(channel: Channel, rank: Optional[int],
+                    quantization: Optional[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """
+        Truncates and quantizes the u, s and vt matrices of a channel.
+        The int8 and int16 quantizations scale each column of u and row of vt to the full range of the type,
+        their product is the returned scale.
+
+        Args:
+            channel (Channel): The channel to save.
+            rank (Optional[int]): The maximum number of singular values to save.
+            quantization (Optional[str]): The type used to store u and vt, float16, int8 or int16.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray, Optional[np.ndarray]]: The u, s and vt matrices and the optional scale.
+        """
+        u, s, vt = channel.factors
+        k: int = s.shape[0] if rank is None else min(rank, s.shape[0])
+        u, s, vt = u[:, :k], np.asarray(s[:k]), vt[:k, :]
+        scale: Optional[np.ndarray] = channel.scale[:k] if channel.scale is not None else None
+        if scale is not None and (quantization is None or u.dtype != np.dtype(quantization)):
+            u, vt, scale = u * scale.astype(s.dtype), vt.astype(s.dtype), None
+        if quantization == "float16":
+            u, vt = u.astype(np.float16), vt.astype(np.float16)
+        elif quantization in ("int8", "int16") and scale is None:
+            maximum: int = np.iinfo(quantization).max
+            u_scale: np.ndarray = np.abs(u).max(axis=0) / maximum
+            vt_scale: np.ndarray = np.abs(vt).max(axis=1) / maximum
+            u_scale[u_scale == 0] = 1
+            vt_scale[vt_scale == 0] = 1
+            u = np.rint(u / u_scale).astype(quantization)
+            vt = np.rint(vt / vt_scale[:, np.newaxis]).astype(quantization)
+            scale = (u_scale * vt_scale).astype(s.dtype)
+        return (u, s, vt, scale)
+
+    @staticmethod
+    def _map_array(mapping: np.memmap, offset: int, dtype: np.dtype, shape: Tuple[int, ...],
+                   order: str = "C") -> np.memmap:
+        """
+        Gets an array of a file as a view of the mapping of the whole file.
+
+        Args:
+            mapping (np.memmap): The bytes of the whole file.
+            offset (int): The offset of the array in the file.
+            dtype (np.dtype): The type of the array.
+            shape (Tuple[int, ...]): The shape of the array.
+            order (str): The memory layout of the array, "C" by rows or "F" by columns.
+
+        Returns:
+            np.memmap: The read only array, sharing the mapping and its file descriptor.
+        """
+        dtype = np.dtype(dtype)
+        size: int = int(np.prod(shape)) * dtype.itemsize
+        return mapping[offset:offset + size].view(dtype).reshape(shape, order=order)
+
+    @staticmethod
+    def _write_array(file: BinaryIO, array: np.ndarray, order: str) -> int:
+        """
+        Writes an aligned array.
+
+        Args:
+            file (BinaryIO): The file where to write the array.
+            array (np.ndarray): The array to write.
+            order (str): The memory layout of the array, "C" by rows or "F" by columns.
+
+        Returns:
+            int: The offset of the array in the file.
+        """
+        offset: int = file.tell()
+        data: bytes = np.asarray(array).tobytes(order)
+        file.write(data)
+        file.write(b"\0" * (-len(data) % DecompositionFile.ALIGNMENT))
+        return offset
+
+    @staticmethod
+    def _write_chunks(file: BinaryIO, array: np.ndarray, order: str, compression: str) -> Tuple[int, List[int]]:
+        """
+        Writes a u or vt matrix compressed in chunks of singular values.
+        The chunks are written one after the other, then the file is aligned again.
+
+        Args:
+            file (BinaryIO): The file where to write the matrix.
+            array (np.ndarray): The matrix to write.
+            order (str): The memory layout of the matrix, "F" for u and "C" for vt.
+            compression (str): The compression of the chunks, zlib or lzma.
+
+        Returns:
+            Tuple[int, List[int]]: The offset of the first chunk in the file and the size of each chunk.
+        """
+        offset: int = file.tell()
+        sizes: List[int] = []
+        for i in CompressedFactor.compress(array, order, compression, DecompositionFile.CHUNK_SIZE):
+            file.write(i)
+            sizes.append(len(i))
+        file.write(b"\0" * (-sum(sizes) % DecompositionFile.ALIGNMENT))
+        return (offset, sizes)
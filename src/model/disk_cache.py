@@ -0,0 +1,172 @@
+import os
+import json
+import hashlib
+import tempfile
+from typing import Any, Dict, List, Optional, Union
+import platformdirs
+from src.model.channel import Channel
+from src.model.tiled_channel import TiledChannel
+from src.model.decomposition_file import DecompositionFile
+
+
+class DiskCache:
+    """
+    The content addressed cache of the decompositions, shared by the runs, the gui sessions and the batch processes.
+    An entry is an .isvd file named by the hash of the source file bytes and of the decomposition options,
+    so a hit is a memory mapped read instead of an SVD.
+    The entries are written to a temporary file and renamed, so a concurrent reader never sees a partial one,
+    and the least recently used ones are removed when the cache exceeds its size.
+
+    Attributes:
+        _directory (str): The directory of the entries.
+        _max_size (int): The maximum size in bytes of the entries.
+        MAX_SIZE (int): The default maximum size in bytes of the entries.
+        BLOCK_SIZE (int): The number of bytes hashed at a time.
+        EXTENSION (str): The extension of the entries.
+
+    Methods:
+        get_key(path: str, options: Dict[str, Any]) -> str:
+            Gets the key of the decomposition of a file.
+        get(key: str) -> Optional[str]:
+            Gets the path of an entry, marking it as the most recently used one.
+        put(key: str, channels: List[Union[Channel, TiledChannel]], color_space: str = "rgb", subsampling: int = 1) -> None:
+            Adds an entry, then removes the least recently used ones exceeding the size of the cache.
+        remove(key: str) -> None:
+            Removes an entry, like one that can't be read.
+        _evict(keep: str) -> None:
+            Removes the least recently used entries until the cache fits in its size.
+    """
+
+    MAX_SIZE: int = 2 * 1024 ** 3
+    BLOCK_SIZE: int = 1024 ** 2
+    EXTENSION: str = ".isvd"
+
+    def __init__(self, directory: Optional[str] = None, max_size: int = MAX_SIZE) -> None:
+        """
+        Creates a DiskCache.
+
+        Args:
+            directory (Optional[str]): The directory of the entries, by default the user cache directory.
+            max_size (int): The maximum size in bytes of the entries.
+        """
+        self._directory: str = directory if directory is not None else os.path.join(
+            platformdirs.user_cache_dir("ImageS-VD", False), "decompositions")
+        self._max_size: int = max_size
+        os.makedirs(self._directory, exist_ok=True)
+
+    @property
+    def directory(self) -> str:
+        """
+        Gets the directory of the entries.
+
+        Returns:
+            str: The path of the directory.
+        """
+        return self._directory
+
+    @staticmethod
+    def get_key(path: str, options: Dict[str, Any]) -> str:
+        """
+        Gets the key of the decomposition of a file.
+        The file bytes are hashed instead of the decoded pixels, which is faster and doesn't need to decode a hit.
+
+        Args:
+            path (str): The path to the image.
+            options (Dict[str, Any]): The options of the decomposition, converted to strings.
+
+        Returns:
+            str: The hexadecimal SHA-256 digest of the file, of the options and of the decomposition file version.
+        """
+        digest: "hashlib._Hash" = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(DiskCache.BLOCK_SIZE), b""):
+                digest.update(block)
+        digest.update(json.dumps({"version": DecompositionFile.VERSION, **options}, sort_keys=True, default=str)
+                      .encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Gets the path of an entry, marking it as the most recently used one.
+
+        Args:
+            key (str): The key of the entry.
+
+        Returns:
+            Optional[str]: The path of the .isvd file, None if it isn't cached.
+        """
+        path: str = os.path.join(self._directory, key + DiskCache.EXTENSION)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key: str, channels: List[Union[Channel, TiledChannel]], color_space: str = "rgb",
+            subsampling: int = 1) -> None:
+        """
+        Adds an entry, then removes the least recently used ones exceeding the size of the cache.
+        A failed write only leaves the entry out of the cache.
+
+        Args:
+            key (str): The key of the entry.
+            channels (List[Union[Channel, TiledChannel]]): The decomposed channels.
+            color_space (str): The color space of the channels, rgb or ycbcr.
+            subsampling (int): The number of rows and columns of the luma averaged in a chroma element.
+        """
+        try:
+            descriptor, temporary = tempfile.mkstemp(".tmp", key, self._directory)
+            os.close(descriptor)
+        except OSError:
+            return
+        try:
+            DecompositionFile.save(temporary, channels, color_space=color_space, subsampling=subsampling)
+            os.replace(temporary, os.path.join(self._directory, key + DiskCache.EXTENSION))
+        except OSError:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            return
+        self._evict(key + DiskCache.EXTENSION)
+
+    def remove(self, key: str) -> None:
+        """
+        Removes an entry, like one that can't be read.
+        An entry already removed or still used by another process is skipped.
+
+        Args:
+            key (str): The key of the entry.
+        """
+        try:
+            os.remove(os.path.join(self._directory, key + DiskCache.EXTENSION))
+        except OSError:
+            pass
+
+    def _evict(self, keep: str) -> None:
+        """
+        Removes the least recently used entries until the cache fits in its size.
+        The entries removed or still used by another process are skipped.
+
+        Args:
+            keep (str): The file name of the entry just added, never removed.
+        """
+        entries: List[os.DirEntry] = []
+        size: int = 0
+        with os.scandir(self._directory) as iterator:
+            for i in iterator:
+                try:
+                    if i.name.endswith(DiskCache.EXTENSION):
+                        size += i.stat().st_size
+                        entries.append(i)
+                except OSError:
+                    continue
+        for i in sorted(entries, key=lambda j: j.stat().st_mtime):
+            if size <= self._max_size:
+                return
+            if i.name == keep:
+                continue
+            try:
+                entry_size: int = i.stat().st_size
+                os.remove(i.path)
+                size -= entry_size
+            except OSError:
+                continue
@@ -0,0 +1,144 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+import numpy as np
+
+
+class LRUCache:
+    """
+    A least recently used cache of np.ndarray bounded by the size in bytes of its values.
+
+    Attributes:
+        _max_size (int): The maximum size in bytes of the cached arrays.
+        _size (int): The current size in bytes of the cached arrays.
+        _items (OrderedDict[Hashable, np.ndarray]): The cached arrays, from the least to the most recently used.
+        _hits (int): The number of lookups that found their key.
+        _misses (int): The number of lookups that didn't find their key.
+        _lock (threading.Lock): The lock used to share the cache between threads.
+
+    Methods:
+        get(key: Hashable) -> Optional[np.ndarray]:
+            Gets a cached array and marks it as the most recently used.
+        put(key: Hashable, value: np.ndarray) -> bool:
+            Caches an array, evicting the least recently used ones to stay in the size limit.
+        clear() -> None:
+            Removes all the cached arrays.
+        __contains__(key: Hashable) -> bool:
+            Checks if a key is cached, without changing the order and the counters.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        """
+        Creates a LRUCache.
+
+        Args:
+            max_size (int): The maximum size in bytes of the cached arrays.
+        """
+        self._max_size: int = max_size
+        self._size: int = 0
+        self._items: OrderedDict[Hashable, np.ndarray] = OrderedDict()
+        self._hits: int = 0
+        self._misses: int = 0
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def max_size(self) -> int:
+        """
+        Gets the maximum size of the cache.
+
+        Returns:
+            int: The maximum size in bytes of the cached arrays.
+        """
+        return self._max_size
+
+    @property
+    def size(self) -> int:
+        """
+        Gets the current size of the cache.
+
+        Returns:
+            int: The current size in bytes of the cached arrays.
+        """
+        return self._size
+
+    @property
+    def hits(self) -> int:
+        """
+        Gets the number of cache hits.
+
+        Returns:
+            int: The number of lookups that found their key.
+        """
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """
+        Gets the number of cache misses.
+
+        Returns:
+            int: The number of lookups that didn't find their key.
+        """
+        return self._misses
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        """
+        Gets a cached array and marks it as the most recently used.
+
+        Args:
+            key (Hashable): The key of the array.
+
+        Returns:
+            Optional[np.ndarray]: The cached array, or None if the key isn't cached.
+        """
+        with self._lock:
+            value: Optional[np.ndarray] = self._items.get(key)
+            if value is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: np.ndarray) -> bool:
+        """
+        Caches an array, evicting the least recently used ones to stay in the size limit.
+
+        Args:
+            key (Hashable): The key of the array.
+            value (np.ndarray): The array to cache.
+
+        Returns:
+            bool: False if the array is larger than the whole cache and hasn't been cached.
+        """
+        if value.nbytes > self._max_size:
+            return False
+        with self._lock:
+            if key in self._items:
+                self._size -= self._items.pop(key).nbytes
+            while self._items and self._size + value.nbytes > self._max_size:
+                self._size -= self._items.popitem(last=False)[1].nbytes
+            self._items[key] = value
+            self._size += value.nbytes
+        return True
+
+    def clear(self) -> None:
+        """
+        Removes all the cached arrays.
+        """
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        """
+        Checks if a key is cached, without changing the order and the counters.
+
+        Args:
+            key (Hashable): The key of the array.
+
+        Returns:
+            bool: True if the key is cached.
+        """
+        with self._lock:
+            return key in self._items
@@ -0,0 +1,181 @@
+import time
+import threading
+import contextlib
+from typing import Callable, Dict, List
+
+
+class Stats:
+    """
+    The collector of the timing spans of the compression stages, shared by all the threads.
+    When it's disabled a span is a shared no-op context manager, so the instrumented code only pays the flag check.
+    It can also record only the whole operations, leaving out the stages inside them, like the matmul of each tile.
+
+    Attributes:
+        _enabled (bool): The flag that indicates if the spans are recorded.
+        _detailed (bool): The flag that indicates if the stages inside the operations are recorded too.
+        _stages (Dict[str, List[float]]): The number of calls, the total, the maximum and the last seconds of each stage.
+        _listeners (List[Callable[[str, float], None]]): The functions called at the end of each operation.
+        _lock (threading.Lock): The lock used to record the spans of many threads.
+        _DISABLED (contextlib.nullcontext): The span returned when the collector is disabled.
+
+    Methods:
+        enable(enabled: bool = True, detailed: bool = True) -> None:
+            Enables or disables the recording of the spans.
+        is_enabled() -> bool:
+            Gets if the spans are recorded.
+        span(name: str, operation: bool = False) -> contextlib.AbstractContextManager:
+            Gets a context manager timing a stage.
+        record(name: str, seconds: float, operation: bool = False) -> None:
+            Records the duration of a stage.
+        get_breakdown() -> Dict[str, Dict[str, float]]:
+            Gets the statistics of each stage.
+        clear() -> None:
+            Removes the recorded spans.
+        add_listener(listener: Callable[[str, float], None]) -> None:
+            Adds a function called with the name and the seconds of each operation.
+        remove_listener(listener: Callable[[str, float], None]) -> None:
+            Removes a function added with add_listener.
+    """
+
+    _enabled: bool = False
+    _detailed: bool = True
+    _stages: Dict[str, List[float]] = {}
+    _listeners: List[Callable[[str, float], None]] = []
+    _lock: threading.Lock = threading.Lock()
+    _DISABLED: contextlib.nullcontext = contextlib.nullcontext()
+
+    @staticmethod
+    def enable(enabled: bool = True, detailed: bool = True) -> None:
+        """
+        Enables or disables the recording of the spans.
+
+        Args:
+            enabled (bool): The flag that indicates if the spans are recorded.
+            detailed (bool): The flag that indicates if the stages inside the operations are recorded too.
+        """
+        Stats._enabled = enabled
+        Stats._detailed = detailed
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """
+        Gets if the spans are recorded.
+
+        Returns:
+            bool: The flag that indicates if the spans are recorded.
+        """
+        return Stats._enabled
+
+    @staticmethod
+    def span(name: str, operation: bool = False) -> contextlib.AbstractContextManager:
+        """
+        Gets a context manager timing a stage.
+
+        Args:
+            name (str): The name of the stage.
+            operation (bool): The flag that indicates if the stage is a whole operation, notified to the listeners.
+
+        Returns:
+            contextlib.AbstractContextManager: The span, a no-op one if the collector is disabled or the stage isn't
+                an operation and only the operations are recorded.
+        """
+        if not Stats._enabled or not (operation or Stats._detailed):
+            return Stats._DISABLED
+        return _Span(name, operation)
+
+    @staticmethod
+    def record(name: str, seconds: float, operation: bool = False) -> None:
+        """
+        Records the duration of a stage.
+
+        Args:
+            name (str): The name of the stage.
+            seconds (float): The duration of the stage.
+            operation (bool): The flag that indicates if the stage is a whole operation, notified to the listeners.
+        """
+        with Stats._lock:
+            stage: List[float] = Stats._stages.setdefault(name, [0, 0.0, 0.0, 0.0])
+            stage[0] += 1
+            stage[1] += seconds
+            stage[2] = max(stage[2], seconds)
+            stage[3] = seconds
+            listeners: List[Callable[[str, float], None]] = list(Stats._listeners) if operation else []
+        for i in listeners:
+            i(name, seconds)
+
+    @staticmethod
+    def get_breakdown() -> Dict[str, Dict[str, float]]:
+        """
+        Gets the statistics of each stage.
+
+        Returns:
+            Dict[str, Dict[str, float]]: The number of calls ("calls") and the total, mean, maximum and last seconds
+                ("total", "mean", "max", "last") of each stage, by name.
+        """
+        with Stats._lock:
+            return {name: {"calls": int(calls), "total": total, "mean": total / calls, "max": maximum, "last": last}
+                    for name, (calls, total, maximum, last) in Stats._stages.items()}
+
+    @staticmethod
+    def clear() -> None:
+        """
+        Removes the recorded spans.
+        """
+        with Stats._lock:
+            Stats._stages.clear()
+
+    @staticmethod
+    def add_listener(listener: Callable[[str, float], None]) -> None:
+        """
+        Adds a function called with the name and the seconds of each operation.
+        The function is called in the thread that ran the operation.
+
+        Args:
+            listener (Callable[[str, float], None]): The function to add.
+        """
+        with Stats._lock:
+            Stats._listeners.append(listener)
+
+    @staticmethod
+    def remove_listener(listener: Callable[[str, float], None]) -> None:
+        """
+        Removes a function added with add_listener.
+
+        Args:
+            listener (Callable[[str, float], None]): The function to remove.
+        """
+        with Stats._lock:
+            if listener in Stats._listeners:
+                Stats._listeners.remove(listener)
+
+
+class _Span:
+    """
+    The context manager timing a stage of an enabled Stats.
+
+    Attributes:
+        _name (str): The name of the stage.
+        _operation (bool): The flag that indicates if the stage is a whole operation.
+        _start (float): The performance counter at the start of the stage.
+    """
+
+    __slots__ = ("_name", "_operation", "_start")
+
+    def __init__(self, name: str, operation: bool) -> None:
+        """
+        Creates a _Span.
+
+        Args:
+            name (str): The name of the stage.
+            operation (bool): The flag that indicates if the stage is a whole operation.
+        """
+        self._name: str = name
+        self._operation: bool = operation
+        self._start: float = 0.0
+
+    def __enter__(self) -> "_Span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args) -> None:
+        Stats.record(self._name, time.perf_counter() - self._start, self._operation)
@@ -0,0 +1,239 @@
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from PySide6.QtCore import QCoreApplication
+from src.model.channel import Channel
+
+
+class TiledChannel:
+    """
+    Representation of a matrix split in square tiles, each one with its own SVD decomposition.
+
+    Attributes:
+        _tiles (List[Channel]): The decomposed tiles, by rows.
+        _rows (int): The number of rows of the matrix.
+        _columns (int): The number of columns of the matrix.
+        _tile_size (int): The number of rows and columns of a tile, the last ones can be smaller.
+
+    Methods:
+        from_tiles(tiles: List[Channel], shape: Tuple[int, int], tile_size: int) -> TiledChannel:
+            Creates a TiledChannel from already decomposed tiles.
+        to_dict() -> Dict:
+            Gets the dictionary of the tiles and of the matrix shape.
+        get_singular_values() -> int:
+            Gets the largest number of the singular values of the tiles.
+        get_errors() -> np.ndarray:
+            Gets the squared Frobenius error of the composition for each number of singular values.
+        downsample(step: int, period: Optional[int] = None) -> TiledChannel:
+            Gets the decomposition of the matrix averaged over blocks of step x step elements.
+        compose(k: int, out: Optional[np.ndarray] = None, buffer: Optional[np.ndarray] = None, start: int = 0) -> np.ndarray:
+            Compose the matrix from the tiles.
+        _get_slices() -> List[Tuple[slice, slice]]:
+            Gets the position of each tile in the matrix.
+    """
+
+    def __init__(self, matrix: np.ndarray, tile_size: int = 0, rank: Optional[int] = None,
+                 tolerance: Optional[float] = None, dtype: np.dtype = np.float64,
+                 executor: Optional[Executor] = None) -> None:
+        """
+        Create a TiledChannel instance.
+        Each tile is converted to dtype only when it's decomposed, so the memory used depends on the tile size.
+
+        Args:
+            matrix (np.ndarray): The matrix to decomposed or a np.ndarray containing the tiles.
+            tile_size (int): The number of rows and columns of a tile.
+            rank (Optional[int]): The maximum number of singular values to compute for each tile.
+            tolerance (Optional[float]): The minimum ratio between a singular value and the largest one of a tile to keep it.
+            dtype (np.dtype): The floating point type used for the decomposition.
+            executor (Optional[Executor]): The executor used to decompose the tiles concurrently.
+        """
+        if len(matrix.shape) == 0:
+            channel: Dict = matrix.item()
+            self._tiles: List[Channel] = channel["_tiles"]
+            self._rows: int = channel["_rows"]
+            self._columns: int = channel["_columns"]
+            self._tile_size: int = channel["_tile_size"]
+            return
+        self._rows, self._columns = matrix.shape
+        self._tile_size = tile_size
+        tiles: List[np.ndarray] = [matrix[i] for i in self._get_slices()]
+
+        def decompose(tile: np.ndarray) -> Channel:
+            return Channel(tile, rank, tolerance, dtype)
+
+        self._tiles = list(executor.map(decompose, tiles) if executor is not None else map(decompose, tiles))
+
+    @staticmethod
+    def from_tiles(tiles: List[Channel], shape: Tuple[int, int], tile_size: int) -> "TiledChannel":
+        """
+        Creates a TiledChannel from already decomposed tiles.
+
+        Args:
+            tiles (List[Channel]): The decomposed tiles, by rows.
+            shape (Tuple[int, int]): The number of rows and columns of the matrix.
+            tile_size (int): The number of rows and columns of a tile.
+
+        Returns:
+            TiledChannel: The created channel.
+        """
+        return TiledChannel(np.array({"_tiles": tiles, "_rows": shape[0], "_columns": shape[1], "_tile_size": tile_size}))
+
+    @property
+    def tiles(self) -> List[Channel]:
+        """
+        Gets the decomposed tiles.
+
+        Returns:
+            List[Channel]: The decomposed tiles, by rows.
+        """
+        return self._tiles
+
+    @property
+    def tile_size(self) -> int:
+        """
+        Gets the size of the tiles.
+
+        Returns:
+            int: The number of rows and columns of a tile.
+        """
+        return self._tile_size
+
+    @property
+    def norm(self) -> float:
+        """
+        Gets the norm of the decomposed matrix.
+
+        Returns:
+            float: The squared Frobenius norm of the decomposed matrix.
+        """
+        return sum(i.norm for i in self._tiles)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Gets the memory used by the decomposition.
+
+        Returns:
+            int: The size in bytes of the matrices of the tiles in memory.
+        """
+        return sum(i.nbytes for i in self._tiles)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """
+        Gets the shape of the decomposed matrix.
+
+        Returns:
+            Tuple[int, int]: The number of rows and columns of the matrix.
+        """
+        return (self._rows, self._columns)
+
+    @property
+    def dtype(self) -> np.dtype:
+        """
+        Gets the type of the composed matrix.
+
+        Returns:
+            np.dtype: The type of the u, s and vt matrices of the tiles.
+        """
+        return np.result_type(*[i.dtype for i in self._tiles])
+
+    def to_dict(self) -> Dict:
+        """
+        Gets the dictionary of the tiles and of the matrix shape.
+
+        Returns:
+            Dict: The dictionary used to save the channel.
+        """
+        return {"_tiles": self._tiles, "_rows": self._rows, "_columns": self._columns, "_tile_size": self._tile_size}
+
+    def get_singular_values(self) -> int:
+        """
+        Gets the largest number of the singular values of the tiles.
+
+        Returns:
+            The number of singular values.
+        """
+        return max(i.get_singular_values() for i in self._tiles)
+
+    def get_errors(self) -> np.ndarray:
+        """
+        Gets the squared Frobenius error of the composition for each number of singular values.
+        A tile with less singular values keeps the error of its whole decomposition.
+
+        Returns:
+            np.ndarray: The squared errors of the compositions from 0 to the largest number of singular values.
+        """
+        errors: np.ndarray = np.zeros(self.get_singular_values() + 1)
+        for i in self._tiles:
+            tile_errors: np.ndarray = i.get_errors()
+            errors[:tile_errors.shape[0]] += tile_errors
+            errors[tile_errors.shape[0]:] += tile_errors[-1]
+        return errors
+
+    def downsample(self, step: int, period: Optional[int] = None) -> "TiledChannel":
+        """
+        Gets the decomposition of the matrix averaged over blocks of step x step elements.
+        The blocks restart at the edges of each tile, or every period rows and columns inside it, so no block crosses
+        two tiles and the step doesn't need to divide the tile size: the last block of each period is averaged over
+        the elements it has.
+        A period is used by the subsampled chroma planes, whose tiles cover more than one tile of the luma.
+
+        Args:
+            step (int): The number of rows and columns averaged together.
+            period (Optional[int]): The number of rows and columns after which the blocks restart, a divisor of the
+                tile size, by default the tile size.
+
+        Returns:
+            TiledChannel: The decomposition of the averaged matrix, split in tiles of ceil(period / step) elements
+                for each period.
+        """
+        period = period or self._tile_size
+        tiles: List[Channel] = [i.downsample(step, period) for i in self._tiles]
+        per_row: int = -(-self._columns // self._tile_size)
+        shape: Tuple[int, int] = (sum(i.shape[0] for i in tiles[::per_row]), sum(i.shape[1] for i in tiles[:per_row]))
+        return TiledChannel.from_tiles(tiles, shape, self._tile_size // period * -(-period // step))
+
+    def compose(self, k: int, out: Optional[np.ndarray] = None, buffer: Optional[np.ndarray] = None,
+                start: int = 0) -> np.ndarray:
+        """
+        Compose the matrix from the tiles.
+        Each tile uses at most its own number of singular values.
+
+        Args;
+            k (int): The number of singular values to use in the composition.
+            out (Optional[np.ndarray]): The matrix where to write the result, it must have the channel shape and dtype.
+            buffer (Optional[np.ndarray]): A flat array of at least tile_size * (k - start) elements of the channel dtype.
+            start (int): The index of the first singular value to use in the composition.
+
+        Returns:
+            np.ndarray The composed matrix.
+
+        Raises:
+            ValueError: if k is greater than the number of singular values.
+        """
+        values: int = self.get_singular_values()
+        if k > values:
+            raise ValueError(QCoreApplication.translate("Cli", "values").format(values=k, max=values))
+        if out is None:
+            out = np.empty(self.shape, self.dtype)
+        if buffer is None:
+            buffer = np.empty(self._tile_size * (k - start), self.dtype)
+        for tile, position in zip(self._tiles, self._get_slices()):
+            tile_k: int = min(k, tile.get_singular_values())
+            tile_start: int = min(start, tile_k)
+            if tile_k == tile_start:
+                out[position] = 0
+            else:
+                tile.compose(tile_k, out[position], buffer, tile_start)
+        return out
+
+    def _get_slices(self) -> List[Tuple[slice, slice]]:
+        """
+        Gets the position of each tile in the matrix.
+
+        Returns:
+            List[Tuple[slice, slice]]: The row and column slices of the tiles, by rows.
+        """
+        return [(slice(i, i + self._tile_size), slice(j, j + self._tile_size))
+                for i in range(0, self._rows, self._tile_size) for j in range(0, self._columns, self._tile_size)]
@@ -1,9 +1,14 @@
+import time
 import functools
 import threading
+from typing import Optional, Union
 import numpy as np
-from PySide6.QtCore import Qt, QCoreApplication
+from PySide6.QtCore import Qt, QCoreApplication, Signal
 from PySide6.QtGui import QPixmap, QImage, QAction
-from PySide6.QtWidgets import QWidget, QLabel, QVBoxLayout, QSlider, QHBoxLayout, QLineEdit
+from PySide6.QtWidgets import QWidget, QLabel, QVBoxLayout, QSlider, QHBoxLayout, QLineEdit, QProgressBar
+from src.model.stats import Stats
+from src.model.disk_cache import DiskCache
+from src.control.memory_governor import MemoryGovernor
 
 
 class Panel(QWidget):
@@ -14,33 +19,52 @@ class Panel(QWidget):
         _image (QLAbel): The label that contains the graphic representation of the image to compress.
         _slider (QSlider): The slider used to select the number of singular values.
         _slider_line (QLineEdit): The entry to show and change the slider value.
+        _progress (QProgressBar): The bar showing the progress of the decomposition, hidden when it ends.
         _loaded (bool): The flag that indicates if the image has been loaded.
         _panel_controller (PanelController): The controller of the panel.
+        frame (Signal): The signal used to return the seconds used by a worker thread to compose an image and the ones
+            used by the gui thread to show it.
+        DISPLAY_SIZE (int): The minimum number of rows and columns of the shown images.
 
     Methods:
-        set_image(image: Image.Image, k: int) -> None:
+        to_display(image: np.ndarray) -> QImage:
+            Converts an image to a QImage scaled to the display size.
+        set_image(image: Union[np.ndarray, QImage], k: int = -1, seconds: float = 0.0) -> None:
             Sets the images to show.
+        set_progress(percentage: int) -> None:
+            Shows the progress of the decomposition.
         save(path: str) -> None:
             Saves the image.
+        stop() -> None:
+            Stops the threads of the panel without waiting for them.
+        activate() -> None:
+            Marks the panel as the active one for the memory budget.
         def _add_components() -> None:
             Adds and initializes the gui components of the panel.
     """
 
-    def __init__(self, path: str, save_action: QAction) -> None:
+    frame: Signal = Signal(float, float)
+    DISPLAY_SIZE: int = 400
+
+    def __init__(self, path: str, save_action: QAction, governor: MemoryGovernor,
+                 disk_cache: Optional[DiskCache] = None) -> None:
         """
         Creates a Panel.
 
         Args:
             path (str): The path to the file of the panel.
             save_action (QAction): The action used to save the images.
+            governor (MemoryGovernor): The memory budget shared by the panels.
+            disk_cache (Optional[DiskCache]): The persistent cache of the decompositions, None to disable it.
         """
         super().__init__()
         from ..control.panel_controller import PanelController
         self._image: QLabel = QLabel()
         self._slider: QSlider = QSlider(Qt.Horizontal)
         self._slider_line: QLineEdit = QLineEdit()
+        self._progress: QProgressBar = QProgressBar()
         self._loaded: bool = False
-        self._panel_controller: PanelController = PanelController(self, save_action)
+        self._panel_controller: PanelController = PanelController(self, save_action, governor, disk_cache)
         self._add_components()
         self._panel_controller.load_image(path)
 
@@ -74,37 +98,78 @@ class Panel(QWidget):
         """
         return self._loaded
 
-    def set_image(self, image: np.ndarray, k: int = -1) -> None:
+    @staticmethod
+    def to_display(image: np.ndarray) -> QImage:
         """
-        Sets the images to show.
+        Converts an image to a QImage scaled to the display size.
+        It doesn't use any widget, so the compose threads call it to leave only a blit to the gui thread.
+        An image already at the display size isn't scaled, so it's copied out of the array, which the compressor
+        overwrites with the next composition.
 
         Args:
-            image (np.ndarray): The data of the image to show.
-            k (int): The number of singular values of the image.
+            image (np.ndarray): The data of the image, with 1, 3 or 4 contiguous channels.
+
+        Returns:
+            QImage: The scaled image, owning its data.
 
         Raises:
             ValueError: is the number of channel of the image is not supported.
         """
-        height, width = image.shape[:2]
-        qimage: QImage
-        if len(image.shape) == 2:
-            qimage = QImage(image.data, width, height, width, QImage.Format_Grayscale8)
-        elif len(image.shape) == 3:
-            if image.shape[2] == 3:
+        with Stats.span("scale"):
+            image = np.ascontiguousarray(image.squeeze())
+            height, width = image.shape[:2]
+            qimage: QImage
+            if len(image.shape) == 2:
+                qimage = QImage(image.data, width, height, width, QImage.Format_Grayscale8)
+            elif len(image.shape) == 3 and image.shape[2] == 3:
                 qimage = QImage(image.data, width, height, 3 * width, QImage.Format_RGB888)
-            elif image.shape[2] == 4:
+            elif len(image.shape) == 3 and image.shape[2] == 4:
                 qimage = QImage(image.data, width, height, 4 * width, QImage.Format_RGBA8888)
             else:
                 raise ValueError(QCoreApplication.translate("Gui", "channels"))
-        pixmap: QPixmap = QPixmap.fromImage(qimage)
-        pixmap = pixmap.scaled(400, 400, Qt.KeepAspectRatioByExpanding)
-        self._image.setPixmap(pixmap)
+            scaled: QImage = qimage.scaled(Panel.DISPLAY_SIZE, Panel.DISPLAY_SIZE, Qt.KeepAspectRatioByExpanding,
+                                           Qt.SmoothTransformation)
+            return scaled if scaled.size() != qimage.size() else qimage.copy()
+
+    def set_image(self, image: Union[np.ndarray, QImage], k: int = -1, seconds: float = 0.0) -> None:
+        """
+        Sets the images to show.
+        A QImage from to_display is only copied in the pixmap, an array is converted and scaled in the gui thread.
+        The seconds used to compose and show a QImage are returned by the frame signal.
+
+        Args:
+            image (Union[np.ndarray, QImage]): The data of the image to show or the scaled image.
+            k (int): The number of singular values of the image.
+            seconds (float): The seconds used by the worker thread to compose and scale a QImage.
+
+        Raises:
+            ValueError: is the number of channel of the image is not supported.
+        """
+        start: float = time.perf_counter()
+        composed: bool = isinstance(image, QImage)
+        if not composed:
+            image = Panel.to_display(image)
+        with Stats.span("display"):
+            self._image.setPixmap(QPixmap.fromImage(image))
+        if composed:
+            self.frame.emit(seconds, time.perf_counter() - start)
         if k != -1:
             self._slider.setMinimum(0)
             self._slider.setMaximum(k)
             self._slider.setEnabled(True)
+            self._progress.hide()
             self._loaded = True
 
+    def set_progress(self, percentage: int) -> None:
+        """
+        Shows the progress of the decomposition, the bar is hidden at 100% once the image has been loaded.
+
+        Args:
+            percentage (int): The decomposed percentage of the image.
+        """
+        self._progress.setValue(percentage)
+        self._progress.setVisible(percentage < 100 or not self._loaded)
+
     def save(self, path: str) -> None:
         """
         Saves the image
@@ -114,6 +179,18 @@ class Panel(QWidget):
         """
         self._panel_controller.save(path)
 
+    def stop(self) -> None:
+        """
+        Stops the threads of the panel without waiting for them.
+        """
+        self._panel_controller.stop()
+
+    def activate(self) -> None:
+        """
+        Marks the panel as the active one for the memory budget.
+        """
+        self._panel_controller.activate()
+
     def _add_components(self) -> None:
         """
         Adds and initializes the gui components of the panel.
@@ -122,16 +199,18 @@ class Panel(QWidget):
         self._slider.setMaximum(100)
         self._slider.setEnabled(False)
         self._slider.sliderReleased.connect(self._panel_controller.change_value)
+        self._slider.sliderMoved.connect(self._panel_controller.move_value)
         self._slider_line.setText("0")
         self._slider_line.editingFinished.connect(self._panel_controller.change_line)
         pixmap: QPixmap = QPixmap("./assets/loading.png")
         slider_layout: QHBoxLayout = QHBoxLayout()
         layout: QVBoxLayout = QVBoxLayout()
         layout.setAlignment(Qt.AlignHCenter)
-        pixmap = pixmap.scaled(400, 400, Qt.KeepAspectRatioByExpanding)
+        pixmap = pixmap.scaled(Panel.DISPLAY_SIZE, Panel.DISPLAY_SIZE, Qt.KeepAspectRatioByExpanding)
         self._image.setPixmap(pixmap)
         slider_layout.addWidget(self._slider, stretch=10)
         slider_layout.addWidget(self._slider_line, stretch=1)
         layout.addLayout(slider_layout)
+        layout.addWidget(self._progress)
         layout.addWidget(self._image)
         self.setLayout(layout)
\ No newline at end of file
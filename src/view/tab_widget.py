@@ -1,6 +1,7 @@
 from PySide6.QtCore import Qt, QCoreApplication
 from PySide6.QtGui import QMouseEvent, QAction
-from PySide6.QtWidgets import QTabWidget, QTabBar
+from PySide6.QtWidgets import QTabWidget, QTabBar, QWidget
+from src.view.panel import Panel
 
 
 class TabWidget(QTabWidget):
@@ -14,7 +15,9 @@ class TabWidget(QTabWidget):
         mouse_event(self, event: QMouseEvent) -> None:
             Handles the mouse press on the tab title.
         close_tab(index: int) -> None:
-            Closes a tab of the widget and closes the app if there isn't any open tab.
+            Closes a tab of the widget, stopping its threads, and closes the app if there isn't any open tab.
+        _activate(index: int) -> None:
+            Activates the panel of the current tab.
     """
     def __init__(self, save_action: QAction) -> None:
         """
@@ -29,18 +32,34 @@ class TabWidget(QTabWidget):
         self.tabBar().mousePressEvent = self.mouse_event
         self.setTabsClosable(True)
         self.tabCloseRequested.connect(self.close_tab)
+        self.currentChanged.connect(self._activate)
 
     def close_tab(self, index: int) -> None:
         """
-        Closes a tab of the widget and closes the app if there isn't any open tab.
+        Closes a tab of the widget, stopping its threads, and closes the app if there isn't any open tab.
+        The threads are stopped without waiting for them, so a decomposition or a save in progress doesn't block the GUI.
 
         Args:
             index (int): The index of the tab to close.
         """
+        widget: QWidget = self.widget(index)
         self.removeTab(index)
+        if isinstance(widget, Panel):
+            widget.stop()
         if self.count() == 0:
             QCoreApplication.quit()
 
+    def _activate(self, index: int) -> None:
+        """
+        Activates the panel of the current tab.
+
+        Args:
+            index (int): The index of the current tab, -1 if there isn't any tab.
+        """
+        widget: QWidget = self.widget(index)
+        if isinstance(widget, Panel):
+            widget.activate()
+
     def mouse_event(self, event: QMouseEvent) -> None:
         """
         Handles the mouse press on the tab title.
@@ -1,10 +1,14 @@
 import os.path
 import typing
-from PySide6.QtCore import QCoreApplication
+from typing import Dict, Optional
+from PySide6.QtCore import QCoreApplication, Signal
 from PySide6.QtWidgets import QMainWindow, QToolBar, QScrollArea, QTabWidget, QMenuBar, QMenu, QWidget, QMessageBox
 from PySide6.QtGui import QAction, QIcon
 from src.view.panel import Panel
 from src.view.tab_widget import TabWidget
+from src.model.stats import Stats
+from src.model.disk_cache import DiskCache
+from src.control.memory_governor import MemoryGovernor
 
 
 class Window(QMainWindow):
@@ -14,6 +18,8 @@ class Window(QMainWindow):
     Attributes:
         _menu_controller (MenuController): The controller used for the window menu.
         _tab_widget (TabWidget): The widget used as main part of the window.
+        _governor (MemoryGovernor): The memory budget shared by the panels of the tabs.
+        latency (Signal): The signal used to show the name and the seconds of the last operation in the status bar.
 
     Methods:
         create_message_dialog(parent: QWidget, title: str, text: str) -> None:
@@ -30,8 +36,16 @@ class Window(QMainWindow):
             Creates the toolbar and load it in the window.
         _add_tab_widget() -> None:
             Creates the main part of the window.
+        _show_latency(operation: str, seconds: float) -> None:
+            Shows the duration of the last operation in the status bar.
+        _record(operation: str, seconds: float) -> None:
+            Forwards the duration of a loading or a saving to the latency signal.
+        _show_frame(compose: float, display: float) -> None:
+            Shows the seconds used to compose and to show the last image in the status bar.
     """
 
+    latency: Signal = Signal(str, float)
+
     def __init__(self, locale: str) -> None:
         """
         Creates a Window.
@@ -43,11 +57,16 @@ class Window(QMainWindow):
         from ..control.menu_controller import MenuController
         self._menu_controller: MenuController = MenuController(self, locale)
         self._tab_widget: TabWidget = TabWidget(self._menu_controller.actions["save"])
+        self._governor: MemoryGovernor = MemoryGovernor()
+        QCoreApplication.instance().aboutToQuit.connect(self._governor.close)
         self.setWindowTitle("ImageS-VD")
         self.setWindowIcon(QIcon("./assets/images_vd.png"))
         self.setGeometry(100, 100, 800, 600)
         self._menu_controller.actions[locale].setChecked(True)
         self._add_components()
+        self.latency.connect(self._show_latency)
+        Stats.enable(detailed=False)
+        Stats.add_listener(self._record)
         self.show()
 
     @staticmethod
@@ -69,11 +88,15 @@ class Window(QMainWindow):
     def add_tab(self, path: str) -> None:
         """
         Adds a tab to the main port of the window.
+        The panel uses the disk cache of the decompositions if it's enabled in the menu.
 
         Args:
             path (str): The path to file to open.
         """
-        self._tab_widget.addTab(Panel(path, self._menu_controller.actions["save"]), os.path.split(path)[1])
+        disk_cache: Optional[DiskCache] = DiskCache() if self._menu_controller.actions["cache"].isChecked() else None
+        panel: Panel = Panel(path, self._menu_controller.actions["save"], self._governor, disk_cache)
+        panel.frame.connect(self._show_frame)
+        self._tab_widget.addTab(panel, os.path.split(path)[1])
 
     def get_current_panel(self) -> Panel:
         """
@@ -89,6 +112,7 @@ class Window(QMainWindow):
         self._add_menubar()
         self._add_toolbar()
         self._add_tab_widget()
+        self.statusBar()
 
     def _add_menubar(self) -> None:
         """
@@ -103,6 +127,7 @@ class Window(QMainWindow):
         language_menu: QMenu = about_menu.addMenu(QCoreApplication.translate("Gui", "lang"))
         language_menu.addAction(actions["en"])
         language_menu.addAction(actions["it"])
+        about_menu.addAction(actions["cache"])
         about_menu.addAction(actions["about"])
         about_menu.addAction(actions["exit"])
 
@@ -123,3 +148,38 @@ class Window(QMainWindow):
         scroll_area.setWidgetResizable(True)
         scroll_area.setWidget(self._tab_widget)
         self.setCentralWidget(scroll_area)
+
+    def _show_latency(self, operation: str, seconds: float) -> None:
+        """
+        Shows the duration of the last operation in the status bar.
+        The operations run in other threads, so they are received through the latency signal.
+
+        Args:
+            operation (str): The name of the operation.
+            seconds (float): The duration of the operation.
+        """
+        self.statusBar().showMessage(QCoreApplication.translate("Gui", f"latency_{operation}").format(
+            milliseconds="{:.1f}".format(seconds * 1000)))
+
+    def _record(self, operation: str, seconds: float) -> None:
+        """
+        Forwards the duration of a loading or a saving to the latency signal.
+        The compositions include the prefetched images, which aren't shown, so they are reported by the panels.
+
+        Args:
+            operation (str): The name of the operation.
+            seconds (float): The duration of the operation.
+        """
+        if operation != "compose":
+            self.latency.emit(operation, seconds)
+
+    def _show_frame(self, compose: float, display: float) -> None:
+        """
+        Shows the seconds used to compose and to show the last image in the status bar.
+
+        Args:
+            compose (float): The duration of the composition and of the scaling in the worker thread.
+            display (float): The duration of the display in the gui thread.
+        """
+        self.statusBar().showMessage(QCoreApplication.translate("Gui", "latency_frame").format(
+            compose="{:.1f}".format(compose * 1000), display="{:.1f}".format(display * 1000)))
@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QImage, QPixmap
+from PySide6.QtWidgets import QApplication
+from src.model.compressor import Compressor
+from src.model.channel import Channel
+from src.view.panel import Panel
+
+
+class Benchmark:
+    """
+    The class used to measure the performance of the decomposition, of the composition, of the display and of the file I/O.
+    The ycbcr cases decompose the color images as luma and subsampled chroma planes with a quarter of the rank.
+    The display cases compare the gui thread time of a full resolution image scaled by the pixmap (display_full)
+    with the one of a preview scaled by to_display in the compose thread (display_scale) and then blitted (display_blit).
+    Each case runs once tracing the peak of the allocated memory, then it's timed several times on synthetic images.
+
+    Attributes:
+        _sizes (List[Tuple[int, int]]): The rows and columns of the synthetic images.
+        _channels (List[int]): The numbers of channels of the synthetic images.
+        _ranks (List[Optional[int]]): The ranks of the decompositions, None for the full one.
+        _repeats (int): The number of timed runs of each case.
+        _directory (str): The temporary directory of the synthetic images and of the saved files.
+        _results (Dict[str, Dict[str, float]]): The measures of each case, by name.
+        MIN_SECONDS (float): The minimum time of a baseline case to compare it.
+
+    Methods:
+        get_image(rows: int, columns: int, channels: int, seed: int = 0) -> np.ndarray:
+            Creates a synthetic image with a decaying spectrum, like the one of a photo.
+        compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+            Compares the minimum times of two runs.
+        run() -> Dict[str, Any]:
+            Runs all the cases.
+        _measure(name: str, function: Callable[[], Any], setup: Optional[Callable[[], Any]] = None) -> None:
+            Measures the time and the peak memory of a case.
+    """
+
+    MIN_SECONDS: float = 5e-3
+
+    def __init__(self, sizes: List[Tuple[int, int]], channels: List[int], ranks: List[Optional[int]],
+                 repeats: int, directory: str) -> None:
+        """
+        Creates a Benchmark.
+
+        Args:
+            sizes (List[Tuple[int, int]]): The rows and columns of the synthetic images.
+            channels (List[int]): The numbers of channels of the synthetic images.
+            ranks (List[Optional[int]]): The ranks of the decompositions, None for the full one.
+            repeats (int): The number of timed runs of each case.
+            directory (str): The temporary directory of the synthetic images and of the saved files.
+        """
+        self._sizes: List[Tuple[int, int]] = sizes
+        self._channels: List[int] = channels
+        self._ranks: List[Optional[int]] = ranks
+        self._repeats: int = repeats
+        self._directory: str = directory
+        self._results: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def get_image(rows: int, columns: int, channels: int, seed: int = 0) -> np.ndarray:
+        """
+        Creates a synthetic image with a decaying spectrum, like the one of a photo.
+
+        Args:
+            rows (int): The number of rows of the image.
+            columns (int): The number of columns of the image.
+            channels (int): The number of channels of the image.
+            seed (int): The seed of the random generator.
+
+        Returns:
+            np.ndarray: The uint8 image, with a channel axis only if channels is greater than 1.
+        """
+        rng: np.random.Generator = np.random.default_rng(seed)
+        rank: int = min(rows, columns)
+        u: np.ndarray = np.cumsum(rng.standard_normal((channels, rows, rank)), axis=1)
+        vt: np.ndarray = np.cumsum(rng.standard_normal((channels, rank, columns)), axis=2)
+        s: np.ndarray = 1 / np.arange(1, rank + 1) ** 1.5
+        image: np.ndarray = np.matmul(u * s, vt) + rng.standard_normal((channels, rows, columns)) * 0.01
+        image -= image.min(axis=(1, 2), keepdims=True)
+        image *= 255 / image.max(axis=(1, 2), keepdims=True)
+        image = np.moveaxis(image.astype(np.uint8), 0, -1)
+        return image[:, :, 0] if channels == 1 else image
+
+    @staticmethod
+    def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+        """
+        Compares the minimum times of two runs, the least affected by the load of the machine.
+        The cases faster than MIN_SECONDS in the baseline are skipped, since their times are mostly noise.
+
+        Args:
+            results (Dict[str, Any]): The current run.
+            baseline (Dict[str, Any]): The stored run.
+            tolerance (float): The maximum fraction a case can be slower than the baseline.
+
+        Returns:
+            List[str]: The description of each regression.
+        """
+        regressions: List[str] = []
+        for name, result in results["cases"].items():
+            reference: Optional[Dict[str, float]] = baseline["cases"].get(name)
+            if reference is None or reference["min"] < Benchmark.MIN_SECONDS:
+                continue
+            ratio: float = result["min"] / reference["min"]
+            if ratio > 1 + tolerance:
+                regressions.append(f"{name}: {result['min']:.4f}s against {reference['min']:.4f}s (x{ratio:.2f})")
+        return regressions
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Runs all the cases.
+
+        Returns:
+            Dict[str, Any]: The environment of the run and the measures of each case.
+        """
+        for rows, columns in self._sizes:
+            matrix: np.ndarray = Benchmark.get_image(rows, columns, 1).astype(np.float64)
+            for rank in self._ranks:
+                name: str = f"{rows}x{columns}/{'full' if rank is None else rank}"
+                channel: Channel = Channel(matrix, rank)
+                k: int = channel.get_singular_values()
+                out: np.ndarray = np.empty(matrix.shape)
+                self._measure(f"channel_init/{name}", lambda: Channel(matrix, rank))
+                self._measure(f"channel_compose/{name}", lambda: channel.compose(k, out))
+            for channels in self._channels:
+                path: str = os.path.join(self._directory, f"{rows}x{columns}x{channels}.png")
+                Image.fromarray(Benchmark.get_image(rows, columns, channels)).save(path)
+                for rank in self._ranks:
+                    name = f"{rows}x{columns}x{channels}/{'full' if rank is None else rank}"
+                    compressor: Compressor = Compressor(cache_size=0)
+                    k = compressor.load(path, rank)
+                    self._measure(f"compressor_load/{name}", lambda: Compressor(cache_size=0).load(path, rank))
+                    self._measure(f"compressor_compose/{name}", lambda: compressor.compose(k),
+                                  lambda: compressor.compose(0))
+                    self._measure(f"compressor_compose_step/{name}", lambda: compressor.compose(k),
+                                  lambda: compressor.compose(k - 1))
+                    if channels == 3:
+                        options: Dict[str, Any] = {"color_space": "ycbcr", "subsampling": 2,
+                                                   "chroma_rank": None if rank is None else max(1, rank // 4)}
+                        ycbcr: Compressor = Compressor(cache_size=0)
+                        ycbcr.load(path, rank, **options)
+                        self._measure(f"compressor_load_ycbcr/{name}",
+                                      lambda: Compressor(cache_size=0).load(path, rank, **options))
+                        self._measure(f"compressor_compose_ycbcr/{name}", lambda: ycbcr.compose(k),
+                                      lambda: ycbcr.compose(0))
+                    compressor.compose(k)
+                    image: np.ndarray = np.ascontiguousarray(compressor.image.squeeze())
+                    full: QImage = QImage(image.data, columns, rows, image.strides[0],
+                                          QImage.Format_RGB888 if channels == 3 else QImage.Format_Grayscale8)
+                    preview: Compressor = compressor.get_preview(Panel.DISPLAY_SIZE)
+                    preview.compose(k)
+                    scaled: QImage = Panel.to_display(preview.image)
+                    self._measure(f"display_full/{name}", lambda: QPixmap.fromImage(full).scaled(
+                        Panel.DISPLAY_SIZE, Panel.DISPLAY_SIZE, Qt.KeepAspectRatioByExpanding))
+                    self._measure(f"display_scale/{name}", lambda: Panel.to_display(preview.image))
+                    self._measure(f"display_blit/{name}", lambda: QPixmap.fromImage(scaled))
+                    for ext in [".jpg", ".png", ".npz", ".isvd"]:
+                        result: str = os.path.join(self._directory, f"result{ext}")
+                        self._measure(f"compressor_save{ext}/{name}", lambda: compressor.save(result))
+                        if ext in Compressor.DECOMPOSITION_FORMATS:
+                            self._measure(f"compressor_load{ext}/{name}",
+                                          lambda: Compressor(cache_size=0).load(result))
+        return {
+            "environment": {
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "machine": platform.machine(),
+                "cpus": os.cpu_count()
+            },
+            "cases": self._results
+        }
+
+    def _measure(self, name: str, function: Callable[[], Any], setup: Optional[Callable[[], Any]] = None) -> None:
+        """
+        Measures the time and the peak memory of a case.
+        The traced run comes first, so it also warms up the caches before the timed ones.
+
+        Args:
+            name (str): The name of the case.
+            function (Callable[[], Any]): The measured function.
+            setup (Optional[Callable[[], Any]]): The function called before each run, it isn't measured.
+        """
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        function()
+        peak: int = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        times: List[float] = []
+        for _ in range(self._repeats):
+            if setup is not None:
+                setup()
+            start: float = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        self._results[name] = {"median": float(np.median(times)), "min": min(times), "peak_bytes": peak}
+        print(f"{name}\t{self._results[name]['median']:.4f}s\t{peak / 1024 ** 2:.1f} MiB", file=sys.stderr)
+
+
+def main() -> int:
+    """
+    Runs the benchmark from the command line.
+
+    Returns:
+        int: The exit code, 1 if a case regressed against the baseline.
+    """
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=Benchmark.__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="256x256,1024x768", help="The image sizes, like 1024x768.")
+    parser.add_argument("--channels", default="1,3", help="The numbers of channels.")
+    parser.add_argument("--ranks", default="full,50", help="The ranks of the decompositions, full for all of them.")
+    parser.add_argument("--repeats", type=int, default=3, help="The number of timed runs of each case.")
+    parser.add_argument("--output", help="The JSON file where to write the results, by default the standard output.")
+    parser.add_argument("--baseline", help="The JSON file of a previous run to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="The maximum slowdown fraction against the baseline.")
+    arguments: argparse.Namespace = parser.parse_args()
+    app: QApplication = QApplication.instance() or QApplication(sys.argv[:1])
+    sizes: List[Tuple[int, int]] = [(int(i.split("x")[0]), int(i.split("x")[1])) for i in arguments.sizes.split(",")]
+    channels: List[int] = [int(i) for i in arguments.channels.split(",")]
+    ranks: List[Optional[int]] = [None if i == "full" else int(i) for i in arguments.ranks.split(",")]
+    with tempfile.TemporaryDirectory() as directory:
+        results: Dict[str, Any] = Benchmark(sizes, channels, ranks, arguments.repeats, directory).run()
+    if arguments.output is not None:
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent=4)
+    else:
+        print(json.dumps(results, indent=4))
+    if arguments.baseline is None:
+        return 0
+    with open(arguments.baseline) as file:
+        regressions: List[str] = Benchmark.compare(results, json.load(file), arguments.tolerance)
+    for i in regressions:
+        print(f"Regression: {i}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,25 @@
 import os
 import functools
+import tempfile
 import unittest
+from typing import Callable, Dict, List, Optional, Tuple, Union
 import numpy as np
+from PIL import Image
+from PySide6.QtGui import QImage
 from src.model.compressor import Compressor
 from src.model.channel import Channel
+from src.model.color_space import ColorSpace
+from src.model.tiled_channel import TiledChannel
+from src.model.stats import Stats
+from src.model.disk_cache import DiskCache
+from src.control.batch_controller import BatchController
+from src.control.compose_thread import ComposeThread
+from src.control.memory_governor import MemoryGovernor
+from src.view.panel import Panel
+try:
+    import resource
+except ImportError:
+    resource = None
 
 
 class Test(unittest.TestCase):
@@ -22,20 +38,72 @@ class Test(unittest.TestCase):
             Compares two matrices with a threshold value.
         test_channel_from_matrix() -> None:
             Tests a channel creation from a np.ndarray.
+        test_channel_compose_out() -> None:
+            Tests the composition of a channel into preallocated arrays.
         test_channel_out_of_bound_value() -> None:
             Tests the exception throwing for an out of bound singular value.
+        test_channel_randomized() -> None:
+            Tests the accuracy of a rank limited decomposition against the exact one.
+        test_channel_tolerance() -> None:
+            Tests the truncation of a decomposition with a tolerance.
+        test_channel_float32() -> None:
+            Tests the reconstruction error of a float32 decomposition against a float64 one.
         test_compressor_from_svd() -> None:
             Tests a channel creation from a {u, s, vt} dictionany.
+        test_compressor_workers() -> None:
+            Tests that the concurrent decomposition gives the same result of the sequential one.
         test_compressor_negative_value() -> None:
             Tests the exception throwing for a negative singular value.
         test_compressor_grayscale() -> None:
             Tests the compression of a grayscale image.
         test_compressor_rgb() -> None.
             Tests the compression of a RGB image.
+        test_compressor_incremental() -> None:
+            Tests that the incremental compositions match the full ones.
+        test_compressor_cancel() -> None:
+            Tests the cancellation of a composition at a chunk boundary.
+        test_compressor_cache() -> None:
+            Tests the cache of the composed images.
+        test_compressor_tiled() -> None:
+            Tests the decomposition and composition of an image split in tiles.
+        test_compressor_sweep() -> None:
+            Tests the composition of many numbers of singular values from a single decomposition.
+        test_compressor_preview() -> None:
+            Tests the composition of an image downsampled by averaging the singular vectors.
+        test_compressor_preview_tiles() -> None:
+            Tests the downsampling of tiles whose size isn't a multiple of the step.
+        test_compressor_reduced() -> None:
+            Tests the quick decomposition of a reduced image and the progress of the decomposition.
+        test_compressor_ycbcr() -> None:
+            Tests the decomposition of the luma and subsampled chroma planes with independent ranks.
+        test_compressor_metrics() -> None:
+            Tests the quality metrics computed from the singular values.
+        test_compressor_select_rank() -> None:
+            Tests the selection of the number of singular values from quality and size targets.
         test_npz_grayscale() -> None:
             Tests the saving and loading of an .npz file of a grayscale image.
         test_npz_rgb() -> None:
             Tests the saving and loading of an .npz file of a RGB image.
+        test_isvd() -> None:
+            Tests the saving and the memory mapped loading of an .isvd file.
+        test_isvd_many_tiles() -> None:
+            Tests the loading of an .isvd file with more arrays than the open files limit.
+        test_isvd_quantized() -> None:
+            Tests the saving of a truncated, quantized and compressed .isvd file and the report of their tradeoffs.
+        test_isvd_lazy() -> None:
+            Tests the loading on demand of the singular vectors of an .isvd file.
+        test_disk_cache() -> None:
+            Tests the hits, the eviction and the unreadable entries of the persistent cache of the decompositions.
+        test_batch() -> None:
+            Tests the compression of many files with a failing one.
+        test_compose_thread() -> None:
+            Tests the composition of the requested images and the prefetching of the near ones.
+        test_panel_display() -> None:
+            Tests that the scaled images of the panel don't share the composed arrays.
+        test_memory_governor() -> None:
+            Tests the spilling of the least recently activated compressors over the memory budget.
+        test_stats() -> None:
+            Tests the timing spans of the compression stages.
     """
 
     def setUp(self) -> None:
@@ -54,10 +122,10 @@ class Test(unittest.TestCase):
             matrix (np.ndarray): The matrix to compare.
             threshold (float): The threshold to use during the composition.
         """
-        for i in range(self._matrix.shape[0]):
-            for j in range(self._matrix.shape[1]):
-                self.assertLessEqual(abs(self._matrix[i, j] - matrix[i, j]), threshold,
-                                     f"Elements {self._matrix[i, j]} and {matrix[i, j]} are not equal")
+        errors: np.ndarray = np.argwhere(np.abs(self._matrix - matrix) > threshold)
+        if errors.shape[0] > 0:
+            i, j = errors[0]
+            self.fail(f"Elements {self._matrix[i, j]} and {matrix[i, j]} are not equal")
 
     def test_channel_from_matrix(self) -> None:
         """
@@ -70,6 +138,19 @@ class Test(unittest.TestCase):
         self.assertEqual(result.shape, self._matrix.shape, "The matrices don't have the same dimensions")
         self.compare_matrices(result, 10 ** -15)
 
+    def test_channel_compose_out(self) -> None:
+        """
+        Tests the composition of a channel into preallocated arrays.
+        """
+        matrix: np.ndarray = np.arange(20, dtype=np.float64).reshape(4, 5) ** 2
+        channel: Channel = Channel(matrix)
+        out: np.ndarray = np.empty(matrix.shape)
+        buffer: np.ndarray = np.empty(matrix.shape[0] * 4)
+        result: np.ndarray = channel.compose(2, out, buffer)
+        self.assertIs(result, out)
+        self.assertTrue(np.allclose(result, channel._u[:, :2] @ np.diag(channel._s[:2]) @ channel._vt[:2, :]))
+        self.assertTrue(np.allclose(channel.compose(4), matrix))
+
     def test_channel_out_of_bound_value(self) -> None:
         """
         Tests the exception throwing for a out of bound singular value.
@@ -77,6 +158,42 @@ class Test(unittest.TestCase):
         channel: Channel = Channel(self._matrix)
         self.assertRaises(ValueError, functools.partial(channel.compose, 3))
 
+    def test_channel_randomized(self) -> None:
+        """
+        Tests the accuracy of a rank limited decomposition against the exact one.
+        """
+        matrix: np.ndarray = np.array(Image.open("test_bw.jpg"), dtype=np.float64)
+        exact: Channel = Channel(matrix)
+        channel: Channel = Channel(matrix, rank=50)
+        self.assertEqual(channel.get_singular_values(), 50)
+        self.assertTrue(np.allclose(channel._s, exact._s[:50], rtol=10 ** -2))
+        exact_error: float = np.linalg.norm(matrix - exact.compose(50))
+        error: float = np.linalg.norm(matrix - channel.compose(50))
+        self.assertLessEqual(error, exact_error * 1.01)
+
+    def test_channel_tolerance(self) -> None:
+        """
+        Tests the truncation of a decomposition with a tolerance.
+        """
+        matrix: np.ndarray = np.array(Image.open("test_bw.jpg"), dtype=np.float64)
+        channel: Channel = Channel(matrix, tolerance=0.01)
+        self.assertGreater(channel.get_singular_values(), 0)
+        self.assertGreaterEqual(channel._s[-1], channel._s[0] * 0.01)
+        self.assertTrue(np.allclose(channel._s, np.linalg.svd(matrix, compute_uv=False)[:channel.get_singular_values()],
+                                    rtol=5 * 10 ** -2))
+
+    def test_channel_float32(self) -> None:
+        """
+        Tests the reconstruction error of a float32 decomposition against a float64 one.
+        """
+        matrix: np.ndarray = np.array(Image.open("test_bw.jpg"))[:600, :800]
+        exact: Channel = Channel(matrix)
+        channel: Channel = Channel(matrix, dtype=np.float32)
+        self.assertEqual(channel.dtype, np.float32)
+        result: np.ndarray = channel.compose(100)
+        self.assertEqual(result.dtype, np.float32)
+        self.assertLessEqual(np.abs(result - exact.compose(100)).max(), 0.01)
+
     def test_compressor_from_svd(self) -> None:
         """
         Tests a channel creation from a {u, s, vt} dictionany.
@@ -133,6 +250,267 @@ class Test(unittest.TestCase):
         if os.path.exists("result.jpg"):
             os.remove("result.jpg")
 
+    def test_compressor_workers(self) -> None:
+        """
+        Tests that the concurrent decomposition gives the same result of the sequential one.
+        """
+        sequential: Compressor = Compressor(workers=1)
+        concurrent: Compressor = Compressor(workers=3)
+        self.assertEqual(sequential.load("test.jpg", rank=20), concurrent.load("test.jpg", rank=20))
+        sequential.compose(20)
+        concurrent.compose(20)
+        self.assertLessEqual(np.abs(sequential.image.astype(int) - concurrent.image).max(), 1)
+
+    def test_compressor_incremental(self) -> None:
+        """
+        Tests that the incremental compositions match the full ones.
+        """
+        compressor: Compressor = Compressor()
+        compressor.load("test.jpg", rank=150)
+        for i in [100, 105, 95, 150, 10, 12] + list(range(40, 80, 2)):
+            with self.subTest(compression_value=i):
+                compressor.compose(i)
+                expected: Compressor = Compressor()
+                expected._channels = compressor._channels
+                expected.compose(i)
+                self.assertLessEqual(np.abs(compressor.image.astype(int) - expected.image).max(), 1)
+
+    def test_compressor_cancel(self) -> None:
+        """
+        Tests the cancellation of a composition at a chunk boundary.
+        """
+        compressor: Compressor = Compressor(cache_size=0)
+        compressor.load("test.jpg", rank=300)
+        compressor.compose(10)
+        image: np.ndarray = compressor.image.copy()
+        checks: List[int] = []
+        self.assertFalse(compressor.compose(300, lambda: checks.append(0) or len(checks) > 2))
+        self.assertEqual(len(checks), 3)
+        self.assertTrue(np.array_equal(compressor.image, image))
+        self.assertTrue(compressor.compose(300))
+        expected: Compressor = Compressor(cache_size=0)
+        expected.load("test.jpg", rank=300)
+        expected.compose(300)
+        self.assertLessEqual(np.abs(compressor.image.astype(int) - expected.image).max(), 1)
+
+    def test_compressor_cache(self) -> None:
+        """
+        Tests the cache of the composed images.
+        """
+        compressor: Compressor = Compressor(cache_size=2 * 2400 * 1334)
+        compressor.load("test_bw.jpg", rank=50)
+        compressor.compose(10)
+        image: np.ndarray = compressor.image
+        compressor.compose(20)
+        compressor.compose(10)
+        self.assertIs(compressor.image, image)
+        self.assertEqual((compressor.cache.hits, compressor.cache.misses), (1, 2))
+        compressor.compose(30)
+        compressor.compose(20)
+        self.assertEqual((compressor.cache.hits, compressor.cache.misses), (1, 4))
+        self.assertLessEqual(compressor.cache.size, compressor.cache.max_size)
+        self.assertFalse(compressor.image.flags.writeable)
+
+    def test_compressor_tiled(self) -> None:
+        """
+        Tests the decomposition and composition of an image split in tiles.
+        """
+        matrix: np.ndarray = np.array(Image.open("test_bw.jpg"))[:500, :700]
+        channel: TiledChannel = TiledChannel(matrix, 128)
+        self.assertEqual(channel.get_singular_values(), 128)
+        self.assertTrue(np.allclose(channel.compose(128), matrix))
+        compressor: Compressor = Compressor()
+        self.assertEqual(compressor.load("test.jpg", rank=32, tile_size=256), 32)
+        compressor.compose(16)
+        compressor.compose(24)
+        image: np.ndarray = compressor.image
+        compressor.save("result_tiled.npz")
+        compressor = Compressor()
+        compressor.load("result_tiled.npz")
+        compressor.compose(24)
+        self.assertLessEqual(np.abs(compressor.image.astype(int) - image).max(), 1)
+        if os.path.exists("result_tiled.npz"):
+            os.remove("result_tiled.npz")
+
+    def test_compressor_sweep(self) -> None:
+        """
+        Tests the composition of many numbers of singular values from a single decomposition.
+        """
+        compressor: Compressor = Compressor(cache_size=0)
+        compressor.load("test.jpg", rank=200)
+        expected: Compressor = Compressor(cache_size=0)
+        expected._channels = compressor._channels
+        self.assertEqual(list(compressor.sweep([200, 10, 50, 25, 100, 50])), [10, 25, 50, 100, 200])
+        for k in compressor.sweep(range(10, 201, 38)):
+            with self.subTest(compression_value=k):
+                expected._accumulators = []
+                expected.compose(k)
+                self.assertLessEqual(np.abs(compressor.image.astype(int) - expected.image).max(), 1)
+
+    def test_compressor_preview(self) -> None:
+        """
+        Tests the composition of an image downsampled by averaging the singular vectors.
+        """
+        matrix: np.ndarray = np.array(Image.open("test_bw.jpg"), dtype=np.float64)[:400, :600]
+        expected: np.ndarray = matrix[:399, :597].reshape(133, 3, 199, 3).mean(axis=(1, 3))
+        for channel in [Channel(matrix), TiledChannel(matrix, 96)]:
+            with self.subTest(channel=type(channel).__name__):
+                preview: Union[Channel, TiledChannel] = channel.downsample(3)
+                self.assertTrue(np.allclose(preview.compose(preview.get_singular_values())[:132, :198],
+                                            expected[:132, :198]))
+        compressor: Compressor = Compressor()
+        values: int = compressor.load("test.jpg")
+        preview: Compressor = compressor.get_preview(400)
+        preview.compose(50)
+        self.assertEqual(preview.image.shape, (444, 800, 3))
+        self.assertFalse(hasattr(compressor, "_image"))
+        self.assertEqual(max(i.get_singular_values() for i in preview._channels), values)
+
+    def test_compressor_preview_tiles(self) -> None:
+        """
+        Tests the downsampling of tiles whose size isn't a multiple of the step.
+        """
+        matrix: np.ndarray = np.array(Image.open("test_bw.jpg"), dtype=np.float64)[:400, :600]
+        channel: TiledChannel = TiledChannel(matrix, 61)
+        downsampled: TiledChannel = channel.downsample(4)
+        self.assertEqual(downsampled.shape, (105, 157))
+        self.assertEqual(downsampled.tile_size, 16)
+        full: np.ndarray = channel.compose(channel.get_singular_values())
+        rows: List[int] = [j for i in range(0, 400, 61) for j in range(i, min(i + 61, 400), 4)] + [400]
+        columns: List[int] = [j for i in range(0, 600, 61) for j in range(i, min(i + 61, 600), 4)] + [600]
+        expected: np.ndarray = np.array([[full[i:j, k:l].mean() for k, l in zip(columns, columns[1:])]
+                                         for i, j in zip(rows, rows[1:])])
+        self.assertTrue(np.allclose(downsampled.compose(downsampled.get_singular_values()), expected))
+        Image.fromarray(np.random.default_rng(0).integers(0, 256, (250, 300, 3), np.uint8)).save("result_tiles.png")
+        compressor: Compressor = Compressor()
+        compressor.load("result_tiles.png", color_space="ycbcr", tile_size=62, subsampling=2)
+        preview: Compressor = compressor.get_preview(40)
+        self.assertEqual([i.shape for i in preview._channels], [(45, 53)] * 3)
+        preview.compose(10)
+        self.assertEqual(preview.image.shape, (45, 53, 3))
+        self.assertRaises(ValueError, functools.partial(compressor.load, "result_tiles.png", color_space="ycbcr",
+                                                        tile_size=61, subsampling=2))
+        os.remove("result_tiles.png")
+
+    def test_compressor_reduced(self) -> None:
+        """
+        Tests the quick decomposition of a JPEG decoded at a reduced scale and the progress of the decomposition.
+        """
+        fractions: List[float] = []
+        compressor: Compressor = Compressor()
+        values: int = compressor.load("test.jpg", size=400, progress=fractions.append)
+        compressor.compose(values)
+        image: Image.Image = Image.open("test.jpg")
+        image.draft(image.mode, (image.size[0] // 3, image.size[1] // 3))
+        self.assertEqual(image.size, (1200, 667))
+        expected: np.ndarray = np.array(image)
+        self.assertEqual(compressor.image.shape, expected.shape)
+        self.assertLessEqual(np.abs(compressor.image.astype(int) - expected).max(), 1)
+        self.assertEqual(sorted(fractions), [1 / 3, 2 / 3, 1])
+
+    def test_compressor_ycbcr(self) -> None:
+        """
+        Tests the decomposition of the luma and subsampled chroma planes with independent ranks.
+        """
+        original: np.ndarray = np.array(Image.open("test.jpg"))
+        image: np.ndarray = np.empty_like(original)
+        ColorSpace.to_rgb(ColorSpace.to_ycbcr(original), image, np.empty(original.shape[:2]))
+        self.assertLessEqual(np.abs(image.astype(int) - original).max(), 1)
+        compressor: Compressor = Compressor()
+        self.assertEqual(compressor.load("test.jpg", rank=60, color_space="ycbcr", chroma_rank=20, subsampling=2), 60)
+        self.assertEqual([i.shape for i in compressor._channels], [(1334, 2400), (667, 1200), (667, 1200)])
+        self.assertEqual([i.get_singular_values() for i in compressor._channels], [60, 20, 20])
+        compressor.compose(60)
+        image = compressor.image
+        self.assertEqual(image.shape, original.shape)
+        self.assertGreater(10 * np.log10(255 ** 2 / np.mean((image - original.astype(np.float64)) ** 2)), 20)
+        compressor.compose([60, 20, 20])
+        self.assertTrue((compressor.image == image).all())
+        compressor.compose([30, 5, 5])
+        self.assertEqual(compressor._ranks, [30, 5, 5])
+        self.assertRaises(ValueError, functools.partial(compressor.compose, [30, 5]))
+        self.assertRaises(ValueError, functools.partial(compressor.compose, 61))
+        preview: Compressor = compressor.get_preview()
+        self.assertEqual(preview._channels[0].shape, preview._channels[1].shape)
+        for path in ["result.isvd", "result.npz"]:
+            with self.subTest(path=path):
+                compressor.save(path)
+                loaded: Compressor = Compressor()
+                self.assertEqual(loaded.load(path), 60)
+                self.assertEqual(loaded.color_space, "ycbcr")
+                loaded.compose(60)
+                self.assertTrue((loaded.image == image).all())
+                del loaded
+                os.remove(path)
+        small: np.ndarray = np.random.default_rng(0).integers(0, 256, (5, 6, 3), np.uint8)
+        Image.fromarray(small).save("result_small.png")
+        planes: List[np.ndarray] = ColorSpace.to_ycbcr(small)
+        chroma: List[np.ndarray] = [np.repeat(np.repeat(ColorSpace.subsample(i, 4), 4, 0), 4, 1)[:5, :6]
+                                    - ColorSpace.OFFSET for i in planes[1:]]
+        expected: np.ndarray = np.clip(np.tensordot(np.stack([planes[0]] + chroma), ColorSpace.TO_RGB, ([0], [1])),
+                                       0, 255)
+        compressor.load("result_small.png", color_space="ycbcr", subsampling=4)
+        compressor.compose(5)
+        self.assertLessEqual(np.abs(compressor.image - expected).max(), 1)
+        for path in ["result.isvd", "result.npz"]:
+            with self.subTest(path=path):
+                compressor.save(path)
+                loaded = Compressor()
+                loaded.load(path)
+                loaded.compose(5)
+                self.assertTrue((loaded.image == compressor.image).all())
+                del loaded
+                os.remove(path)
+        os.remove("result_small.png")
+
+    def test_compressor_metrics(self) -> None:
+        """
+        Tests the quality metrics computed from the singular values.
+        """
+        matrix: np.ndarray = np.array(Image.open("test_bw.jpg"), dtype=np.float64)[:400, :600]
+        for channel in [Channel(matrix, rank=80), TiledChannel(matrix, 128, rank=80)]:
+            with self.subTest(channel=type(channel).__name__):
+                errors: np.ndarray = channel.get_errors() / np.sum(matrix ** 2)
+                for k in [0, 10, 80]:
+                    self.assertAlmostEqual(errors[k], np.sum((matrix - channel.compose(k)) ** 2) / np.sum(matrix ** 2))
+        compressor: Compressor = Compressor()
+        compressor.load("test.jpg", rank=100)
+        metrics: Dict[str, np.ndarray] = compressor.get_metrics()
+        self.assertEqual(metrics["psnr"].shape, (101,))
+        self.assertTrue((np.diff(metrics["psnr"]) >= 0).all() and (np.diff(metrics["energy"]) >= 0).all())
+        verified: Dict[str, np.ndarray] = compressor.verify_metrics([50, 10])
+        self.assertEqual(verified["k"].tolist(), [10, 50])
+        self.assertTrue(np.allclose(verified["psnr"], metrics["psnr"][[10, 50]], atol=1))
+        compressor.load("test.jpg", rank=100, size=300)
+        verified = compressor.verify_metrics([50])
+        self.assertTrue(np.allclose(verified["psnr"], compressor.get_metrics()["psnr"][[50]], atol=1))
+
+    def test_compressor_select_rank(self) -> None:
+        """
+        Tests the selection of the number of singular values from quality and size targets.
+        """
+        compressor: Compressor = Compressor()
+        compressor.load("test.jpg", rank=100)
+        metrics: Dict[str, np.ndarray] = compressor.get_metrics()
+        k: int = compressor.select_rank(energy=0.95)
+        self.assertTrue(metrics["energy"][k] >= 0.95 > metrics["energy"][k - 1])
+        k = compressor.select_rank(psnr=20)
+        self.assertTrue(metrics["psnr"][k] >= 20 > metrics["psnr"][k - 1])
+        self.assertEqual(compressor.select_rank(psnr=1000), 100)
+        compressor.compose(50)
+        size: int = compressor._get_encoded_size(".png")
+        k = compressor.select_rank(size=size, ext=".png")
+        self.assertGreaterEqual(k, 50)
+        if k < 100:
+            compressor.compose(k + 1)
+            self.assertGreater(compressor._get_encoded_size(".png"), size)
+        self.assertLessEqual(compressor.select_rank(psnr=1000, size=size, ext=".png"), k)
+        k = compressor.select_rank(size=size, ext=".png")
+        selected: np.ndarray = compressor.image.copy()
+        compressor.compose(k)
+        self.assertTrue((compressor.image == selected).all())
+        self.assertRaises(ValueError, functools.partial(compressor.select_rank, size=1, ext=".png"))
+
     def test_npz_grayscale(self) -> None:
         """
         Tests the saving and loading of an .npz file of a grayscale image.
@@ -165,5 +543,290 @@ class Test(unittest.TestCase):
         if os.path.exists("result.npz"):
             os.remove("result.npz")
 
+    def test_isvd(self) -> None:
+        """
+        Tests the saving and the memory mapped loading of an .isvd file.
+        """
+        for tile_size in [None, 512]:
+            with self.subTest(tile_size=tile_size):
+                compressor: Compressor = Compressor()
+                compressor.load("test.jpg", rank=40, dtype=np.float32, tile_size=tile_size)
+                compressor.compose(40)
+                image: np.ndarray = compressor.image
+                compressor.save("result.isvd")
+                compressor = Compressor()
+                self.assertEqual(compressor.load("result.isvd"), 40)
+                channel: Channel = compressor._channels[0] if tile_size is None else compressor._channels[0].tiles[0]
+                self.assertIsInstance(channel.factors[0], np.memmap)
+                compressor.compose(40)
+                self.assertTrue((image == compressor.image).all())
+                del compressor
+                if os.path.exists("result.isvd"):
+                    os.remove("result.isvd")
+
+    def test_isvd_many_tiles(self) -> None:
+        """
+        Tests the loading of an .isvd file with more arrays than the open files limit.
+        """
+        compressor: Compressor = Compressor()
+        compressor.load("test.jpg", rank=8, dtype=np.float32, tile_size=32)
+        compressor.compose(8)
+        image: np.ndarray = compressor.image
+        compressor.save("result_tiles.isvd")
+        limits: Optional[Tuple[int, int]] = None
+        if resource is not None:
+            limits = resource.getrlimit(resource.RLIMIT_NOFILE)
+            resource.setrlimit(resource.RLIMIT_NOFILE, (min(256, limits[0]), limits[1]))
+        try:
+            compressor = Compressor()
+            self.assertEqual(compressor.load("result_tiles.isvd"), 8)
+            compressor.compose(8)
+        finally:
+            if limits is not None:
+                resource.setrlimit(resource.RLIMIT_NOFILE, limits)
+        self.assertTrue((image == compressor.image).all())
+        del compressor
+        if os.path.exists("result_tiles.isvd"):
+            os.remove("result_tiles.isvd")
+
+    def test_isvd_quantized(self) -> None:
+        """
+        Tests the saving of a truncated, quantized and compressed .isvd file and the report of their tradeoffs.
+        """
+        compressor: Compressor = Compressor()
+        compressor.load("test.jpg", rank=60)
+        compressor.compose(50)
+        image: np.ndarray = compressor.image.astype(int)
+        compressor.save("result.isvd")
+        size: int = os.path.getsize("result.isvd")
+        for quantization, ratio, error in [("float16", 4, 1), ("int8", 8, 2), ("int16", 4, 1)]:
+            with self.subTest(quantization=quantization):
+                compressor.save("result_quantized.isvd", 50, quantization)
+                self.assertLess(os.path.getsize("result_quantized.isvd"), size / ratio * 1.25)
+                loaded: Compressor = Compressor()
+                self.assertEqual(loaded.load("result_quantized.isvd"), 50)
+                loaded.compose(50)
+                self.assertLessEqual(np.abs(loaded.image - image).mean(), error)
+                loaded.save("result_requantized.isvd", quantization=quantization)
+                self.assertEqual(os.path.getsize("result_requantized.isvd"), os.path.getsize("result_quantized.isvd"))
+                del loaded
+        for compression in ["zlib", "lzma"]:
+            with self.subTest(compression=compression):
+                compressor.save("result_compressed.isvd", 50, "int8", compression)
+                self.assertLess(os.path.getsize("result_compressed.isvd"), os.path.getsize("result_quantized.isvd"))
+                loaded = Compressor()
+                self.assertEqual(loaded.load("result_compressed.isvd"), 50)
+                loaded.compose(10)
+                self.assertTrue(all(i.loaded == 10 for i in loaded._channels))
+                loaded.compose(50)
+                self.assertLessEqual(np.abs(loaded.image - image).mean(), 2)
+                del loaded
+        tradeoffs: List[Dict] = compressor.get_tradeoffs(50)
+        self.assertEqual(len(tradeoffs), 12)
+        uncompressed: Dict = tradeoffs[0]
+        for i in tradeoffs:
+            self.assertLessEqual(i["size"], uncompressed["size"])
+            self.assertAlmostEqual(i["psnr"], uncompressed["psnr"], delta=0.5)
+        self.assertLess(min(i["size"] for i in tradeoffs), uncompressed["size"] / 8)
+        for i in ["result.isvd", "result_quantized.isvd", "result_requantized.isvd", "result_compressed.isvd"]:
+            if os.path.exists(i):
+                os.remove(i)
+
+    def test_isvd_lazy(self) -> None:
+        """
+        Tests the loading on demand of the singular vectors of an .isvd file.
+        """
+        compressor: Compressor = Compressor()
+        compressor.load("test_bw.jpg", rank=100)
+        compressor.compose(30)
+        image: np.ndarray = compressor.image
+        compressor.save("result_bw.isvd")
+        compressor.save("result_bw.npz")
+        compressor = Compressor()
+        compressor.load("result_bw.isvd")
+        channel: Channel = compressor._channels[0]
+        self.assertEqual((channel.get_singular_values(), channel.loaded), (100, 0))
+        compressor.compose(20)
+        self.assertEqual(channel.loaded, 20)
+        compressor.compose(30)
+        self.assertEqual(channel.loaded, 30)
+        self.assertTrue((image == compressor.image).all())
+        compressor.compose(31)
+        self.assertEqual(channel.loaded, 45)
+        compressor.save("result_lazy.npz")
+        self.assertLess(abs(os.path.getsize("result_lazy.npz") - os.path.getsize("result_bw.npz")), 1024)
+        compressor = Compressor()
+        compressor.load("result_lazy.npz")
+        compressor.compose(30)
+        self.assertTrue((image == compressor.image).all())
+        del compressor, channel
+        for i in ["result_bw.isvd", "result_bw.npz", "result_lazy.npz"]:
+            if os.path.exists(i):
+                os.remove(i)
+
+    def test_disk_cache(self) -> None:
+        """
+        Tests the hits, the eviction and the unreadable entries of the persistent cache of the decompositions.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            cache: DiskCache = DiskCache(directory)
+            compressor: Compressor = Compressor()
+            self.assertEqual(compressor.load("test.jpg", rank=40, disk_cache=cache), 40)
+            compressor.compose(40)
+            self.assertEqual(len(os.listdir(directory)), 1)
+            cached: Compressor = Compressor()
+            self.assertEqual(cached.load("test.jpg", rank=40, disk_cache=cache), 40)
+            self.assertIsInstance(cached._channels[0].factors[0], np.memmap)
+            cached.compose(40)
+            self.assertTrue((cached.image == compressor.image).all())
+            del cached
+            entry: str = os.listdir(directory)[0]
+            cache = DiskCache(directory, os.path.getsize(os.path.join(directory, entry)) + 1)
+            Compressor().load("test.jpg", rank=30, disk_cache=cache)
+            self.assertEqual(len(os.listdir(directory)), 1)
+            self.assertNotEqual(os.listdir(directory)[0], entry)
+            entry = os.path.join(directory, os.listdir(directory)[0])
+            with open(entry, "r+b") as file:
+                file.truncate(os.path.getsize(entry) // 2)
+            truncated: Compressor = Compressor()
+            self.assertEqual(truncated.load("test.jpg", rank=30, disk_cache=cache), 30)
+            truncated.compose(30)
+            expected: Compressor = Compressor()
+            expected.load("test.jpg", rank=30)
+            expected.compose(30)
+            self.assertTrue((truncated.image == expected.image).all())
+            self.assertGreater(os.path.getsize(entry), 0)
+            del truncated
+
+    def test_batch(self) -> None:
+        """
+        Tests the compression of many files with a failing one.
+        """
+        with open("result_manifest.txt", "w") as file:
+            file.write("test_bw.jpg\nmissing.jpg\n")
+        self.assertEqual(BatchController.get_inputs(["*.jpg", "result_manifest.txt"]),
+                         ["test.jpg", "test_bw.jpg", "missing.jpg"])
+        self.assertEqual(BatchController.get_output("{dir}/{name}_{k}.isvd", "images/test.jpg"), "images/test_{k}.isvd")
+        for template in ["{dir}/{stem}{ext}", "{dir}/{0}{ext}", "{dir}/{name}_{k:03d}{ext}", "{dir}/{name"]:
+            with self.subTest(template=template):
+                self.assertRaises(ValueError, functools.partial(BatchController, ["test.jpg"], template, [10]))
+        controller: BatchController = BatchController(["test.jpg", "result_manifest.txt"], "{dir}/result_{name}.isvd", [0], 2,
+                                                      {"rank": 10}, {"quantization": "int8"})
+        self.assertEqual(controller.run(), 1)
+        self.assertTrue(os.path.exists("result_test.isvd") and os.path.exists("result_test_bw.isvd"))
+        for i in ["result_manifest.txt", "result_test.isvd", "result_test_bw.isvd"]:
+            if os.path.exists(i):
+                os.remove(i)
+
+    def test_stats(self) -> None:
+        """
+        Tests the timing spans of the compression stages.
+        """
+        operations: List[str] = []
+        compressor: Compressor = Compressor()
+        compressor.load("test_bw.jpg", rank=20)
+        compressor.compose(10)
+        self.assertEqual(Stats.get_breakdown(), {})
+        listener: Callable[[str, float], None] = lambda operation, seconds: operations.append(operation)
+        Stats.add_listener(listener)
+        Stats.enable()
+        try:
+            compressor.compose(5)
+            compressor.compose(5)
+            compressor.save("result_stats.jpg")
+        finally:
+            Stats.enable(False)
+            Stats.remove_listener(listener)
+            breakdown: Dict[str, Dict[str, float]] = Stats.get_breakdown()
+            Stats.clear()
+            os.remove("result_stats.jpg")
+        self.assertEqual(operations, ["compose", "compose", "save"])
+        self.assertEqual(breakdown["compose"]["calls"], 2)
+        self.assertEqual(breakdown["matmul"]["calls"], 1)
+        self.assertEqual(breakdown["clip"]["calls"], 1)
+        self.assertGreaterEqual(breakdown["save"]["total"], breakdown["encode"]["total"])
+        Stats.enable(detailed=False)
+        try:
+            compressor.compose(7)
+        finally:
+            Stats.enable(False)
+            breakdown = Stats.get_breakdown()
+            Stats.clear()
+        self.assertEqual(list(breakdown), ["compose"])
+
+    def test_compose_thread(self) -> None:
+        """
+        Tests the composition of the requested images and the prefetching of the near ones.
+        """
+        compressor: Compressor = Compressor()
+        values: int = compressor.load("test_bw.jpg", rank=200)
+        preview: Compressor = compressor.get_preview()
+        preview.compose(values - 1)
+        thread: ComposeThread = ComposeThread(preview, values)
+        composed: List[int] = []
+        thread.composed.connect(lambda k, image, seconds: composed.append(k))
+        self.assertEqual(thread.snap(103), 104)
+        thread.request(150)
+        thread.start()
+        try:
+            for _ in range(200):
+                if all(i in preview.cache for i in (148, 152, 146)):
+                    break
+                thread.wait(50)
+        finally:
+            thread.stop()
+            thread.wait()
+        self.assertIn(150, preview.cache)
+        self.assertTrue(all(i in preview.cache for i in (148, 152, 146)))
+
+    def test_panel_display(self) -> None:
+        """
+        Tests that the scaled images of the panel don't share the composed arrays.
+        """
+        for shape in ((Panel.DISPLAY_SIZE, 600), (2 * Panel.DISPLAY_SIZE, 1200), (Panel.DISPLAY_SIZE, 600, 3)):
+            with self.subTest(shape=shape):
+                image: np.ndarray = np.full(shape, 100, np.uint8)
+                qimage: QImage = Panel.to_display(image)
+                self.assertEqual(min(qimage.width(), qimage.height()), Panel.DISPLAY_SIZE)
+                image[:] = 200
+                self.assertEqual(qimage.pixelColor(0, 0).red(), 100)
+
+    def test_memory_governor(self) -> None:
+        """
+        Tests the spilling of the least recently activated compressors over the memory budget.
+        """
+        compressors: List[Compressor] = [Compressor() for _ in range(3)]
+        images: List[np.ndarray] = []
+        for i in compressors:
+            i.load("test.jpg", rank=20)
+            i.compose(20)
+            images.append(i.image)
+        memory: int = compressors[0].get_memory()
+        governor: MemoryGovernor = MemoryGovernor(int(memory * 1.5))
+        for i in compressors:
+            governor.register(i)
+        self.assertEqual(governor.get_memory(), sum(i.get_memory() for i in compressors))
+        self.assertGreater(governor.get_memory(), governor.budget)
+        self.assertGreaterEqual(governor.balance(), memory * 2)
+        self.assertLessEqual(governor.get_memory(), governor.budget)
+        self.assertEqual(compressors[0].get_memory(), memory)
+        self.assertLess(compressors[1].get_memory(), 1024 ** 2)
+        self.assertLess(compressors[2].get_memory(), 1024 ** 2)
+        governor.activate(compressors[1])
+        compressors[1].compose(20)
+        self.assertTrue((compressors[1].image == images[1]).all())
+        self.assertGreater(governor.get_memory(), governor.budget)
+        governor.balance()
+        self.assertLessEqual(governor.get_memory(), governor.budget)
+        self.assertGreater(compressors[1].get_memory(), governor.budget // 2)
+        self.assertLess(compressors[0].get_memory(), 1024 ** 2)
+        for i, image in zip(compressors, images):
+            i.compose(20)
+            self.assertTrue((i.image == image).all())
+        for i in compressors:
+            governor.unregister(i)
+        governor.close()
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -19,6 +19,34 @@
             <source>ratio</source>
             <translation>Compression ratio:&#x9;{ratio}</translation>
         </message>
+        <message>
+            <source>batch_file</source>
+            <translation>{input} -&gt; {output}&#x9;{seconds} s&#x9;ratio: {ratio}</translation>
+        </message>
+        <message>
+            <source>batch_error</source>
+            <translation>Cannot compress {input}:&#x9;{error}</translation>
+        </message>
+        <message>
+            <source>batch_total</source>
+            <translation>Compressed {files} files ({failed} failed) in {seconds} s:&#x9;{throughput} files/s, {megabytes} MB/s</translation>
+        </message>
+        <message>
+            <source>tradeoff</source>
+            <translation>Quantization {quantization}, compression {compression}:&#x9;{size} KB, {psnr} dB</translation>
+        </message>
+        <message>
+            <source>size_target</source>
+            <translation>No number of singular values gives an image of at most {size} bytes</translation>
+        </message>
+        <message>
+            <source>selected</source>
+            <translation>Selected k:&#x9;{k}</translation>
+        </message>
+        <message>
+            <source>profile</source>
+            <translation>{stage}:&#x9;{calls} calls,&#x9;{total} ms total,&#x9;{mean} ms mean</translation>
+        </message>
     </context>
     <context>
         <name>Gui</name>
@@ -54,6 +82,10 @@
             <source>exit</source>
             <translation>Exit</translation>
         </message>
+        <message>
+            <source>cache</source>
+            <translation>Cache decompositions</translation>
+        </message>
         <message>
             <source>parse</source>
             <translation>Cannot parse '{value}' to int</translation>
@@ -66,5 +98,17 @@
             <source>compression</source>
             <translation>Compression ratio: {ratio}%</translation>
         </message>
+        <message>
+            <source>latency_load</source>
+            <translation>Image decomposed in {milliseconds} ms</translation>
+        </message>
+        <message>
+            <source>latency_save</source>
+            <translation>Image saved in {milliseconds} ms</translation>
+        </message>
+        <message>
+            <source>latency_frame</source>
+            <translation>Image composed in {compose} ms and shown in {display} ms</translation>
+        </message>
     </context>
 </TS>
@@ -19,6 +19,34 @@
             <source>ratio</source>
             <translation>Rapporto di compressione:&#x9;{ratio}</translation>
         </message>
+        <message>
+            <source>batch_file</source>
+            <translation>{input} -&gt; {output}&#x9;{seconds} s&#x9;rapporto: {ratio}</translation>
+        </message>
+        <message>
+            <source>batch_error</source>
+            <translation>Impossibile comprimere {input}:&#x9;{error}</translation>
+        </message>
+        <message>
+            <source>batch_total</source>
+            <translation>Compressi {files} file ({failed} falliti) in {seconds} s:&#x9;{throughput} file/s, {megabytes} MB/s</translation>
+        </message>
+        <message>
+            <source>tradeoff</source>
+            <translation>Quantizzazione {quantization}, compressione {compression}:&#x9;{size} KB, {psnr} dB</translation>
+        </message>
+        <message>
+            <source>size_target</source>
+            <translation>Nessun numero di valori singolari produce un'immagine di al massimo {size} byte</translation>
+        </message>
+        <message>
+            <source>selected</source>
+            <translation>Valore di k selezionato:&#x9;{k}</translation>
+        </message>
+        <message>
+            <source>profile</source>
+            <translation>{stage}:&#x9;{calls} chiamate,&#x9;{total} ms totali,&#x9;{mean} ms in media</translation>
+        </message>
     </context>
     <context>
         <name>Gui</name>
@@ -54,6 +82,10 @@
             <source>exit</source>
             <translation>Esci</translation>
         </message>
+        <message>
+            <source>cache</source>
+            <translation>Salva le scomposizioni in cache</translation>
+        </message>
         <message>
             <source>parse</source>
             <translation>Impossibile convertire '{value}' in int</translation>
@@ -66,5 +98,17 @@
             <source>compression</source>
             <translation>Rapporto di compressione: {ratio}%</translation>
         </message>
+        <message>
+            <source>latency_load</source>
+            <translation>Immagine scomposta in {milliseconds} ms</translation>
+        </message>
+        <message>
+            <source>latency_save</source>
+            <translation>Immagine salvata in {milliseconds} ms</translation>
+        </message>
+        <message>
+            <source>latency_frame</source>
+            <translation>Immagine composta in {compose} ms e mostrata in {display} ms</translation>
+        </message>
     </context>
 </TS>